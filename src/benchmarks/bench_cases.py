@@ -0,0 +1,261 @@
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+sys.path.insert(0, os.path.join(src_dir, "tests"))
+
+from test_cases import test_cases
+from struixLang.struixTerp import Terp
+from struixLang.struixLexer import Lexer
+from struixLang.struixPrimitives import AddWords
+from struixCC import StruixCC, CompilationError
+
+
+def new_terp():
+    """Create an interpreter with all built-in words and libraries."""
+    terp = Terp()
+    AddWords(terp)
+    return terp
+
+
+def compile_corpus(scale=1):
+    """
+    Compile the struixCC conformance corpus.
+
+    Parameters:
+        scale (int): Number of times the corpus is compiled.
+
+    Returns:
+        list[str]: Generated struixLang code of every case that compiles.
+    """
+    outputs = []
+    for _ in range(scale):
+        for test in test_cases:
+            try:
+                outputs.append(StruixCC().compile(test['code']))
+            except CompilationError:
+                pass
+    return outputs
+
+
+def generate_c_program(functions):
+    """
+    Generate a large C translation unit made of many small functions.
+
+    Parameters:
+        functions (int): Number of functions to generate.
+
+    Returns:
+        str: The C source code.
+    """
+    parts = []
+    for k in range(functions):
+        parts.append(f'''
+        int f{k}(int a, int b) {{
+            int c = a + b * {k};
+            int i;
+            for (i = 0; i < 3; i++) {{
+                if (c > {k}) {{
+                    c = c - {k};
+                }} else {{
+                    c = c + i;
+                }}
+            }}
+            return c;
+        }}''')
+    calls = ' + '.join(f'f{k}({k}, 2)' for k in range(functions))
+    parts.append(f'''
+        int main() {{
+            int total = {calls};
+            return total;
+        }}''')
+    return '\n'.join(parts)
+
+
+# --- Setup and run functions ---
+
+def setup_lexer():
+    return '\n'.join(compile_corpus()) * 20
+
+def run_lexer(text):
+    lexer = Lexer(text)
+    count = 0
+    while lexer.nextWord():
+        count += 1
+    return count
+
+
+def setup_compile():
+    terp = new_terp()
+    body = 'VAR x x PARAM x FETCH 1 + DUP * x FETCH SWAP - [ x FETCH 2 * ] RUN +'
+    source = '\n'.join(f'DEF word{i} {body} END' for i in range(200))
+    return terp, source
+
+def run_compile(state):
+    terp, source = state
+    terp.run(source)
+
+
+def setup_dispatch():
+    return new_terp()
+
+def run_dispatch(terp):
+    terp.run('[ 1 DUP DROP DROP ] 5000 TIMES')
+    del terp.stack[:]
+
+
+def setup_recursion():
+    terp = new_terp()
+    terp.run('''
+    VAR n VAR rec
+    rec [ n FETCH 0 > [ n n FETCH 1 - STORE rec FETCH RUN ] IFTRUE ] STORE
+    ''')
+    return terp
+
+def run_recursion(terp):
+    for _ in range(20):
+        terp.run('n 50 STORE rec FETCH RUN')
+    del terp.stack[:]
+
+
+def setup_loop():
+    terp = new_terp()
+    terp.run('''
+    DEF loop
+        VAR i VAR sum
+        i 0 STORE sum 0 STORE
+        [ i FETCH 2000 < ]
+        [ sum sum FETCH i FETCH + STORE i i FETCH 1 + STORE ] WHILE
+        sum FETCH
+    END
+    ''')
+    return terp
+
+def run_loop(terp):
+    terp.run('loop')
+    del terp.stack[:]
+
+
+def setup_nothing():
+    return None
+
+def run_library_import(_):
+    new_terp()
+
+
+def setup_cc_corpus():
+    return [test['code'] for test in test_cases] * 5
+
+def run_cc_corpus(sources):
+    for source in sources:
+        try:
+            StruixCC(use_cache=False).compile(source)
+        except CompilationError:
+            pass
+
+def run_cc_corpus_cached(sources):
+    for source in sources:
+        try:
+            StruixCC().compile(source)
+        except CompilationError:
+            pass
+
+
+def setup_cc_large():
+    return generate_c_program(100)
+
+def run_cc_large(source):
+    StruixCC(use_cache=False).compile(source)
+
+
+def setup_corpus_execute():
+    runnable = []
+    for code in compile_corpus():
+        terp = new_terp()
+        try:
+            terp.run(code)
+            # Keep only programs whose main can be run repeatedly.
+            for _ in range(2):
+                terp.run('main')
+                del terp.stack[:]
+        except Exception:
+            continue
+        runnable.append(terp)
+    return runnable
+
+def run_corpus_execute(terps):
+    for terp in terps:
+        terp.run('main')
+        del terp.stack[:]
+
+
+benchmarks = [
+    {
+        "name": "lexer_throughput",
+        "description": "Tokenize the generated code of the struixCC corpus",
+        "setup": setup_lexer,
+        "run": run_lexer,
+    },
+    {
+        "name": "compile_words",
+        "description": "Compile 200 user-defined words",
+        "setup": setup_compile,
+        "run": run_compile,
+        "ops": 200,
+    },
+    {
+        "name": "word_dispatch",
+        "description": "Dispatch primitive words in a TIMES loop",
+        "setup": setup_dispatch,
+        "run": run_dispatch,
+        "ops": 20000,
+    },
+    {
+        "name": "recursion",
+        "description": "Recurse 50 levels deep through a block held in a variable",
+        "setup": setup_recursion,
+        "run": run_recursion,
+        "ops": 1000,
+    },
+    {
+        "name": "loop_heavy",
+        "description": "Sum 2000 integers in a WHILE loop inside a user word",
+        "setup": setup_loop,
+        "run": run_loop,
+        "ops": 2000,
+    },
+    {
+        "name": "library_import",
+        "description": "Create an interpreter and import all libraries",
+        "setup": setup_nothing,
+        "run": run_library_import,
+    },
+    {
+        "name": "struixcc_corpus",
+        "description": "Compile the struixCC conformance corpus five times over",
+        "setup": setup_cc_corpus,
+        "run": run_cc_corpus,
+        "ops": len(test_cases) * 5,
+    },
+    {
+        "name": "struixcc_corpus_cached",
+        "description": "Compile the struixCC conformance corpus five times over, reusing earlier results",
+        "setup": setup_cc_corpus,
+        "run": run_cc_corpus_cached,
+        "ops": len(test_cases) * 5,
+    },
+    {
+        "name": "struixcc_large",
+        "description": "Compile a C translation unit with 100 functions",
+        "setup": setup_cc_large,
+        "run": run_cc_large,
+    },
+    {
+        "name": "corpus_execute",
+        "description": "Run main of every runnable program of the struixCC corpus",
+        "setup": setup_corpus_execute,
+        "run": run_corpus_execute,
+    },
+]
@@ -0,0 +1,137 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from bench_cases import benchmarks
+
+
+def run_benchmark(bench, repeat=5, warmup=1):
+    """
+    Time a benchmark after warming it up.
+
+    Parameters:
+        bench (dict): The benchmark case.
+        repeat (int): Number of timed runs.
+        warmup (int): Number of untimed runs before timing.
+
+    Returns:
+        dict: Statistical summary of the timed runs, in seconds.
+    """
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        state = bench['setup']()
+        for _ in range(warmup):
+            bench['run'](state)
+        times = []
+        ops = bench.get('ops')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = bench['run'](state)
+            times.append(time.perf_counter() - start)
+            # Run functions may report how many operations they performed.
+            if ops is None and isinstance(result, int):
+                ops = result
+
+    summary = {
+        "description": bench['description'],
+        "runs": repeat,
+        "min": min(times),
+        "max": max(times),
+        "mean": statistics.mean(times),
+        "median": statistics.median(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "times": times,
+    }
+    if ops:
+        summary["ops"] = ops
+        summary["ops_per_sec"] = ops / summary["median"]
+    return summary
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline and find regressions.
+
+    Parameters:
+        results (dict): Benchmark results by name.
+        baseline (dict): Baseline results by name, as saved with --json.
+        threshold (float): Allowed relative slowdown of the median time.
+
+    Returns:
+        list[str]: Names of the benchmarks that regressed.
+    """
+    regressions = []
+    print(f"{'benchmark':<20} {'baseline (ms)':>14} {'current (ms)':>14} {'change':>9}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<20} {'-':>14} {result['median'] * 1e3:>14.3f} {'new':>9}")
+            continue
+        before = baseline[name]['median']
+        after = result['median']
+        change = (after - before) / before
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<20} {before * 1e3:>14.3f} {after * 1e3:>14.3f} {change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the struixLang interpreter and struixCC.")
+    parser.add_argument('names', nargs='*', help="benchmarks to run (default: all)")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument('-w', '--warmup', type=int, default=1, help="untimed runs per benchmark")
+    parser.add_argument('--json', metavar='FILE', help="write the results as JSON to FILE")
+    parser.add_argument('--compare', metavar='FILE', help="flag regressions against a saved results file")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative slowdown counted as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+    selected = [bench for bench in benchmarks if not args.names or bench['name'] in args.names]
+    unknown = set(args.names) - {bench['name'] for bench in benchmarks}
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    print(f"{'benchmark':<20} {'median (ms)':>12} {'min (ms)':>10} {'stdev (ms)':>11} {'ops/s':>12}")
+    for bench in selected:
+        summary = run_benchmark(bench, args.repeat, args.warmup)
+        results[bench['name']] = summary
+        rate = f"{summary['ops_per_sec']:>12.0f}" if 'ops_per_sec' in summary else f"{'-':>12}"
+        print(f"{bench['name']:<20} {summary['median'] * 1e3:>12.3f} {summary['min'] * 1e3:>10.3f} "
+              f"{summary['stdev'] * 1e3:>11.3f} {rate}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
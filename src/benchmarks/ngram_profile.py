@@ -0,0 +1,94 @@
+import argparse
+import collections
+import contextlib
+import io
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from bench_cases import benchmarks
+from struixLang import struixOptimizer
+from struixLang.struixPrimitives import AddWords
+
+
+def count_bodies(names):
+    """
+    Run benchmarks and count how often each word body was executed.
+
+    Parameters:
+        names (list[str]): Benchmarks to run (default: all).
+
+    Returns:
+        dict: Executions by body id, with the body itself.
+    """
+    executions = {}
+    make_word = AddWords.makeWord
+
+    def counting_make_word(code, imm=False):
+        word = make_word(code, imm)
+
+        def counted(terp):
+            entry = executions.setdefault(id(code), [code, 0])
+            entry[1] += 1
+            return word(terp)
+        counted.__dict__.update(word.__dict__)
+        return counted
+
+    AddWords.makeWord = staticmethod(counting_make_word)
+    try:
+        sink = io.StringIO()
+        with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+            for bench in benchmarks:
+                if names and bench['name'] not in names:
+                    continue
+                bench['run'](bench['setup']())
+    finally:
+        AddWords.makeWord = staticmethod(make_word)
+    return executions
+
+
+def count_ngrams(executions, sizes):
+    """
+    Count executed sequences of adjacent body items.
+
+    Parameters:
+        executions (dict): Executions by body id, as given by count_bodies.
+        sizes (list[int]): Sequence lengths to count.
+
+    Returns:
+        collections.Counter: Executions by sequence of item shapes.
+    """
+    counts = collections.Counter()
+    for code, runs in executions.values():
+        if not isinstance(code, list):
+            continue
+        shapes = [struixOptimizer.shape(item) for item in code]
+        for size in sizes:
+            for start in range(len(shapes) - size + 1):
+                counts[tuple(shapes[start:start + size])] += runs
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find frequent word sequences for superinstructions.")
+    parser.add_argument('names', nargs='*', help="benchmarks to run (default: all)")
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[2, 3, 4], help="sequence lengths")
+    parser.add_argument('-l', '--limit', type=int, default=30, help="number of sequences to show")
+    args = parser.parse_args()
+
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+    counts = count_ngrams(count_bodies(args.names), args.sizes)
+    print(f"{'executions':>12}  {'fused':<5}  sequence")
+    for sequence, runs in counts.most_common(args.limit):
+        fused = any(struixOptimizer.matches(pattern, sequence)
+                    for pattern, _ in struixOptimizer.SUPERINSTRUCTIONS)
+        print(f"{runs:>12}  {'yes' if fused else '':<5}  {' '.join(sequence)}")
+
+
+if __name__ == "__main__":
+    main()
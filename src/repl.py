@@ -15,7 +15,7 @@
 import code
 import sys
 
-from struixLang import struixTerp, struixPrimitives
+from struixLang import struixTerp, struixPrimitives, struixImage
 
 sys.ps1 = "sxL> "
 sys.ps2 = "    ...> "
@@ -35,6 +35,11 @@ class Shell(code.InteractiveConsole):
         if terp.isCompiling(): return True
         return False
 
-terp = struixTerp.Terp()
-struixPrimitives.AddWords(terp)
+if len(sys.argv) > 1:
+    # Starts from an interpreter image instead of the built-in words and libraries.
+    terp = struixImage.load(sys.argv[1])
+else:
+    terp = struixTerp.Terp()
+    struixPrimitives.AddWords(terp)
+terp.warningStream = sys.stderr
 Shell().interact(banner)
@@ -1,11 +1,49 @@
+import argparse
+import collections
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import os
 import sys
+import threading
+import time
 from pycparser import c_parser, c_ast
 import re
 
+# Number of compiled programs kept by the compile cache.
+COMPILE_CACHE_SIZE = 1024
+
+# Per thread: the shared parser, and the messages printed by the compilation in progress.
+_local = threading.local()
+# Digest of cleaned source -> (generated code, printed messages, compiler state), least recently used first.
+_compile_cache = collections.OrderedDict()
+_compile_cache_lock = threading.Lock()
+
 class CompilationError(Exception):
     """Exception raised for errors during the compilation process."""
     pass
 
+def shared_parser():
+    """
+    Return the C parser of the current thread, creating it on first use.
+
+    A parser resets its state on every parse, so one instance serves all
+    compilations instead of being set up again for each.
+
+    Returns:
+        c_parser.CParser: The parser.
+    """
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = c_parser.CParser()
+    return parser
+
+def clear_compile_cache():
+    """Forget all previously compiled programs."""
+    with _compile_cache_lock:
+        _compile_cache.clear()
+
 def remove_comments(code):
     """
     Remove single-line (//) and multi-line (/* */) comments from C code.
@@ -22,6 +60,63 @@ def remove_comments(code):
     code = re.sub(r'/\*.*?\*/', '', code, flags=re.DOTALL)
     return code
 
+_top_level_pattern = re.compile(r'''"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|[{}();]''')
+
+def split_top_level(code):
+    """
+    Split C code without comments into its top-level declarations and function definitions.
+
+    Parameters:
+        code (str): The C code.
+
+    Returns:
+        list[str]: The text of each top-level item, in order.
+    """
+    chunks = []
+    start = 0
+    depth = 0
+    saw_paren = False      # A parenthesis before the first brace marks a function definition.
+    is_function = False
+    for match in _top_level_pattern.finditer(code):
+        token = match.group()
+        if token == '{':
+            if depth == 0:
+                is_function = saw_paren
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0 and is_function:
+                chunks.append(code[start:match.end()])
+                start, saw_paren, is_function = match.end(), False, False
+        elif depth == 0:
+            if token == '(':
+                saw_paren = True
+            elif token == ';':
+                chunks.append(code[start:match.end()])
+                start, saw_paren, is_function = match.end(), False, False
+    if code[start:].strip():
+        chunks.append(code[start:])
+    return [chunk for chunk in chunks if chunk.strip()]
+
+def referenced_names(node):
+    """
+    Collect the identifiers used anywhere within an AST node.
+
+    Parameters:
+        node (c_ast.Node): The node.
+
+    Returns:
+        set[str]: The names of variables and functions it refers to.
+    """
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, c_ast.ID):
+            names.add(node.name)
+        stack.extend(child for _, child in node.children())
+    return names
+
 class StruixCC(c_ast.NodeVisitor):
     """
     A compiler that translates C code into a stack-based toy language using pycparser's AST.
@@ -31,18 +126,30 @@ class StruixCC(c_ast.NodeVisitor):
     function definitions, control structures, and expressions.
     """
     
-    def __init__(self):
-        """Initialize the compiler with necessary data structures."""
+    def __init__(self, use_cache=True):
+        """
+        Initialize the compiler with necessary data structures.
+
+        Parameters:
+            use_cache (bool): Whether compile may return the code generated earlier for the same source.
+        """
+        self.use_cache = use_cache
         self.output = []               # List to collect generated code
         self.symbol_table = {}         # Tracks variables, their types, and scopes
         self.functions = {}            # Stores function definitions
         self.current_function = None   # Name of the current function being compiled
         self.errors = []               # List of compilation errors
         self.warnings = []             # List of compilation warnings
+        self.slots = None              # Frame slots of the visible locals by name, within a function
+        self.frame = None              # Number of slots in the function's frame, shared by its blocks
 
     def compile(self, code):
         """
         Compile the provided C code into the target toy language.
+
+        Results are cached by a digest of the source without comments. A cached
+        program prints the same warnings again, and leaves the compiler with the
+        same warnings, function table and symbol table as compiling it did.
         
         Parameters:
             code (str): The C source code to compile.
@@ -53,17 +160,48 @@ class StruixCC(c_ast.NodeVisitor):
         Raises:
             CompilationError: If there are syntax errors or other compilation issues.
         """
-        parser = c_parser.CParser()
+        cleaned_code = remove_comments(code)
+        key = hashlib.sha256(cleaned_code.encode('utf-8')).hexdigest()
+        if self.use_cache:
+            with _compile_cache_lock:
+                cached = _compile_cache.get(key)
+                if cached is not None:
+                    _compile_cache.move_to_end(key)
+            if cached is not None:
+                compiled, messages, state = cached
+                for message in messages:
+                    print(message, file=sys.stderr)
+                self.output = compiled.split('\n')
+                self.warnings = list(state['warnings'])
+                self.functions = dict(state['functions'])
+                self.symbol_table = dict(state['symbol_table'])
+                return compiled
+
+        # Compilers of nested blocks print messages too, so they are collected per thread.
+        outer_messages = getattr(_local, 'messages', None)
+        _local.messages = messages = []
         try:
-            cleaned_code = remove_comments(code)
-            ast = parser.parse(cleaned_code)
+            ast = shared_parser().parse(cleaned_code)
             self.visit(ast)
             if self.errors:
                 raise CompilationError(f"Compilation failed with errors: {', '.join(self.errors)}.")
-            return '\n'.join(self.output)
+            compiled = '\n'.join(self.output)
         except c_parser.ParseError as e:
             self.error(f"Syntax error: {e}")
             raise CompilationError("Compilation failed due to syntax error:") from e
+        finally:
+            _local.messages = outer_messages
+
+        state = {
+            'warnings': tuple(self.warnings),
+            'functions': dict(self.functions),
+            'symbol_table': dict(self.symbol_table)
+        }
+        with _compile_cache_lock:
+            _compile_cache[key] = (compiled, tuple(messages), state)
+            if len(_compile_cache) > COMPILE_CACHE_SIZE:
+                _compile_cache.popitem(last=False)
+        return compiled
 
     def emit(self, code):
         """
@@ -82,7 +220,7 @@ class StruixCC(c_ast.NodeVisitor):
             message (str): The error message.
         """
         self.errors.append(message)
-        print(f"Error: {message}", file=sys.stderr)
+        self.report(f"Error: {message}")
 
     def warning(self, message):
         """
@@ -92,7 +230,20 @@ class StruixCC(c_ast.NodeVisitor):
             message (str): The warning message.
         """
         self.warnings.append(message)
-        print(f"Warning: {message}", file=sys.stderr)
+        self.report(f"Warning: {message}")
+
+    def report(self, line):
+        """
+        Print a message to stderr, recording it for the compile cache.
+
+        Parameters:
+            line (str): The message.
+        """
+        messages = getattr(_local, 'messages', None)
+        if messages is not None:
+            messages.append(line)
+        if not getattr(_local, 'quiet', False):
+            print(line, file=sys.stderr)
 
     def visit_FuncDef(self, node):
         """
@@ -103,10 +254,15 @@ class StruixCC(c_ast.NodeVisitor):
         """
         func_name = node.decl.name
         self.current_function = func_name
+        self.functions[func_name] = node
 
-        # Start function definition
+        # Start function definition, with a frame sized once the body is compiled
         self.emit(f'DEF {func_name}')
+        frame_line = len(self.output)
+        self.emit('FRAME')
         self.symbol_table = {}
+        self.slots = {}
+        self.frame = [0]
 
         # Process parameters
         if isinstance(node.decl.type, c_ast.FuncDecl) and node.decl.type.args:
@@ -114,15 +270,77 @@ class StruixCC(c_ast.NodeVisitor):
                 var_name = param.name
                 var_type = self.get_type(param.type)
                 self.symbol_table[var_name] = var_type
-                self.emit(f'VAR {var_name}')
-                self.emit(f'{var_name} PARAM')
+                self.emit_declaration(var_name)
+                self.emit(f'SLOT_PARAM {self.slots[var_name]}')
 
         # Visit function body
         self.visit(node.body)
 
+        if self.frame[0]:
+            self.output[frame_line] = f'FRAME {self.frame[0]}'
+        else:
+            del self.output[frame_line]
+
         # End function definition
         self.emit('END')
         self.current_function = None
+        self.slots = None
+        self.frame = None
+
+    def block_compiler(self):
+        """
+        Create a compiler for a nested block, which sees the variables visible here.
+
+        Returns:
+            StruixCC: The compiler.
+        """
+        compiler = StruixCC()
+        compiler.symbol_table = self.symbol_table.copy()
+        # Messages and functions are recorded once, for the whole program.
+        compiler.errors = self.errors
+        compiler.warnings = self.warnings
+        compiler.functions = self.functions
+        if self.slots is not None:
+            compiler.slots = self.slots.copy()
+            compiler.frame = self.frame
+        return compiler
+
+    def emit_declaration(self, var_name):
+        """
+        Declare a variable, as the next slot of the frame within a function.
+
+        Parameters:
+            var_name (str): The variable name.
+        """
+        if self.slots is None:
+            self.emit(f'VAR {var_name}')
+        else:
+            self.slots[var_name] = self.frame[0]
+            self.frame[0] += 1
+
+    def emit_fetch(self, var_name):
+        """
+        Emit code putting the value of a variable on the stack.
+
+        Parameters:
+            var_name (str): The variable name.
+        """
+        if self.slots is not None and var_name in self.slots:
+            self.emit(f'SLOT_FETCH {self.slots[var_name]}')
+        else:
+            self.emit(f'{var_name} FETCH')
+
+    def emit_store(self, var_name):
+        """
+        Emit code storing the value on the stack to a variable.
+
+        Parameters:
+            var_name (str): The variable name.
+        """
+        if self.slots is not None and var_name in self.slots:
+            self.emit(f'SLOT_STORE {self.slots[var_name]}')
+        else:
+            self.emit(f'{var_name} SWAP STORE')
 
     def get_type(self, type_node):
         """
@@ -161,17 +379,18 @@ class StruixCC(c_ast.NodeVisitor):
             # Handle array declarations
             array_size = self.get_array_size(node.type)
             self.symbol_table[var_name] = ('array', array_size)
-            self.emit(f'VAR {var_name}')
-            self.emit(f'[ {"0 " * array_size}] {var_name} SWAP STORE')  # Initialize array with zeros
+            self.emit_declaration(var_name)
+            self.emit(f'[ {"0 " * array_size}]')  # Initialize array with zeros
+            self.emit_store(var_name)
             if node.init:
                 self.warning(f"Array initialization not fully supported for {var_name}.")
         else:
             if var_name not in self.symbol_table:
                 self.symbol_table[var_name] = var_type
-                self.emit(f'VAR {var_name}')
+                self.emit_declaration(var_name)
                 if node.init:
                     self.visit(node.init)
-                    self.emit(f'{var_name} SWAP STORE')
+                    self.emit_store(var_name)
 
     def get_array_size(self, array_decl):
         """
@@ -205,8 +424,8 @@ class StruixCC(c_ast.NodeVisitor):
             if var_name not in self.symbol_table:
                 # Assume int type if undeclared
                 self.symbol_table[var_name] = 'int'
-                self.emit(f'VAR {var_name}')
-            self.emit(f'{var_name} SWAP STORE')
+                self.emit_declaration(var_name)
+            self.emit_store(var_name)
         elif isinstance(node.lvalue, c_ast.ArrayRef):
             # Handle array element assignment
             self.visit(node.lvalue.name)       # Array variable
@@ -252,7 +471,7 @@ class StruixCC(c_ast.NodeVisitor):
         """
         var_name = node.name
         if var_name in self.symbol_table:
-            self.emit(f'{var_name} FETCH')
+            self.emit_fetch(var_name)
         else:
             # It's a function call or undefined variable
             self.emit(f'{var_name}')
@@ -293,15 +512,13 @@ class StruixCC(c_ast.NodeVisitor):
         self.visit(node.cond)
 
         # Compile true branch
-        true_branch_compiler = StruixCC()
-        true_branch_compiler.symbol_table = self.symbol_table.copy()
+        true_branch_compiler = self.block_compiler()
         true_branch_compiler.visit(node.iftrue)
         true_branch_code = true_branch_compiler.output
 
         # Compile false branch if it exists
         if node.iffalse:
-            false_branch_compiler = StruixCC()
-            false_branch_compiler.symbol_table = self.symbol_table.copy()
+            false_branch_compiler = self.block_compiler()
             false_branch_compiler.visit(node.iffalse)
             false_branch_code = false_branch_compiler.output
 
@@ -316,76 +533,87 @@ class StruixCC(c_ast.NodeVisitor):
 
     def visit_Switch(self, node):
         """
-        Visit a switch statement node and compile it with break flag support.
+        Visit a switch statement node and compile it to a jump table.
+
+        Each statement of the body becomes a block. The case values map to the
+        blocks their labels precede, so the switch value picks where to start in
+        one lookup, and control falls through the blocks that follow until a
+        break.
 
         Parameters:
             node (c_ast.Switch): The switch statement node.
         """
-        # Store the switch expression in a variable
+        # The switch value is left on the stack for SWITCH
         self.visit(node.cond)
-        self.emit('VAR SWITCH_EXPR')
-        self.emit('SWITCH_EXPR SWAP STORE')
 
-        # Initialize BREAK_FLAG
+        switch = {'table': [], 'default': None, 'ends': [], 'blocks': [], 'labels': []}
+        items = (node.stmt.block_items or []) if isinstance(node.stmt, c_ast.Compound) else [node.stmt]
+        for stmt in items:
+            self.compile_switch_item(stmt, switch)
+        blocks = switch['blocks']
+        # Labels without a block to run jump past the last one
+        switch['table'] = [str(len(blocks)) if entry is None else entry for entry in switch['table']]
+        default = len(blocks) if switch['default'] is None else switch['default']
+
+        # BREAK_FLAG is set by breaks nested within statements, and cleared by SWITCH
         self.emit('VAR BREAK_FLAG')
-        self.emit('BREAK_FLAG FALSE STORE')  # Initially set to False
-
-        # Process cases
-        self.case_blocks = []
-        self.default_block = None
-
-        # Visit the switch body to collect case/default blocks
-        self.visit(node.stmt)
-
-        # Compile cases in reverse order with break logic
-        for case_value, case_code in reversed(self.case_blocks):
-            self.emit('SWITCH_EXPR FETCH')
-            self.emit(f'{case_value}')
-            self.emit('==')
-            self.emit('BREAK_FLAG FETCH NOT AND')  # Ensure case executes only if BREAK_FLAG is False
-            self.emit(f'[ {" ".join(case_code)} ]')
-            self.emit('IFTRUE')
+        self.emit(f'SWITCH BREAK_FLAG [ {" ".join(switch["table"])} ] {default} '
+                  f'[ {" ".join(switch["ends"])} ]')
+        self.emit(f'[ {" ".join(f"[ {code} ]" for code in blocks)} ]')
 
-        # Add the default case at the end
-        if self.default_block:
-            self.emit('BREAK_FLAG FETCH NOT')
-            self.emit(f'[ {" ".join(self.default_block)} ]')
-            self.emit('IFTRUE')
+    def compile_switch_item(self, stmt, switch):
+        """
+        Compile a statement at the top level of a switch body, recording its labels.
+
+        Parameters:
+            stmt (c_ast.Node): The statement.
+            switch (dict): The case table, default and break positions, blocks compiled so far,
+                and the labels not yet followed by a block.
+        """
+        position = len(switch['blocks'])
+        if isinstance(stmt, c_ast.Case):
+            switch['table'] += [self.evaluate_constant(stmt.expr), str(position)]
+            switch['labels'].append(len(switch['table']) - 1)
+        elif isinstance(stmt, c_ast.Default):
+            switch['default'] = position
+            switch['labels'].append('default')
+        elif isinstance(stmt, c_ast.Break):
+            # A break ends what runs from earlier labels, and labels right before it run nothing
+            switch['ends'].append(str(position))
+            for label in switch['labels']:
+                if label == 'default':
+                    switch['default'] = None
+                else:
+                    switch['table'][label] = None
+            switch['labels'] = []
+            return
+        else:
+            compiler = self.block_compiler()
+            compiler.visit(stmt)
+            switch['blocks'].append(" ".join(compiler.output))
+            switch['labels'] = []
+            return
+        # Statements following a label, and labels stacked on it
+        for labeled in stmt.stmts or []:
+            self.compile_switch_item(labeled, switch)
 
     def visit_Case(self, node):
         """
-        Visit a case label and compile its body.
+        Report a case label that is not at the top level of a switch body.
 
         Parameters:
             node (c_ast.Case): The case node.
         """
-        # Get the case value
-        case_value = self.evaluate_constant(node.expr)
-
-        # Compile the case body
-        case_body_compiler = StruixCC()
-        case_body_compiler.symbol_table = self.symbol_table.copy()
-        for stmt in node.stmts or []:
-            case_body_compiler.visit(stmt)
-
-        # Append case block
-        self.case_blocks.append((case_value, case_body_compiler.output))
+        self.error("Case labels are only supported directly within a switch body.")
 
     def visit_Default(self, node):
         """
-        Visit a default label and compile its body.
+        Report a default label that is not at the top level of a switch body.
 
         Parameters:
             node (c_ast.Default): The default node.
         """
-        # Compile the default case body
-        default_body_compiler = StruixCC()
-        default_body_compiler.symbol_table = self.symbol_table.copy()
-        for stmt in node.stmts or []:
-            default_body_compiler.visit(stmt)
-
-        # Store the default block
-        self.default_block = default_body_compiler.output
+        self.error("Default labels are only supported directly within a switch body.")
 
     def emit_flag_reset(self, flag_name):
         """Helper to reset a flag"""
@@ -426,14 +654,12 @@ class StruixCC(c_ast.NodeVisitor):
             node (c_ast.While): The while loop node.
         """
         # Compile the condition
-        cond_compiler = StruixCC()
-        cond_compiler.symbol_table = self.symbol_table.copy()
+        cond_compiler = self.block_compiler()
         cond_compiler.visit(node.cond)
         cond_code = cond_compiler.output
 
         # Compile the loop body
-        body_compiler = StruixCC()
-        body_compiler.symbol_table = self.symbol_table.copy()
+        body_compiler = self.block_compiler()
         body_compiler.visit(node.stmt)
         body_code = body_compiler.output
 
@@ -464,14 +690,12 @@ class StruixCC(c_ast.NodeVisitor):
         Visit a do-while loop node and compile it.
         """
         # Compile condition
-        cond_compiler = StruixCC()
-        cond_compiler.symbol_table = self.symbol_table.copy()
+        cond_compiler = self.block_compiler()
         cond_compiler.visit(node.cond)
         cond_code = cond_compiler.output
 
         # Compile loop body
-        body_compiler = StruixCC()
-        body_compiler.symbol_table = self.symbol_table.copy()
+        body_compiler = self.block_compiler()
         body_compiler.visit(node.stmt)
         body_code = body_compiler.output
 
@@ -492,8 +716,7 @@ class StruixCC(c_ast.NodeVisitor):
             self.visit(node.init)
 
         # Compile condition
-        cond_compiler = StruixCC()
-        cond_compiler.symbol_table = self.symbol_table.copy()
+        cond_compiler = self.block_compiler()
         if node.cond:
             cond_compiler.visit(node.cond)
         else:
@@ -501,15 +724,13 @@ class StruixCC(c_ast.NodeVisitor):
         cond_code = cond_compiler.output
 
         # Compile increment
-        next_compiler = StruixCC()
-        next_compiler.symbol_table = self.symbol_table.copy()
+        next_compiler = self.block_compiler()
         if node.next:
             next_compiler.visit(node.next)
         next_code = next_compiler.output
 
         # Compile loop body
-        body_compiler = StruixCC()
-        body_compiler.symbol_table = self.symbol_table.copy()
+        body_compiler = self.block_compiler()
         body_compiler.visit(node.stmt)
         body_code = body_compiler.output
 
@@ -607,14 +828,14 @@ class StruixCC(c_ast.NodeVisitor):
             self.emit('1')
             self.emit('+')
             self.store_variable(node.expr)
-            self.emit(f'{self.get_variable_name(node.expr)} FETCH')
+            self.emit_fetch(self.get_variable_name(node.expr))
         elif op == '--':
             # Prefix decrement
             self.visit(node.expr)
             self.emit('1')
             self.emit('-')
             self.store_variable(node.expr)
-            self.emit(f'{self.get_variable_name(node.expr)} FETCH')
+            self.emit_fetch(self.get_variable_name(node.expr))
         elif op == '-':
             # Unary minus
             self.visit(node.expr)
@@ -639,7 +860,7 @@ class StruixCC(c_ast.NodeVisitor):
         """
         var_name = self.get_variable_name(expr)
         if var_name:
-            self.emit(f'{var_name} SWAP STORE')
+            self.emit_store(var_name)
         else:
             self.error("Unsupported expression for increment/decrement.")
 
@@ -712,14 +933,12 @@ class StruixCC(c_ast.NodeVisitor):
         self.visit(node.cond)
 
         # Compile true expression
-        true_compiler = StruixCC()
-        true_compiler.symbol_table = self.symbol_table.copy()
+        true_compiler = self.block_compiler()
         true_compiler.visit(node.iftrue)
         true_code = true_compiler.output
 
         # Compile false expression
-        false_compiler = StruixCC()
-        false_compiler.symbol_table = self.symbol_table.copy()
+        false_compiler = self.block_compiler()
         false_compiler.visit(node.iffalse)
         false_code = false_compiler.output
 
@@ -749,3 +968,340 @@ class StruixCC(c_ast.NodeVisitor):
         self.emit("IMPORT struixCC")
         for ext in node.ext:
             self.visit(ext)
+
+
+class IncrementalCompiler:
+    """
+    Compile successive versions of a C program, redoing only the parts that changed.
+
+    The source is split into top-level items, and only items whose text is new
+    are parsed again. The code of function definitions is kept by their text,
+    as it does not depend on the rest of the program. `update` also gives a
+    script redefining only what changed in an interpreter that already ran the
+    previous version: changed items, and every function using them, as words
+    hold the words they call from the time they were defined.
+    """
+
+    def __init__(self):
+        """Initialize the caches of parsed items and generated functions."""
+        self.parsed = {}       # (typedefs, item text) -> AST nodes of the item
+        self.generated = {}    # function text -> (lines, symbol table, printed messages)
+        self.items = None      # Items of the last version compiled
+
+    def compile(self, code):
+        """
+        Compile a version of the program, giving the same code as StruixCC.compile.
+
+        Parameters:
+            code (str): The C source code to compile.
+
+        Returns:
+            str: The compiled code in the toy language.
+
+        Raises:
+            CompilationError: If there are syntax errors or other compilation issues.
+        """
+        items = self.build(code)
+        self.items = items
+        return '\n'.join(['IMPORT struixCC'] + [line for item in items for line in item['lines']])
+
+    def update(self, code):
+        """
+        Compile a version of the program, giving a script that brings an interpreter
+        running the previous version up to date. Without a previous version, this is
+        the whole program. Functions removed from the program stay defined.
+
+        Parameters:
+            code (str): The C source code to compile.
+
+        Returns:
+            str: The redefinition script in the toy language.
+
+        Raises:
+            CompilationError: If there are syntax errors or other compilation issues.
+        """
+        previous = self.items
+        if previous is None:
+            return self.compile(code)
+        items = self.build(code)
+        self.items = items
+        seen = {item['text'] for item in previous}
+        changed = set()
+        redefine = []
+        for item in items:
+            item['redefine'] = item['text'] not in seen
+            if item['redefine']:
+                changed.update(item['names'])
+        # Callers of changed words are redefined too, until no more are found.
+        while True:
+            found = False
+            for item in items:
+                if not item['redefine'] and item['function'] and item['uses'] & changed:
+                    item['redefine'] = found = True
+                    changed.update(item['names'])
+            if not found:
+                break
+        for item in items:
+            if item['redefine']:
+                redefine.extend(item['lines'])
+        return '\n'.join(redefine)
+
+    def parse(self, typedefs, text):
+        """
+        Parse a top-level item, after the typedefs it may use.
+
+        Parameters:
+            typedefs (str): Text of the typedefs preceding the item.
+            text (str): Text of the item.
+
+        Returns:
+            list[c_ast.Node]: The AST nodes of the item.
+        """
+        key = (typedefs, text)
+        nodes = self.parsed.get(key)
+        if nodes is None:
+            ast = shared_parser().parse(typedefs + text)
+            prefix = len(shared_parser().parse(typedefs).ext) if typedefs else 0
+            nodes = self.parsed[key] = ast.ext[prefix:]
+        return nodes
+
+    def build(self, code):
+        """
+        Compile the top-level items of a version of the program.
+
+        Parameters:
+            code (str): The C source code to compile.
+
+        Returns:
+            list[dict]: Per item its text, declared and used names, and generated lines.
+        """
+        cleaned_code = remove_comments(code)
+        outer = getattr(_local, 'messages', None), getattr(_local, 'quiet', False)
+        # Messages are held back until the whole program compiles, so none are printed twice.
+        _local.messages, _local.quiet = messages, _ = [], True
+        try:
+            items = self.build_items(cleaned_code, messages)
+        except (c_parser.ParseError, CompilationError):
+            failed = True
+        else:
+            failed = False
+        finally:
+            _local.messages, _local.quiet = outer
+        if failed:
+            # Compiled as a whole, errors are reported just as without incremental mode. Should the
+            # program compile after all, it is kept as a single item.
+            compiler = StruixCC(use_cache=False)
+            compiler.compile(code)
+            return [{'text': cleaned_code, 'function': False, 'names': set(), 'uses': set(),
+                     'lines': compiler.output[1:]}]
+        for message in messages:
+            print(message, file=sys.stderr)
+        # Only the items of the current version are kept, so the caches do not grow with each edit.
+        texts = {item['text'] for item in items}
+        self.parsed = {key: nodes for key, nodes in self.parsed.items() if key[1] in texts}
+        self.generated = {text: generated for text, generated in self.generated.items() if text in texts}
+        return items
+
+    def build_items(self, cleaned_code, messages):
+        """
+        Compile the top-level items of C code without comments.
+
+        Parameters:
+            cleaned_code (str): The C code.
+            messages (list[str]): Messages of the compilation, extended with those of each item.
+
+        Returns:
+            list[dict]: The items, as given by build.
+        """
+        compiler = StruixCC(use_cache=False)
+        typedefs = ''
+        items = []
+        for text in split_top_level(cleaned_code):
+            nodes = self.parse(typedefs, text)
+            item = {'text': text, 'function': False, 'names': set(), 'uses': set()}
+            if len(nodes) == 1 and isinstance(nodes[0], c_ast.FuncDef):
+                node = nodes[0]
+                generated = self.generated.get(text)
+                if generated is None:
+                    function_compiler = StruixCC(use_cache=False)
+                    start = len(messages)
+                    function_compiler.visit(node)
+                    if function_compiler.errors:
+                        raise CompilationError(', '.join(function_compiler.errors))
+                    generated = (function_compiler.output, function_compiler.symbol_table,
+                                 (node.decl.name, referenced_names(node.body)), tuple(messages[start:]))
+                    self.generated[text] = generated
+                else:
+                    messages.extend(generated[3])
+                lines, symbol_table, (name, uses), _ = generated
+                compiler.symbol_table = dict(symbol_table)
+                item.update(function=True, lines=lines, names={name}, uses=uses)
+            else:
+                start = len(compiler.output)
+                for node in nodes:
+                    compiler.visit(node)
+                    if isinstance(node, c_ast.Decl) and node.name:
+                        item['names'].add(node.name)
+                if compiler.errors:
+                    raise CompilationError(', '.join(compiler.errors))
+                item['lines'] = compiler.output[start:]
+                if text.lstrip().startswith('typedef'):
+                    typedefs += text
+            items.append(item)
+        return items
+
+
+def compile_file(path):
+    """
+    Compile a C source file, capturing the messages printed while compiling.
+
+    Parameters:
+        path (str): Path of the C source file.
+
+    Returns:
+        dict: The file's 'path', its compiled 'code' (None on failure), the 'error'
+        if it failed, its printed 'messages' and the compile 'time' in seconds.
+    """
+    result = {'path': path, 'code': None, 'error': None, 'messages': [], 'time': 0.0}
+    try:
+        with open(path, 'r') as f:
+            code = f.read()
+    except OSError as e:
+        result['error'] = str(e)
+        return result
+    messages = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stderr(messages):
+            result['code'] = StruixCC().compile(code)
+    except CompilationError as e:
+        result['error'] = str(e)
+    result['time'] = time.perf_counter() - start
+    result['messages'] = messages.getvalue().splitlines()
+    return result
+
+def compile_files(paths, jobs=None):
+    """
+    Compile C source files across a pool of worker processes.
+
+    Parameters:
+        paths (list[str]): Paths of the C source files.
+        jobs (int): Number of worker processes (default: number of CPUs).
+
+    Yields:
+        dict: The result of each file as given by compile_file, in the order of paths.
+    """
+    if jobs == 1 or len(paths) <= 1:
+        # Starting workers costs more than compiling a single file.
+        yield from map(compile_file, paths)
+        return
+    with multiprocessing.Pool(min(jobs or os.cpu_count() or 1, len(paths))) as pool:
+        yield from pool.imap(compile_file, paths)
+
+_token_pattern = re.compile(r'"(?:\\.|[^"\\])*"|\S+')
+
+def rename_words(code, names):
+    """
+    Rename words in struixLang code, leaving string literals alone.
+
+    Parameters:
+        code (str): The struixLang code.
+        names (dict): New names by old name.
+
+    Returns:
+        str: The code with the words renamed.
+    """
+    return _token_pattern.sub(lambda match: names.get(match.group(), match.group()), code)
+
+def link(units):
+    """
+    Link compiled translation units into one struixLang program.
+
+    Units are joined in order under a single `IMPORT struixCC`. A function defined
+    in several units keeps its name in the first one, as with a C linker taking the
+    first definition it finds; in the others it is renamed to `<unit>.<name>` along
+    with the calls made from within the same unit.
+
+    Parameters:
+        units (list[tuple[str, str]]): The path and compiled code of each unit.
+
+    Returns:
+        tuple[str, list[str]]: The program, and warnings about renamed functions.
+    """
+    stems = collections.Counter()
+    paths = {}
+    definers = {}
+    prepared = []
+    for path, code in units:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        stems[stem] += 1
+        if stems[stem] > 1:
+            stem = f"{stem}{stems[stem]}"
+        paths[stem] = path
+        lines = [line for line in code.split('\n') if line.strip() != 'IMPORT struixCC']
+        defined = [line.split()[1] for line in lines if line.startswith('DEF ') and len(line.split()) > 1]
+        for name in defined:
+            definers.setdefault(name, [])
+            if stem not in definers[name]:
+                definers[name].append(stem)
+        prepared.append((path, stem, '\n'.join(lines), defined))
+
+    output = ['IMPORT struixCC']
+    warnings = []
+    for path, stem, code, defined in prepared:
+        names = {name: f"{stem}.{name}" for name in defined if definers[name][0] != stem}
+        for name, renamed in names.items():
+            warnings.append(f"Function '{name}' of {path} is also defined in {paths[definers[name][0]]}; "
+                            f"renamed to '{renamed}'.")
+        output.append(rename_words(code, names) if names else code)
+    return '\n'.join(part for part in output if part), warnings
+
+def main():
+    parser = argparse.ArgumentParser(description='Compiles C programs to struixLang.')
+    parser.add_argument('sources', nargs='+', metavar='source',
+                        help='C source files, compiled in parallel and linked into one program in order')
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='write the program to FILE (default: standard output)')
+    parser.add_argument('-x', '--execute', action='store_true',
+                        help="run the program and its 'main' function, printing the stack")
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='number of worker processes (default: number of CPUs)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = []
+    for result in compile_files(args.sources, args.jobs):
+        results.append(result)
+        status = 'FAILED' if result['error'] else 'ok'
+        print(f"==> {result['path']} [{status}, {result['time'] * 1e3:.2f} ms]", file=sys.stderr)
+        for message in result['messages']:
+            print(message, file=sys.stderr)
+        if result['error']:
+            print(f"Error: {result['error']}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if result['error'])
+    if len(results) > 1 or failed:
+        print(f"{len(results)} files in {elapsed:.2f}s, {failed} failed.", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+    program, warnings = link([(result['path'], result['code']) for result in results])
+    for warning in warnings:
+        print(f"Warning: {warning}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(program + '\n')
+    elif not args.execute:
+        print(program)
+    if args.execute:
+        from struixLang.struixTerp import Terp
+        from struixLang.struixPrimitives import AddWords
+        terp = Terp()
+        AddWords(terp)
+        terp.run(program)
+        terp.run('main')
+        print(' '.join(repr(value) for value in terp.stack))
+
+
+if __name__ == '__main__':
+    main()
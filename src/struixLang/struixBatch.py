@@ -0,0 +1,143 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+import contextlib
+import glob
+import io
+import multiprocessing
+import os
+import pickle
+import signal
+import time
+
+from . import struixTerp, struixPrimitives
+
+
+class ScriptTimeout(BaseException):
+    ''' Raised when a script runs past its time limit.
+
+    Derives from BaseException so that the interpreter does not wrap it. '''
+
+
+def warmTerp(binding='deep'):
+    ''' Creates an interpreter with all built-in words and libraries loaded. '''
+    with contextlib.redirect_stdout(io.StringIO()):
+        terp = struixTerp.Terp(binding)
+        struixPrimitives.AddWords(terp)
+    return terp
+
+
+def onTimeout(signum, frame):
+    raise ScriptTimeout()
+
+
+def execute(terp, snapshot, source, timeout=None):
+    ''' Runs source on a restored interpreter, capturing its output and final stack. '''
+    terp.restore(snapshot)
+    result = {'error': None, 'line': None, 'column': None}
+    output = io.StringIO()
+    canAlarm = timeout is not None and hasattr(signal, 'setitimer')
+    if canAlarm:
+        signal.signal(signal.SIGALRM, onTimeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            terp.run(source)
+    except ScriptTimeout:
+        result['error'] = 'Exceeded time limit of {} seconds'.format(timeout)
+        result['timeout'] = True
+    except struixTerp.StruixError as e:
+        result.update(error=str(e), line=e.line, column=e.column)
+    except BaseException as e:
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+    finally:
+        if canAlarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    result['time'] = time.perf_counter() - start
+    result['output'] = output.getvalue()
+    result['stack'] = list(terp.scopedStacks[0])
+    return result
+
+
+def isolate(terp, snapshot, source, timeout=None):
+    ''' Runs source as execute does, in a forked copy of the process where fork is available.
+
+    Restoring the dictionary leaves the values of its variables, memo tables and
+    translations of hot words as scripts changed them; the forked copy takes all
+    of them along when it exits. The final stack is given as the repr of each value. '''
+    if not hasattr(os, 'fork'):
+        result = execute(terp, snapshot, source, timeout)
+        result['stack'] = [repr(val) for val in result['stack']]
+        return result
+    reader, writer = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(reader)
+            result = execute(terp, snapshot, source, timeout)
+            result['stack'] = [repr(val) for val in result['stack']]
+            with os.fdopen(writer, 'wb') as pipe:
+                pickle.dump(result, pipe, pickle.HIGHEST_PROTOCOL)
+        finally:
+            # The copy never returns to the caller, nor runs its cleanup.
+            os._exit(0)
+    os.close(writer)
+    with os.fdopen(reader, 'rb') as pipe:
+        data = pipe.read()
+    _, status = os.waitpid(pid, 0)
+    try:
+        return pickle.loads(data)
+    except Exception:
+        return {'error': 'Script process ended without a result (status {}).'.format(status),
+                'line': None, 'column': None, 'time': 0.0, 'output': '', 'stack': []}
+
+
+def expandPaths(patterns):
+    ''' Expands directories and glob patterns into a sorted list of script paths. '''
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found = glob.glob(os.path.join(pattern, '**', '*.sx'), recursive=True)
+        else:
+            found = glob.glob(pattern, recursive=True) or [pattern]
+        paths.extend(sorted(found))
+    return paths
+
+
+# Interpreter of a worker process and its pristine dictionary.
+_terp = None
+_snapshot = None
+
+
+def initWorker():
+    ''' Warms up the interpreter of a worker process, unless it was forked from a warm one. '''
+    global _terp, _snapshot
+    if _terp is None:
+        _terp = warmTerp()
+        _snapshot = _terp.snapshot()
+
+
+def runSource(job):
+    ''' Runs a (source, timeout) job on the interpreter of a worker process. '''
+    source, timeout = job
+    return isolate(_terp, _snapshot, source, timeout)
+
+
+def runScript(job):
+    ''' Runs a (path, timeout) job on the interpreter of a worker process. '''
+    path, timeout = job
+    try:
+        with open(path, 'r') as f:
+            source = f.read()
+    except OSError as e:
+        return {'path': path, 'error': str(e), 'line': None, 'column': None,
+                'time': 0.0, 'output': '', 'stack': []}
+    result = runSource((source, timeout))
+    result['path'] = path
+    return result
+
+
+def runBatch(paths, jobs=None, timeout=None):
+    ''' Runs scripts across a pool of warmed interpreters, yielding results in order. '''
+    with multiprocessing.Pool(jobs, initializer=initWorker) as pool:
+        yield from pool.imap(runScript, [(path, timeout) for path in paths])
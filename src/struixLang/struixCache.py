@@ -0,0 +1,291 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+''' Cache of compiled scripts, in the manner of __pycache__.
+
+The first run of a script records each top-level statement in compiled form:
+the words it runs, with literals and word references resolved, and for
+statements like DEF, VAR and IMPORT the definitions and values they made
+while reading the source. Later runs of the same source replay the record
+without lexing or compiling anything.
+
+Records are keyed by a digest of the source, of the interpreter's own
+sources and of its binding, and are kept in a directory of bounded size,
+evicting those used least recently. Scripts doing what a record cannot
+repeat, like words that read the source while running, are not cached; their
+record only says so, and they run from source without being recorded again. '''
+
+import copy
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import traceback
+
+from . import struixImage, struixLexer, struixTerp
+
+CACHE_VERSION = 1
+MAGIC = b'SXCACHE\n'
+SUFFIX = '.sxc'
+DEFAULT_DIRECTORY = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'struixLang')
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# Words starting statements that only change the dictionary and push values while compiling.
+DECLARATIONS = ('DEF', 'VAR', 'CONST', 'IMPORT', '#', '[')
+
+# Given by read for the record of a script that cannot be cached.
+UNCACHEABLE = object()
+
+_version = None
+
+
+def interpreterVersion():
+    ''' Gives a digest of the interpreter's own sources, so records go stale when it changes. '''
+    global _version
+    if _version is None:
+        digest = hashlib.sha256(str(CACHE_VERSION).encode())
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.py'):
+                stat = os.stat(os.path.join(directory, name))
+                digest.update('{} {} {}\n'.format(name, stat.st_size, stat.st_mtime_ns).encode())
+        _version = digest.hexdigest()
+    return _version
+
+
+def cacheKey(terp, text, salt=''):
+    ''' Gives the key of the record of a script run by an interpreter. '''
+    digest = hashlib.sha256()
+    for part in (interpreterVersion(), 'deep' if terp.bindings is None else 'shallow', salt, text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def recordHeader(terp, cacheable=True):
+    ''' Gives the header of a record, with the libraries the script imported. '''
+    return {
+        'version': CACHE_VERSION,
+        'cacheable': cacheable,
+        'libraries': {name: struixImage.libraryDigest(name) for name in terp.libraries}
+    }
+
+
+def failure(error, word, line, column):
+    ''' Reports an error at a word of a script, as Terp.run does. '''
+    traceback.print_exc()
+    return struixTerp.StruixError(f"Error processing word '{word}' at line {line}, column {column}: {error}",
+                                  word, line, column)
+
+
+class Recorder:
+    ''' Runs a script, recording its top-level statements for replaying them later. '''
+
+    def __init__(self, terp):
+        self.terp = terp
+        self.words = terp.snapshot()
+        self.buffer = io.BytesIO()
+        self.pickler = struixImage.ImagePickler(self.buffer, terp, self.words)
+        self.declarations = [terp.primitives.get(name) for name in DECLARATIONS]
+        self.cacheable = True
+
+    def add(self, op):
+        ''' Pickles a statement as soon as it is done, before later ones change its values. '''
+        if not self.cacheable:
+            return
+        try:
+            self.pickler.dump(op)
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError, struixImage.ImageError):
+            self.cacheable = False
+
+    def declares(self, item, lexer):
+        ''' Checks if a statement starting with an item, read from a lexer, only declares things. '''
+        if not any(item is word for word in self.declarations):
+            return False
+        if item is self.terp.primitives.get('CONST'):
+            # The value of a constant may be a word, which runs while compiling.
+            lexer.nextWord()
+            lexer.nextWord()
+            value = lexer.nextWord()
+            return value[:1] in ('"', "'") or self.terp.parseNumber(value) is not None
+        return True
+
+    def read(self):
+        ''' Reads and compiles the next word. '''
+        terp = self.terp
+        word = terp.lexer.nextWord()
+        site = (terp.lexer.line_number, terp.lexer.column_number - len(word))
+        try:
+            return word, site, terp.compile(word)
+        except Exception as e:
+            raise failure(e, word, *site) from e
+
+    def interpret(self, word, site, item):
+        ''' Interprets a compiled word, as Terp.run does. '''
+        terp = self.terp
+        try:
+            terp.interpret(item)
+            if isinstance(terp.stack, struixTerp.CompileBuffer):
+                terp.stack.mark(site)
+        except Exception as e:
+            raise failure(e, word, *site) from e
+
+    def step(self):
+        ''' Reads, compiles and interprets the next word. '''
+        self.interpret(*self.read())
+
+    def run(self, text):
+        ''' Runs a script, giving its record, or None if it cannot be replayed. '''
+        terp = self.terp
+        terp.lexerQueue.append(terp.lexer)
+        terp.lexer = struixLexer.Lexer(text)
+        try:
+            while terp.lexer.peekWord():
+                if not self.cacheable:
+                    self.step()
+                    continue
+                lexer = copy.copy(terp.lexer)
+                word, site, item = self.read()
+                if not getattr(item, '__dict__', {}).get('immediate'):
+                    position = terp.lexer.pos
+                    self.interpret(word, site, item)
+                    # Words reading the source while running cannot be replayed without it.
+                    if terp.lexer.pos != position or terp.isCompiling():
+                        self.cacheable = False
+                    self.add(('run', item, word, site))
+                    continue
+                declares = self.declares(item, lexer)
+                before = terp.snapshot()
+                stack = terp.stack
+                depth = len(stack)
+                libraries = len(terp.libraries)
+                self.interpret(word, site, item)
+                while terp.isCompiling() and terp.lexer.peekWord():
+                    self.step()
+                if not declares or terp.stack is not stack or len(stack) < depth:
+                    self.cacheable = False
+                    continue
+                words = terp.snapshot()
+                # Words compare by identity, so this finds the names bound anew, in order.
+                new = words.items() - before.items()
+                changed = {name: word for name, word in words.items() if (name, word) in new}
+                sites = {name: terp.definitionSites[name] for name in changed if name in terp.definitionSites}
+                if changed or len(stack) > depth:
+                    self.add(('declare', changed, stack[depth:], terp.lastDefined, sites,
+                              terp.libraries[libraries:]))
+        finally:
+            terp.lexer = terp.lexerQueue.pop()
+        if not self.cacheable:
+            return None
+        return MAGIC + pickle.dumps(recordHeader(terp), pickle.HIGHEST_PROTOCOL) + self.buffer.getvalue() + \
+            pickle.dumps(None, pickle.HIGHEST_PROTOCOL)
+
+
+def read(terp, path):
+    ''' Loads the statements of a record, or gives None if it is missing, stale or invalid.
+
+    Gives UNCACHEABLE if the record marks a script that cannot be cached. '''
+    try:
+        with open(path, 'rb') as record:
+            if record.read(len(MAGIC)) != MAGIC:
+                return None
+            header = pickle.load(record)
+            if header.get('version') != CACHE_VERSION or struixImage.staleLibrary(header['libraries']):
+                return None
+            if not header.get('cacheable', True):
+                return UNCACHEABLE
+            unpickler = struixImage.ImageUnpickler(record, terp, terp.snapshot())
+            ops = []
+            while (op := unpickler.load()) is not None:
+                ops.append(op)
+            return ops
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Broken records are dropped, to be written again.
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+
+def replay(terp, ops):
+    ''' Repeats the recorded statements of a script. '''
+    for op in ops:
+        if op[0] == 'run':
+            item, word, site = op[1:]
+            try:
+                terp.interpret(item)
+            except Exception as e:
+                raise failure(e, word, *site) from e
+        else:
+            changed, pushed, lastDefined, sites, libraries = op[1:]
+            for name, word in changed.items():
+                terp.define(name, word)
+            terp.definitionSites.update(sites)
+            terp.lastDefined = lastDefined
+            terp.libraries.extend(libraries)
+            terp.stack.extend(pushed)
+
+
+def write(directory, path, record):
+    ''' Writes a record in place at once, so concurrent runs never read a partial one. '''
+    os.makedirs(directory, exist_ok=True)
+    handle, partial = tempfile.mkstemp(suffix='.partial', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(record)
+        os.replace(partial, path)
+    except BaseException:
+        os.remove(partial)
+        raise
+
+
+def evict(directory, maxSize):
+    ''' Removes the records used least recently until the cache fits its size. '''
+    records = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(SUFFIX):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            records.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in records)
+    for _, size, path in sorted(records):
+        if total <= maxSize:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+def run(terp, text, directory=DEFAULT_DIRECTORY, maxSize=DEFAULT_MAX_SIZE, salt=''):
+    ''' Runs a script, replaying its record from the cache if there is one, else recording it. '''
+    path = os.path.join(directory, cacheKey(terp, text, salt) + SUFFIX)
+    ops = read(terp, path)
+    if ops is not None:
+        try:
+            # Records are evicted by their modification time, which marks when they were last used.
+            os.utime(path)
+        except OSError:
+            pass
+        if ops is UNCACHEABLE:
+            terp.run(text)
+            return False
+        replay(terp, ops)
+        return True
+    record = Recorder(terp).run(text)
+    if record is None:
+        # Later runs skip recording, which costs more than running from source.
+        record = MAGIC + pickle.dumps(recordHeader(terp, cacheable=False), pickle.HIGHEST_PROTOCOL)
+    try:
+        write(directory, path, record)
+        evict(directory, maxSize)
+    except OSError:
+        pass
+    return False
@@ -0,0 +1,207 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+''' Saving and loading interpreter images.
+
+An image holds the global dictionary of an interpreter: the words defined by
+scripts and libraries in compiled form, with variables and constants and
+their values. Starting from an image skips lexing and compiling the sources
+again, and only the built-in word sets are set up.
+
+Images are only loaded by the interpreter version that saved them, keyed on
+the same digest of its sources as the script cache. Built-in words are
+stored by name and looked up in the new interpreter.
+Words made by makeWord are rebuilt from their bodies, and other words that
+immediate words compile into bodies carry a 'recipe' to be made again. Images
+are pickles, so only load images from sources trusted like scripts. '''
+
+import hashlib
+import os
+import pickle
+import types
+
+from . import struixCache, struixPrimitives, struixTerp
+
+MAGIC = b'SXIMAGE\n'
+
+# Attributes of words made by makeWord kept in images; counters and translations start afresh.
+WORD_STATE = ('name', 'immediate', 'source', 'inlines')
+
+# Interpreter an image is being loaded into, for rebuilding its words.
+_terp = None
+
+
+class ImageError(Exception):
+    ''' Error raised for images that cannot be saved, or are invalid or stale when loaded. '''
+
+
+def libraryDigest(name):
+    ''' Gives a digest of the source of a library, to tell when it has changed. '''
+    try:
+        with open('./lib/{}.sxlib'.format(name), 'rb') as lib:
+            return hashlib.sha256(lib.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def staleLibrary(libraries):
+    ''' Gives the first library whose source has changed since its digest was taken, if any. '''
+    for name, digest in libraries.items():
+        if libraryDigest(name) != digest:
+            return name
+    return None
+
+
+def primitive(name):
+    ''' Gives the built-in word of a name in the interpreter being loaded. '''
+    try:
+        return _terp.primitives[name]
+    except KeyError:
+        raise ImageError('Image uses {}, which is not a built-in word here.'.format(name)) from None
+
+
+def uncheckedPrimitive(name):
+    ''' Gives the variant without stack checks of a built-in word. '''
+    return primitive(name).__dict__['unchecked']
+
+
+def setWordState(word, state):
+    ''' Fills in the body and attributes of a word rebuilt from an image. '''
+    code, attrs = state
+    word.__dict__['code'] = code
+    word.__dict__.update(attrs)
+    for name in attrs.get('inlines', ()):
+        _terp.optimizer.dependents[name].add(word)
+
+
+def namedObjects(words):
+    ''' Keys the words of a dictionary, and the variables and constants they access, by name. '''
+    named = {}
+    for name, word in words.items():
+        named[('word', name)] = word
+        if isinstance(word, types.MethodType):
+            named[('owner', name)] = word.__self__
+    return named
+
+
+class ImagePickler(pickle.Pickler):
+    ''' Pickles the functions found in dictionaries and bodies by how to make them again. '''
+
+    def __init__(self, file, terp, words=None):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.primitives = terp.primitives
+        # Words of a given dictionary are saved by name, to be found again when loading.
+        self.names = {id(obj): key for key, obj in namedObjects(words or {}).items()}
+
+    def persistent_id(self, obj):
+        return self.names.get(id(obj))
+
+    def reducer_override(self, obj):
+        if type(obj) is not types.FunctionType:
+            return NotImplemented
+        attrs = obj.__dict__
+        name = attrs.get('name')
+        word = self.primitives.get(name)
+        if word is obj:
+            return primitive, (name,)
+        if word is not None and word.__dict__.get('unchecked') is obj:
+            return uncheckedPrimitive, (name,)
+        if 'recipe' in attrs:
+            return attrs['recipe']
+        if 'imm' in attrs:
+            code = attrs['code']
+            if not isinstance(code, list):
+                return struixPrimitives.AddWords.makeWord, (code, attrs['imm'])
+            # The body is filled in after the word is memoized, so recursive words can refer to it.
+            state = {key: attrs[key] for key in WORD_STATE if key in attrs}
+            return (struixPrimitives.AddWords.makeWord, ([], attrs['imm']),
+                    (list(code), state), None, None, setWordState)
+        if '<locals>' in obj.__qualname__:
+            raise ImageError('Cannot save {} in an image.'.format(name or obj.__qualname__))
+        # Functions of modules, like the ones rebuilding words, are saved by reference.
+        return NotImplemented
+
+
+class ImageUnpickler(pickle.Unpickler):
+    ''' Unpickles words into an interpreter, finding the ones saved by name in its dictionary. '''
+
+    def __init__(self, file, terp, words=None):
+        super().__init__(file)
+        self.terp = terp
+        self.named = namedObjects(words or {})
+
+    def persistent_load(self, key):
+        try:
+            return self.named[key]
+        except KeyError:
+            raise ImageError('Image uses {}, which is not defined here.'.format(key[1])) from None
+
+    def load(self):
+        global _terp
+        _terp = self.terp
+        try:
+            return super().load()
+        finally:
+            _terp = None
+
+
+def save(terp, path):
+    ''' Saves the global dictionary of an interpreter to an image file. '''
+    header = {
+        # Compiled words only make sense to the interpreter that saved them.
+        'version': struixCache.interpreterVersion(),
+        'binding': 'deep' if terp.bindings is None else 'shallow',
+        'libraries': {name: libraryDigest(name) for name in terp.libraries}
+    }
+    contents = {
+        'words': terp.snapshot(),
+        'libraries': list(terp.libraries),
+        'definitionSites': terp.definitionSites,
+        'lastDefined': terp.lastDefined
+    }
+    # Written aside first, so a failed save leaves an earlier image in place.
+    partial = '{}.partial'.format(path)
+    try:
+        with open(partial, 'wb') as image:
+            image.write(MAGIC)
+            pickle.dump(header, image, pickle.HIGHEST_PROTOCOL)
+            ImagePickler(image, terp).dump(contents)
+    except (pickle.PicklingError, TypeError, AttributeError, RecursionError) as error:
+        os.remove(partial)
+        raise ImageError('Cannot save image: {}'.format(error)) from None
+    except BaseException:
+        os.remove(partial)
+        raise
+    os.replace(partial, path)
+
+
+def load(path, ENABLE_UNSAFE_OPERATIONS=False, binding=None):
+    ''' Makes an interpreter from an image file, with the built-in word sets set up. '''
+    with open(path, 'rb') as image:
+        if image.read(len(MAGIC)) != MAGIC:
+            raise ImageError('{} is not a struixLang image.'.format(path))
+        try:
+            header = pickle.load(image)
+        except Exception as error:
+            raise ImageError('Invalid image {}: {}'.format(path, error)) from None
+        if header.get('version') != struixCache.interpreterVersion():
+            raise ImageError('Image {} was saved by another version of the interpreter.'.format(path))
+        if (name := staleLibrary(header['libraries'])) is not None:
+            raise ImageError('Image {} is stale, library {} has changed.'.format(path, name))
+
+        terp = struixTerp.Terp(binding or header['binding'])
+        # Libraries are in the image already, so only the word sets written in Python are set up.
+        wordSets = [name for name in struixPrimitives.AddWords.DEFAULT_WORD_SETS
+                    if hasattr(struixPrimitives.AddWords, 'words4' + name)]
+        struixPrimitives.AddWords(terp, ENABLE_UNSAFE_OPERATIONS, wordSets)
+        try:
+            contents = ImageUnpickler(image, terp).load()
+        except ImageError:
+            raise
+        except Exception as error:
+            raise ImageError('Invalid image {}: {}'.format(path, error)) from None
+
+    terp.restore(contents['words'])
+    terp.libraries = contents['libraries']
+    terp.definitionSites = contents['definitionSites']
+    terp.lastDefined = contents['lastDefined']
+    return terp
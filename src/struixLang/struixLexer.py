@@ -1,4 +1,5 @@
 import string
+import sys
 
 class Lexer:
     ''' Lexer for struixLang with line and column tracking. '''
@@ -54,7 +55,8 @@ class Lexer:
                 break
             word += char
             self.eat_char()
-        return word
+        # Interned words share one string with the dictionary keys, so lookups compare by identity.
+        return sys.intern(word)
 
     def skipWhitespace(self):
         ''' Skips all consecutive whitespaces from current position. '''
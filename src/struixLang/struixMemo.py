@@ -0,0 +1,86 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+import collections
+
+DEFAULT_MAXSIZE = 128
+
+
+class Memo:
+    ''' Bounded cache of the results of a word, evicting the least recently used. '''
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        ''' Gives (True, result) for a cached key, else (False, None). '''
+        try:
+            result = self.cache[key]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return True, result
+
+    def store(self, key, result):
+        ''' Caches a result, evicting the oldest entry when full. '''
+        if self.maxsize is not None and self.maxsize <= 0:
+            return
+        self.cache[key] = result
+        if self.maxsize is not None and len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+    def clear(self):
+        ''' Empties the cache and resets its statistics. '''
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        ''' Gives the hit, miss and size statistics of the cache. '''
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self.cache), 'maxsize': self.maxsize}
+
+
+def arity(word):
+    ''' Counts the parameters a user-defined word takes with PARAM, or as arguments of its variables and slots. '''
+    code = getattr(word, '__dict__', {}).get('code')
+    if not isinstance(code, list):
+        return 0
+    return sum(1 for item in code
+               if getattr(item, 'argument', False) or getattr(item, '__dict__', {}).get('name') == 'PARAM')
+
+
+def memoize(word, maxsize=DEFAULT_MAXSIZE, memo=None):
+    ''' Wraps a word so results are cached by the arguments it takes from the stack. '''
+    if memo is None:
+        memo = Memo(maxsize)
+    count = arity(word)
+
+    def memoized(terp):
+        stack = terp.stack
+        depth = len(stack)
+        if depth < count:
+            return word(terp)
+        key = tuple(stack[depth - count:])
+        try:
+            found, result = memo.lookup(key)
+        except TypeError:
+            # Unhashable arguments, e.g. lists, are never cached.
+            return word(terp)
+        if found:
+            del stack[depth - count:]
+            stack.append(result)
+            return
+        word(terp)
+        # Only cache calls that consumed their arguments and gave one result.
+        if terp.stack is stack and len(stack) == depth - count + 1:
+            memo.store(key, stack[-1])
+
+    memoized.__dict__['memo'] = memo
+    memoized.__dict__['memoized'] = word
+    memoized.__dict__['recipe'] = (memoize, (word, maxsize, memo))
+    return memoized
@@ -0,0 +1,244 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+''' HTTP client for the networking words.
+
+Requests run on an asyncio event loop owned by a background thread, so any
+number of them can be in flight at once. Connections are kept alive and
+reused per host, and redirects are followed. Callers get a
+concurrent.futures.Future, which the interpreter waits on and the scheduler
+treats as a suspension point. '''
+
+import asyncio
+import collections
+import os
+import ssl
+import threading
+import urllib.parse
+
+DEFAULT_TIMEOUT = 30.0
+MAX_CONNECTIONS_PER_HOST = 10
+MAX_REDIRECTS = 30
+REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class Response:
+    ''' Status, headers and body of an HTTP response. '''
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        ''' Gives the body decoded with the charset of the response. '''
+        charset = 'utf-8'
+        for param in self.headers.get('content-type', '').split(';')[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'charset' and value:
+                charset = value.strip('"')
+        try:
+            return self.body.decode(charset, errors='replace')
+        except LookupError:
+            return self.body.decode('utf-8', errors='replace')
+
+
+class ConnectionPool:
+    ''' Keeps idle keep-alive connections per host and limits connections per host. '''
+
+    def __init__(self, maxPerHost=MAX_CONNECTIONS_PER_HOST):
+        self.maxPerHost = maxPerHost
+        self.idle = collections.defaultdict(list)   # (scheme, host, port) -> [(reader, writer)]
+        self.limits = {}                             # (scheme, host, port) -> semaphore
+        self.sslContext = None
+
+    async def connect(self, key):
+        ''' Gives an idle connection to a host if one is left open, else a new one. '''
+        idle = self.idle[key]
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        if scheme == 'https':
+            if self.sslContext is None:
+                self.sslContext = ssl.create_default_context()
+            reader, writer = await asyncio.open_connection(host, port, ssl=self.sslContext)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return reader, writer, False
+
+    async def request(self, method, url, data=None, headers=None):
+        ''' Sends a request and reads the whole response, following redirects. '''
+        data, contentType = encodeBody(data)
+        if contentType is not None:
+            headers = dict(headers or {}, **{'Content-Type': contentType})
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self.send(method, url, data, headers)
+            location = response.headers.get('location')
+            if response.status not in REDIRECTS or not location:
+                return response
+            url = urllib.parse.urljoin(url, location)
+            # As browsers do, 302 and 303 turn into a GET, and 301 too for a POST; 307 and 308 repeat the request.
+            if response.status in (302, 303) and method != 'HEAD' or response.status == 301 and method == 'POST':
+                method, data, headers = 'GET', None, None
+        raise ConnectionError('Exceeded {} redirects, last to {}.'.format(MAX_REDIRECTS, url))
+
+    async def send(self, method, url, data=None, headers=None):
+        ''' Sends a request and reads the whole response, reusing a pooled connection. '''
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError('Unsupported URL: {}'.format(url))
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        hostHeader = parts.hostname if parts.port is None else '{}:{}'.format(parts.hostname, parts.port)
+        lines = ['{} {} HTTP/1.1'.format(method, target), 'Host: ' + hostHeader,
+                 'Connection: keep-alive', 'Accept-Encoding: identity']
+        if data is not None or method in ('POST', 'PUT', 'PATCH'):
+            lines.append('Content-Length: {}'.format(len(data or b'')))
+        for name, value in (headers or {}).items():
+            lines.append('{}: {}'.format(name, value))
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (data or b'')
+
+        if key not in self.limits:
+            self.limits[key] = asyncio.Semaphore(self.maxPerHost)
+        async with self.limits[key]:
+            while True:
+                reader, writer, reused = await self.connect(key)
+                try:
+                    writer.write(message)
+                    await writer.drain()
+                    response, keepAlive = await readResponse(reader, method)
+                except (ConnectionError, asyncio.IncompleteReadError) as error:
+                    writer.close()
+                    # The server may have dropped an idle connection; retry once on a new one.
+                    if reused:
+                        continue
+                    if isinstance(error, asyncio.IncompleteReadError):
+                        raise ConnectionError('Connection closed by server in the middle of a response.') from None
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                if keepAlive:
+                    self.idle[key].append((reader, writer))
+                else:
+                    writer.close()
+                return response
+
+    def close(self):
+        ''' Closes all idle connections. '''
+        for connections in self.idle.values():
+            for reader, writer in connections:
+                writer.close()
+        self.idle.clear()
+
+
+def encodeBody(data):
+    ''' Gives the bytes of a request body and their content type, form-encoding mappings and pairs. '''
+    if data is None or isinstance(data, bytes):
+        return data, None
+    if isinstance(data, (bytearray, memoryview)):
+        return bytes(data), None
+    if isinstance(data, str):
+        return data.encode('utf-8'), None
+    if isinstance(data, (dict, list, tuple)):
+        try:
+            return urllib.parse.urlencode(data).encode('ascii'), 'application/x-www-form-urlencoded'
+        except (TypeError, ValueError):
+            pass
+    raise TypeError('Cannot send {} as a request body, expected a string, bytes or a dictionary.'.format(
+        type(data).__name__))
+
+
+def parseNumber(text, base, field):
+    ''' Parses a number sent by a server, failing as a broken connection when it is malformed. '''
+    try:
+        return int(text, base)
+    except ValueError:
+        raise ConnectionError('Malformed {} in response: {!r}.'.format(field, text)) from None
+
+
+async def readResponse(reader, method):
+    ''' Reads a response, giving it and whether its connection can be kept alive. '''
+    statusLine = await reader.readline()
+    if not statusLine:
+        raise ConnectionError('Connection closed by server.')
+    version, status, reason = (statusLine.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+    status = parseNumber(status, 10, 'status')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    connection = headers.get('connection', '').lower()
+    keepAlive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+        body = b''
+    elif 'chunked' in headers.get('transfer-encoding', '').lower():
+        chunks = []
+        while True:
+            size = parseNumber((await reader.readline()).split(b';')[0].strip(), 16, 'chunk size')
+            if size == 0:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(parseNumber(headers['content-length'], 10, 'content length'))
+    else:
+        body = await reader.read()
+        keepAlive = False
+    return Response(status, reason, headers, body), keepAlive
+
+
+# Event loop thread and connection pool of this process.
+_loop = None
+_pool = None
+_pid = None
+_lock = threading.Lock()
+
+
+def loop():
+    ''' Gives the event loop of the networking thread, starting it on first use. '''
+    global _loop, _pool, _pid
+    with _lock:
+        # A forked child does not inherit the thread running the parent's loop.
+        if _loop is None or _pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _pool = ConnectionPool()
+            _pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name='struixNetwork', daemon=True).start()
+        return _loop
+
+
+async def timed(coroutine, url, timeout):
+    ''' Awaits a request, failing it once the timeout has passed. '''
+    try:
+        return await asyncio.wait_for(coroutine, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError('Request to {} timed out after {} seconds.'.format(url, timeout)) from None
+
+
+def request(method, url, data=None, timeout=DEFAULT_TIMEOUT):
+    ''' Starts a request, giving a future of its Response. '''
+    eventLoop = loop()
+    return asyncio.run_coroutine_threadsafe(
+        timed(_pool.request(method, url, data), url, timeout), eventLoop)
+
+
+def requestAll(method, urls, timeout=DEFAULT_TIMEOUT):
+    ''' Starts concurrent requests to many URLs, giving a future of their Responses in order. '''
+    eventLoop = loop()
+
+    async def gather():
+        return await asyncio.gather(*[timed(_pool.request(method, url), url, timeout) for url in urls])
+
+    return asyncio.run_coroutine_threadsafe(gather(), eventLoop)
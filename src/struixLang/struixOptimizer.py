@@ -0,0 +1,460 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+''' Tier-up compilation of hot user-defined words.
+
+Words made by AddWords.makeWord count their calls until they tier up. Once a
+word reaches the threshold, its body is translated into a straight-line Python function that
+calls the words of the body directly, instead of dispatching every item
+through Terp.interpret, and runs frequent sequences of primitives as single
+fused steps (superinstructions).
+
+When a body is defined, variable reads (a reference followed by FETCH)
+are lowered to one word bound to the variable, primitives that the body
+provably never underflows are switched to variants without stack checks,
+and provable underflows are reported as warnings. Lists are treated the same
+way the first time they run as blocks, without warnings. The optimized body
+is a copy owned by the word, which keeps the list it was made from as its
+'source', so lists never change by being run.
+
+Small words are also inlined into their callers when END compiles them,
+if running the body in the caller's scope is provably the same as calling
+it: the body only uses primitives with a known stack effect, never reads
+below its own items and leaves exactly one result.
+
+While the profiler runs, translations are detached and no word tiers up, so
+that every word of a body goes through the profiled Terp.interpret.
+
+The optimizer records the dictionary names each translated or inlined body
+refers to, and Terp.define reverts every dependent word to its original
+body when one of those names is redefined. '''
+
+import collections
+import sys
+import types
+import weakref
+
+DEFAULT_THRESHOLD = 50
+CACHE_SIZE = 1024
+INLINE_LIMIT = 8
+
+# Sequences run as one step of a translated body, found with benchmarks/ngram_profile.py.
+# Patterns name primitives, or match VAR for variable references, LOAD for variable reads,
+# SET for variable writes, INT for int literals and LIT for any literal. Templates refer to the matched variables and literals as {v0}, {l0}, ... and to
+# the unfused sequence as {fallback}; CALC evaluates formatted text, so only ints take the
+# fast paths.
+SUPERINSTRUCTIONS = [
+    (('+', 'VAR', 'SWAP', 'STORE'), [
+        'if len(stack) > 1 and type(stack[-1]) is int and type(stack[-2]) is int:',
+        '    {v0}.val = stack.pop() + stack.pop()',
+        'else:',
+        '    {fallback}']),
+    (('VAR', 'SWAP', 'STORE'), [
+        'if not stack:',
+        "    raise IndexError('Not enough items on stack.')",
+        '{v0}.val = stack.pop()']),
+    (('VAR', 'LIT', 'STORE'), [
+        '{v0}.val = {l0}']),
+    (('+', 'SET'), [
+        'if len(stack) > 1 and type(stack[-1]) is int and type(stack[-2]) is int:',
+        '    {v0}.val = stack.pop() + stack.pop()',
+        'else:',
+        '    {fallback}']),
+    (('LIT', 'SET'), [
+        '{v0}.val = {l0}']),
+    (('SET',), [
+        'if not stack:',
+        "    raise IndexError('Not enough items on stack.')",
+        '{v0}.val = stack.pop()']),
+    (('LOAD', 'NOT', 'AND'), [
+        'if stack and type(stack[-1]) in (int, bool):',
+        '    stack[-1] = stack[-1] and not {v0}.val',
+        'else:',
+        '    {fallback}']),
+    (('DUP', 'INT', '+'), [
+        'if stack and type(stack[-1]) is int:',
+        '    push(stack[-1] + {l0})',
+        'else:',
+        '    {fallback}']),
+] + [
+    (('LOAD', 'INT', op), [
+        'value = {v0}.val',
+        'if type(value) is int:',
+        '    push(value ' + op + ' {l0})',
+        'else:',
+        '    {fallback}'])
+    for op in ('+', '-', '*', '<', '>', '<=', '>=', '==', '!=')
+]
+
+# Words whose effect depends on how the body is dispatched.
+UNSAFE_WORDS = {'PYEXEC', 'PYEVAL'}
+
+
+def nameOf(item):
+    ''' Gives the dictionary name of a word in a body, if it has one. '''
+    name = getattr(item, 'name', None)
+    if name is None:
+        name = getattr(getattr(item, '__self__', None), 'name', None)
+    return name if isinstance(name, str) else None
+
+
+def shape(item):
+    ''' Describes a body item the way superinstruction patterns match it. '''
+    if isinstance(item, (types.FunctionType, types.MethodType)):
+        if getattr(item, 'reference', False):
+            return 'VAR'
+        if getattr(item, 'load', False):
+            return 'LOAD'
+        if getattr(item, 'assign', False):
+            return 'SET'
+        if getattr(item, 'constant', False):
+            item = item.__self__.val
+        elif 'code' in getattr(item, '__dict__', {}):
+            return 'WORD'
+        else:
+            return nameOf(item) or '?'
+    return 'INT' if type(item) is int else 'LIT'
+
+
+def matches(pattern, shapes):
+    ''' Checks if the shapes of a sequence of items fit a superinstruction pattern. '''
+    return len(pattern) == len(shapes) and all(
+        want == got or (want == 'LIT' and got == 'INT') for want, got in zip(pattern, shapes))
+
+
+def translatable(code):
+    ''' Checks if a body can run without dispatching its items through Terp.interpret. '''
+    if not isinstance(code, list):
+        return False
+    for item in code:
+        if isinstance(item, (types.FunctionType, types.MethodType)):
+            # Immediate words may switch the interpreter into compile mode.
+            if getattr(item, 'immediate', False) or nameOf(item) in UNSAFE_WORDS:
+                return False
+    return True
+
+
+def effectOf(item):
+    ''' Gives the items a body item takes from and gives to the stack, or None if unknown. '''
+    if isinstance(item, (types.FunctionType, types.MethodType)):
+        effect = getattr(item, 'effect', None)
+        if effect is None and (getattr(item, 'reference', False) or getattr(item, 'constant', False)):
+            return (0, 1)
+        return effect
+    return (0, 1)
+
+
+def followStack(code):
+    ''' Follows a body run on an empty stack, giving the items passed, the depth after them and whether the next underflows. '''
+    depth = 0
+    for index, item in enumerate(code):
+        effect = effectOf(item)
+        if effect is None:
+            return index, depth, False
+        needs, gives = effect
+        if depth < needs:
+            return index, depth, True
+        depth += gives - needs
+    return len(code), depth, False
+
+
+def stackEffect(code):
+    ''' Gives the number of items a body leaves on an empty stack, or None if unknown or underflowing. '''
+    passed, depth, underflow = followStack(code)
+    return depth if passed == len(code) else None
+
+
+def inlinable(word):
+    ''' Checks if splicing the body of a word into its callers keeps their behaviour. '''
+    attrs = getattr(word, '__dict__', {})
+    code = attrs.get('code')
+    return (isinstance(code, list) and len(code) <= INLINE_LIMIT
+            and not attrs.get('imm') and not attrs.get('immediate')
+            and not any(getattr(item, 'argument', False) for item in code)
+            and stackEffect(code) == 1)
+
+
+def translate(code):
+    ''' Generates a function that runs a body like makeWord does, item by item. '''
+    env = {}
+    lines = ['def tiered(terp):',
+             '    terp.newBlockScope()',
+             '    terp.immediate = False',
+             '    stack = terp.stack',
+             '    push = stack.append']
+    pending = []
+
+    def flush():
+        # Runs of plain values are pushed at once.
+        if len(pending) == 1:
+            lines.append('    push({})'.format(pending[0]))
+        elif pending:
+            lines.append('    stack.extend(({},))'.format(', '.join(pending)))
+        pending.clear()
+
+    def bind(index):
+        # Gives the expression for an item in the generated code, and whether it is pushed or called.
+        item = code[index]
+        key = 'k{}'.format(index)
+        if isinstance(item, (types.FunctionType, types.MethodType)):
+            if getattr(item, 'reference', False):
+                # Variables put themselves on the stack.
+                env[key] = item.__self__
+                return key, False
+            if getattr(item, 'load', False):
+                env[key] = item.__self__
+                return key + '.val', False
+            if getattr(item, 'assign', False):
+                env[key] = item.__self__
+                return key + '.store', True
+            if getattr(item, 'constant', False):
+                env[key] = item.__self__.val
+                return key, False
+            env[key] = item
+            return key, True
+        env[key] = item
+        return key, False
+
+    shapes = [shape(item) for item in code]
+    index = 0
+    while index < len(code):
+        for pattern, template in SUPERINSTRUCTIONS:
+            if matches(pattern, shapes[index:index + len(pattern)]):
+                break
+        else:
+            expression, call = bind(index)
+            if call:
+                flush()
+                lines.append('    {}(terp)'.format(expression))
+            else:
+                # Variable reads are delayed past plain values, which cannot change them.
+                pending.append(expression)
+            index += 1
+            continue
+        flush()
+        names = {'fallback': []}
+        counts = {'v': 0, 'l': 0}
+        for offset, want in enumerate(pattern):
+            expression, call = bind(index + offset)
+            names['fallback'].append(
+                '{}(terp)'.format(expression) if call else 'push({})'.format(expression))
+            if want in ('VAR', 'LOAD', 'SET', 'INT', 'LIT'):
+                kind = 'v' if want in ('VAR', 'LOAD', 'SET') else 'l'
+                names['{}{}'.format(kind, counts[kind])] = 'k{}'.format(index + offset)
+                counts[kind] += 1
+        for line in template:
+            indent = ' ' * (4 + len(line) - len(line.lstrip()))
+            if line.strip() == '{fallback}':
+                lines.extend(indent + statement for statement in names['fallback'])
+            else:
+                lines.append(indent + line.strip().format(**names))
+        index += len(pattern)
+    flush()
+    lines += ['    dataStack = terp.popScope()',
+              '    terp.stack.append(dataStack.pop() if dataStack else None)']
+    exec('\n'.join(lines), env)
+    return env['tiered']
+
+
+class Optimizer:
+    ''' Tracks the hot words of an interpreter and their translations. '''
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.cache = collections.OrderedDict()      # id(code) -> (code, tiered)
+        self.prepared = collections.OrderedDict()   # id(code) -> (code, items, optimized, underflow)
+        self.dependents = collections.defaultdict(weakref.WeakSet)
+        self.words = weakref.WeakSet()
+        self.paused = False
+        self.tierUps = 0
+        self.inlined = 0
+        self.deopts = 0
+
+    def reset(self):
+        ''' Goes back to the default threshold and empty caches and counts, as for a restored dictionary. '''
+        self.threshold = DEFAULT_THRESHOLD
+        self.cache.clear()
+        self.prepared.clear()
+        self.words = weakref.WeakSet()
+        self.tierUps = 0
+        self.inlined = 0
+        self.deopts = 0
+        # Words of the dictionary still depend on the names they inlined; dropped words leave empty sets.
+        for name in [name for name, words in self.dependents.items() if not words]:
+            del self.dependents[name]
+
+    def prepare(self, word):
+        ''' Gives a word a lowered and checked copy of its body to run, keeping the body as its source.
+
+        Gives a proven underflow as check does, indexed by the item of the source. '''
+        attrs = word.__dict__
+        code = attrs['code']
+        if not isinstance(code, list) or 'source' in attrs:
+            return None
+        entry = self.prepared.get(id(code))
+        # Lists can be changed after they first ran, e.g. with STORE_ITEM.
+        if (entry is not None and entry[0] is code and len(entry[1]) == len(code)
+                and all(old is new for old, new in zip(entry[1], code))):
+            self.prepared.move_to_end(id(code))
+            optimized, underflow = entry[2], entry[3]
+        else:
+            optimized, kept = self.lower(code)
+            underflow = self.check(optimized)
+            if underflow is not None:
+                underflow = (kept[underflow[0]],) + underflow[1:]
+            self.prepared[id(code)] = (code, tuple(code), optimized, underflow)
+            if len(self.prepared) > CACHE_SIZE:
+                self.prepared.popitem(last=False)
+        attrs['source'] = code
+        attrs['code'] = optimized
+        return underflow
+
+    def lower(self, code):
+        ''' Gives a copy of a body with each variable reference followed by FETCH replaced by a
+        read of the variable, and the index in the body of each item of the copy. '''
+        items = []
+        kept = []
+        for index, item in enumerate(code):
+            if (items and nameOf(item) == 'FETCH' and getattr(item, 'effect', None) == (1, 1)
+                    and getattr(items[-1], 'reference', False)):
+                # VAR resolves names when the body is compiled, so the variable itself is known.
+                items[-1] = items[-1].__self__.fetch
+                continue
+            items.append(item)
+            kept.append(index)
+        return items, kept
+
+    def check(self, code):
+        ''' Switches the primitives of an optimized body that cannot underflow to their unchecked variants.
+
+        The body is followed from an empty stack up to the first word with an unknown effect.
+        Gives (index, needs, depth) for an item proven to underflow, else None. '''
+        if not isinstance(code, list):
+            return None
+        passed, depth, underflow = followStack(code)
+        for index in range(passed):
+            unchecked = getattr(code[index], 'unchecked', None)
+            if unchecked is not None:
+                code[index] = unchecked
+        if underflow:
+            return passed, effectOf(code[passed])[0], depth
+        return None
+
+    def pause(self):
+        ''' Detaches the translations of hot words and stops tier-up, until resumed. '''
+        if self.paused:
+            return
+        self.paused = True
+        for word in self.words:
+            attrs = word.__dict__
+            if attrs['tiered'] is not None:
+                attrs['paused'] = attrs['tiered']
+                attrs['tiered'] = None
+
+    def resume(self):
+        ''' Attaches the translations detached by pause again. '''
+        self.paused = False
+        for word in self.words:
+            attrs = word.__dict__
+            if 'paused' in attrs:
+                attrs['tiered'] = attrs.pop('paused')
+
+    def tierUp(self, word):
+        ''' Translates the body of a hot word, giving the translation or None. '''
+        if self.paused:
+            # Counted again from the start, to tier up once resumed.
+            word.__dict__['calls'] = 0
+            return None
+        code = word.__dict__.get('code')
+        if word.__dict__.get('imm') or not translatable(code):
+            return None
+        entry = self.cache.get(id(code))
+        if entry is not None and entry[0] is code:
+            self.cache.move_to_end(id(code))
+            tiered = entry[1]
+        else:
+            tiered = translate(code)
+            self.cache[id(code)] = (code, tiered)
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(last=False)
+        for item in code:
+            # Variables and constants are resolved to objects that redefinition does not touch.
+            if (getattr(item, 'reference', False) or getattr(item, 'load', False)
+                    or getattr(item, 'assign', False) or getattr(item, 'argument', False)
+                    or getattr(item, 'constant', False)):
+                continue
+            name = nameOf(item)
+            if name is not None:
+                self.dependents[name].add(word)
+        word.__dict__['tiered'] = tiered
+        word.__dict__['tierUps'] = word.__dict__.get('tierUps', 0) + 1
+        self.words.add(word)
+        self.tierUps += 1
+        return tiered
+
+    def inline(self, word):
+        ''' Splices the bodies of small words called by a new, prepared word into its body. '''
+        code = word.__dict__.get('code')
+        if word.__dict__.get('imm') or not isinstance(code, list):
+            return
+        expanded = []
+        names = set()
+        calls = 0
+        for item in code:
+            if isinstance(item, types.FunctionType) and inlinable(item):
+                calls += 1
+                expanded.extend(item.__dict__['code'])
+                names.add(nameOf(item))
+                # Bodies copied from the callee depend on what it inlined itself.
+                names.update(item.__dict__.get('inlines', ()))
+            else:
+                expanded.append(item)
+        if not calls:
+            return
+        names.discard(None)
+        word.__dict__['inlines'] = names
+        word.__dict__['code'] = expanded
+        for name in names:
+            self.dependents[name].add(word)
+        self.inlined += calls
+
+    def deoptimize(self, word):
+        ''' Sends a word back to its original body on the generic path, to be translated again once hot. '''
+        attrs = word.__dict__
+        paused = attrs.pop('paused', None)
+        if 'inlines' not in attrs and attrs.get('tiered') is None and paused is None:
+            return
+        self.cache.pop(id(attrs['code']), None)
+        if 'inlines' in attrs:
+            # Prepared again on its next call, without inlining.
+            attrs['code'] = attrs.pop('source')
+            del attrs['inlines']
+        attrs['tiered'] = None
+        attrs['calls'] = 0
+        attrs['deopts'] = attrs.get('deopts', 0) + 1
+        self.deopts += 1
+
+    def redefined(self, name):
+        ''' Deoptimizes the translated or inlining words that refer to a redefined name. '''
+        words = self.dependents.pop(name, None)
+        if words:
+            for word in list(words):
+                self.deoptimize(word)
+
+    def report(self, file=None):
+        ''' Prints the words that tiered up, with the calls counted before and their deoptimizations. '''
+        file = sys.stdout if file is None else file
+        rows = collections.OrderedDict()
+        for word in sorted(self.words, key=lambda word: -word.__dict__['calls']):
+            name = word.__dict__.get('name', '<block>')
+            calls, tierUps, deopts, active = rows.get(name, (0, 0, 0, 0))
+            rows[name] = (calls + word.__dict__['calls'], tierUps + word.__dict__['tierUps'],
+                          deopts + word.__dict__.get('deopts', 0),
+                          active + (word.__dict__['tiered'] is not None))
+        width = max([len('word')] + [len(name) for name in rows])
+        print('{:<{w}}  {:>10}  {:>8}  {:>8}  {:>8}'.format(
+            'word', 'calls', 'tier-ups', 'deopts', 'tiered', w=width), file=file)
+        for name, (calls, tierUps, deopts, active) in rows.items():
+            print('{:<{w}}  {:>10}  {:>8}  {:>8}  {:>8}'.format(
+                name, calls, tierUps, deopts, active, w=width), file=file)
+        print('{} tier-ups, {} inlined calls, {} deoptimizations'.format(
+            self.tierUps, self.inlined, self.deopts), file=file)
@@ -0,0 +1,77 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+''' Parallel map over lists on a pool of forked interpreter processes.
+
+Compiled words hold Python closures, which cannot be pickled. Workers are
+forked instead, so each one inherits a replica of the interpreter with its
+whole dictionary, and only the items and results cross process boundaries.
+Lists are mapped as blocks, each call running on a stack of its own. '''
+
+import multiprocessing
+import os
+import threading
+
+DEFAULT_THRESHOLD = 64
+
+# Threads of the networking loop and of the scheduler's blocking calls.
+HELPER_THREADS = ('struixNetwork', 'struixIO')
+
+# Interpreter and word being mapped, inherited by the forked workers.
+_job = None
+
+
+def mapItems(terp, word, items):
+    ''' Calls a word with each item, giving the top of the stack it leaves for each. '''
+    saved = (terp.scopedStacks, terp.areScopesFn)
+    # PARAM takes arguments from every enclosing stack, so the caller's are set aside. It finds
+    # stacks by scope depth, so the scopes look like the top level while the word runs.
+    terp.scopedStacks = [[]]
+    terp.stack = terp.scopedStacks[0]
+    terp.areScopesFn = [True]
+    try:
+        results = []
+        for item in items:
+            terp.stack.append(item)
+            word(terp)
+            results.append(terp.stack[-1] if terp.stack else None)
+            terp.stack.clear()
+        return results
+    finally:
+        # A failing word leaves its scope open; popping it also puts back shallow bindings.
+        while terp.getScopeDepth() > 1:
+            terp.popScope()
+        terp.scopedStacks, terp.areScopesFn = saved
+        terp.stack = terp.scopedStacks[-1]
+
+
+def mapChunk(chunk):
+    ''' Maps the inherited word over a chunk of items in a worker process. '''
+    terp, word = _job
+    return mapItems(terp, word, chunk)
+
+
+def canFork():
+    ''' Checks if this process may fork a pool of workers. '''
+    # Pool workers are daemonic and cannot have children of their own. A lock held by a
+    # helper thread when forking would stay held in the workers, which have no such thread.
+    return ('fork' in multiprocessing.get_all_start_methods()
+            and not multiprocessing.current_process().daemon
+            and not any(thread.name.startswith(HELPER_THREADS) for thread in threading.enumerate()))
+
+
+def pmap(terp, word, items, workers=None, threshold=DEFAULT_THRESHOLD):
+    ''' Maps a word over items across worker processes, serially below the threshold. '''
+    global _job
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    if len(items) < threshold or workers < 2 or not canFork():
+        return mapItems(terp, word, items)
+    # Several chunks per worker amortize IPC while keeping the load balanced.
+    size = max(1, len(items) // (workers * 4))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    _job = (terp, word)
+    try:
+        with multiprocessing.get_context('fork').Pool(min(workers, len(chunks))) as pool:
+            return [result for chunk in pool.map(mapChunk, chunks) for result in chunk]
+    finally:
+        _job = None
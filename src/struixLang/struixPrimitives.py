@@ -3,6 +3,64 @@
 from multiprocessing import Value
 import types
 
+from . import struixImage, struixMemo, struixNetwork, struixParallel, struixScheduler
+
+# Dictionary entry holding the slots of the word being defined; words cannot be named with a space.
+FRAME_NAME = ' frame'
+
+
+class Variable:
+    ''' Provides a template class for variables. '''
+    def __init__(self, val=None, name=None):
+        ''' Initializes a Variable object. '''
+        self.val = val
+        self.name = name
+    def access(self, terp):
+        ''' Puts a reference to the variable value on the stack. '''
+        terp.stack.append(self)
+    def fetch(self, terp):
+        ''' Puts the variable value on the stack, in place of a reference and FETCH. '''
+        terp.stack.append(self.val)
+    def store(self, terp):
+        ''' Stores the value on the stack to the variable, in place of a reference, SWAP and STORE. '''
+        if len(terp.stack) < 1:
+            raise IndexError('Not enough items on stack.')
+        self.val = terp.stack.pop()
+    def param(self, terp):
+        ''' Sets the variable to the argument highest in the scopes of the callers, in place of a reference and PARAM. '''
+        if (scopeDepth := terp.getScopeDepth()) < 2:
+            raise SyntaxError('Invalid Syntax, parameters cannot be set for global scope.')
+        for scopedStack in reversed(terp.scopedStacks[:scopeDepth - 1]):
+            if scopedStack:
+                self.val = scopedStack.pop()
+                return
+        raise ValueError('Function parameter missing')
+    access.reference = True
+    fetch.load = True
+    fetch.effect = (0, 1)
+    store.assign = True
+    store.effect = (1, 0)
+    # Arguments come from the callers' stacks, so bodies taking them are never inlined.
+    param.argument = True
+    param.effect = (0, 0)
+
+
+class Constant:
+    ''' Provides a template class with a write-once value. '''
+    def __init__(self, val):
+        ''' Initializes a Constant object with a value. '''
+        object.__setattr__(self, 'val', val)
+    def __setattr__(self, name, val):
+        ''' Provides a descriptor to prevent changing values. '''
+        if name == 'val':
+            raise AttributeError('Constant Attribute.')
+        object.__setattr__(self, name, val)
+    def access(self, terp):
+        ''' Puts the value of the constant on the stack. '''
+        # terp.stack.append(self.val)
+        terp.stack.append(getattr(self, 'val'))
+    access.constant = True
+
 
 class AddWords:
     ''' Provides Built-in Words for the struixLang Interpreter. '''
@@ -18,20 +76,24 @@ class AddWords:
                 raise ImportError('No library named {}.'.format(name))
             terp.run(lib.read())
             lib.close()
+            terp.libraries.append(name)
         IMPORT.__dict__['immediate'] = True
         terp.addWords({'IMPORT': IMPORT})
         self.unsafeOps = ENABLE_UNSAFE_OPERATIONS
         self.importWordSets(terp, wordSets)
 
+    DEFAULT_WORD_SETS = ['lists', 'execution', 'math', 'stack', 'values',
+        'functions', 'text', 'logic', 'control',
+        'io', 'pythonOps', 'shorthand', 'arithmetic',
+        'logic_ops', 'string_ops', 'math_ext',
+        'file_io', 'streams', 'data_structs', 'control_ext',
+        'memo', 'profiling', 'time_date', 'concurrency', 'parallel', 'random',
+        'bitwise_ops', 'network', 'image'
+    ]
+
     def importWordSets(self, terp, wordSets):
         if wordSets is None:
-            wordSets = ['lists', 'execution', 'math', 'stack', 'values',
-                'functions', 'text', 'logic', 'control',
-                'io', 'pythonOps', 'shorthand', 'arithmetic',
-                'logic_ops', 'string_ops', 'math_ext',
-                'file_io', 'data_structs', 'control_ext',
-                'time_date', 'random', 'bitwise_ops', 'network'
-            ]
+            wordSets = self.DEFAULT_WORD_SETS
 
         for wordSet in wordSets:
             try:
@@ -46,12 +108,17 @@ class AddWords:
         #     print(imm, code)
         def word(terp):
             ''' Template for a word list executor. '''
-
-            ret_val = None
+            attrs = word.__dict__
+            # Hot words run their translated body; the profiler detaches translations while it runs.
+            tiered = attrs['tiered']
+            if tiered is not None:
+                return tiered(terp)
             # if terp.isCompiling():
             #     terp.newAotScope()
             # else:
-            terp.newBlockScope()
+            terp.enterWord(word)
+            # The optimizer gives the word its own copy of the body when it first runs.
+            code = attrs['code']
 
             if isinstance(code, list):
                 pointer = 0
@@ -66,16 +133,96 @@ class AddWords:
             else:
                 raise TypeError('Invalid callable type, expected word or list.')
 
-            dataStack = terp.popScope()
-            ret_val = None
-
-            # Place the return value onto the stack (None if void return)
-            if len(dataStack) > 0:
-                ret_val = dataStack.pop()
-            terp.stack.append(ret_val)
+            terp.leaveWord()
 
+        # Lets the optimizer replace the body and the scheduler run it one word at a time.
+        word.__dict__['code'] = code
+        word.__dict__['imm'] = imm
+        word.__dict__['calls'] = 0
+        word.__dict__['tiered'] = None
         return word
 
+    @staticmethod
+    def unchecked(word, fast):
+        ''' Pairs a primitive with a variant without its stack check, for bodies proven not to underflow. '''
+        fast.__dict__['effect'] = word.__dict__['effect']
+        word.__dict__['unchecked'] = fast
+
+    # Words compiled into bodies by immediate words are made by the factories below, and
+    # record how to make them again as a 'recipe', so that images can rebuild them.
+
+    @staticmethod
+    def assigner(val):
+        ''' Makes a word storing a value to the variable referenced on the stack. '''
+        def helper(terp):
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            ref = terp.stack.pop()
+            ref.val = val
+        helper.__dict__['recipe'] = (AddWords.assigner, (val,))
+        return helper
+
+    @staticmethod
+    def nextValue():
+        ''' Makes a word reading the next word and putting its value on the stack. '''
+        def helper(terp):
+            nxt = terp.lexer.nextWord()
+            val = AddWords.evalExpr(terp, nxt)
+            terp.stack.append(val)
+        helper.__dict__['immediate'] = True
+        helper.__dict__['recipe'] = (AddWords.nextValue, ())
+        return helper
+
+    @staticmethod
+    def memoStats(memo):
+        ''' Makes a word putting the statistics of a cache on the stack. '''
+        def helper(terp):
+            terp.stack.append(memo.stats())
+        helper.__dict__['recipe'] = (AddWords.memoStats, (memo,))
+        return helper
+
+    @staticmethod
+    def memoClear(memo):
+        ''' Makes a word emptying a cache. '''
+        def helper(terp):
+            memo.clear()
+        helper.__dict__['recipe'] = (AddWords.memoClear, (memo,))
+        return helper
+
+    @staticmethod
+    def switcher(flag, table, default, ends, blocks):
+        ''' Makes a word jumping by the value on the stack to a block, running the blocks from there. '''
+        words = [AddWords.makeWord(block) for block in blocks]
+        starts = {}
+        for value, index in zip(table[::2], table[1::2]):
+            starts.setdefault(value, index)
+        # Blocks fall through to the next until a break before a later block ends the run, or one sets the flag.
+        stops = [min([end for end in ends if end > index] + [len(words)]) for index in range(len(words) + 1)]
+        def jump(terp):
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            value = terp.stack.pop()
+            flag.val = False
+            try:
+                start = starts.get(value, default)
+            except TypeError:
+                # Unhashable values, e.g. lists, equal no case.
+                start = default
+            return range(start, stops[start])
+        def helper(terp):
+            for index in jump(terp):
+                if flag.val:
+                    break
+                terp.interpret(words[index])
+        def coHelper(terp):
+            for index in jump(terp):
+                if flag.val:
+                    break
+                yield from struixScheduler.execute(terp, words[index])
+        helper.__dict__['coroutine'] = coHelper
+        helper.__dict__['recipe'] = (AddWords.switcher, (flag, table, default, ends, blocks))
+        return helper
+
     @staticmethod
     def evalExpr(terp, val):
         ''' Parses and gets next value from lexer. '''
@@ -101,6 +248,7 @@ class AddWords:
             if len(terp.stack) < 1:
                 raise IndexError('Not enough items on stack.')
             print(terp.stack.pop())
+        PRINT.__dict__['effect'] = (1, 0)
         def PSTACK(terp):
             ''' Displays the complete stack. '''
             stackList = terp.stack[:]
@@ -153,6 +301,12 @@ class AddWords:
                 expr = '{} {} {}'.format(n2, op, n1)
                 result = eval(expr)
                 terp.stack.append(result)
+            def fastCALC(terp):
+                n1 = terp.stack.pop()
+                n2 = terp.stack.pop()
+                terp.stack.append(eval('{} {} {}'.format(n2, op, n1)))
+            CALC.__dict__['effect'] = (2, 1)
+            AddWords.unchecked(CALC, fastCALC)
             return CALC
 
         # Binary operations
@@ -171,6 +325,10 @@ class AddWords:
                 raise IndexError('Not enough items on stack.')
             n = terp.stack.pop()
             terp.stack.append(~n)
+        def fastBITNOT(terp):
+            terp.stack.append(~terp.stack.pop())
+        BITNOT.__dict__['effect'] = (1, 1)
+        AddWords.unchecked(BITNOT, fastBITNOT)
 
         # Add BITNOT to the dictionary
         math_words.update({
@@ -219,6 +377,32 @@ class AddWords:
             terp.stack.append(_2os)
             terp.stack.append(tos)
             terp.stack.append(_3os)
+
+
+        # Variants for bodies the optimizer has proven not to underflow.
+        def fastDUP(terp):
+            terp.stack.append(terp.stack[-1])
+        def fastDROP(terp):
+            terp.stack.pop()
+        def fastSWAP(terp):
+            stack = terp.stack
+            stack[-1], stack[-2] = stack[-2], stack[-1]
+        def fastOVER(terp):
+            terp.stack.append(terp.stack[-2])
+        def fastROT(terp):
+            terp.stack.append(terp.stack.pop(-3))
+
+        # Items taken from and given back to the stack, for the optimizer.
+        DUP.__dict__['effect'] = (1, 2)
+        DROP.__dict__['effect'] = (1, 0)
+        SWAP.__dict__['effect'] = (2, 2)
+        OVER.__dict__['effect'] = (2, 3)
+        ROT.__dict__['effect'] = (3, 3)
+        AddWords.unchecked(DUP, fastDUP)
+        AddWords.unchecked(DROP, fastDROP)
+        AddWords.unchecked(SWAP, fastSWAP)
+        AddWords.unchecked(OVER, fastOVER)
+        AddWords.unchecked(ROT, fastROT)
         return {
             "DUP":  DUP,
             "DROP": DROP,
@@ -229,16 +413,6 @@ class AddWords:
 
     def words4values(self):
         ''' Provides support for variables and constants. '''
-        class Variable:
-            ''' Provides a template class for variables. '''
-            def __init__(self, val=None, name=None):
-                ''' Initializes a Variable object. '''
-                self.val = val
-                self.name = name
-            def access(self, terp):
-                ''' Puts a reference to the variable value on the stack. '''
-                terp.stack.append(self)
-
         def VAR(terp):
             ''' Provides creation of variables. '''
             name = terp.lexer.nextWord()
@@ -269,20 +443,6 @@ class AddWords:
 
         def CONST(terp):
             ''' Provides creation of constants. '''
-            class Constant:
-                ''' Provides a template class with a write-once value. '''
-                def __init__(self, val):
-                    ''' Initializes a Constant object with a value. '''
-                    object.__setattr__(self, 'val', val)
-                def __setattr__(self, name, val):
-                    ''' Provides a descriptor to prevent changing values. '''
-                    if name == 'val':
-                        raise AttributeError('Constant Attribute.')
-                    object.__setattr__(self, name, val)
-                def access(self, terp):
-                    ''' Puts the value of the constant on the stack. '''
-                    # terp.stack.append(self.val)
-                    terp.stack.append(getattr(self, 'val'))
             name = terp.lexer.nextWord()
             val = self.evalExpr(terp, terp.lexer.nextWord())
             if name == '' or val == '':
@@ -290,6 +450,7 @@ class AddWords:
             elif terp.lookup(name) is not None:
                 raise SyntaxError(f'Constant {name} already exists and cannot be redefined.')
             const = Constant(val)
+            const.name = name
             terp.define(name, const.access)
 
         def ASSIGN(terp):
@@ -298,11 +459,7 @@ class AddWords:
             if nxt == '':
                 raise SyntaxError('Invalid Syntax: Malformed assignment.')
             val = self.evalExpr(terp, nxt)
-            def helper(terp):
-                if len(terp.stack) < 1:
-                    raise IndexError('Not enough items on stack.')
-                ref = terp.stack.pop()
-                ref.val = val
+            helper = self.assigner(val)
             if not terp.isCompiling():
                 helper(terp)
             else:
@@ -323,16 +480,170 @@ class AddWords:
             ref = terp.stack.pop()
             terp.stack.append(ref.val)
 
+        def fastSTORE(terp):
+            val = terp.stack.pop()
+            terp.stack.pop().val = val
+
+        def fastFETCH(terp):
+            terp.stack.append(terp.stack.pop().val)
+
+        def place(terp, word):
+            ''' Runs a word made while reading the source, or compiles it into the body being defined. '''
+            if not terp.isCompiling():
+                word(terp)
+            else:
+                terp.stack.append(word)
+
+        def slot(terp):
+            ''' Gives the slot numbered by the next word in the frame of the word being defined. '''
+            index = terp.lexer.nextWord()
+            frame = terp.lookup(FRAME_NAME)
+            if frame is None:
+                raise SyntaxError(f'Invalid Syntax: Slot {index} used without a FRAME.')
+            number = terp.parseNumber(index)
+            if type(number) is not int or not 0 <= number < len(frame):
+                raise SyntaxError(f'Invalid Syntax: No slot {index} in a frame of {len(frame)}.')
+            return frame[number]
+
+        def FRAME(terp):
+            ''' Provides numbered slots, a variable each, for the locals of the word being defined. '''
+            size = terp.parseNumber(terp.lexer.nextWord())
+            if type(size) is not int or size < 0:
+                raise SyntaxError('Invalid Syntax: Malformed frame size.')
+            terp.define(FRAME_NAME, [Variable() for _ in range(size)], False)
+
+        def SLOT_FETCH(terp):
+            ''' Retrieves the value of a slot. '''
+            place(terp, slot(terp).fetch)
+
+        def SLOT_STORE(terp):
+            ''' Stores the value on the stack to a slot. '''
+            place(terp, slot(terp).store)
+
+        def SLOT_PARAM(terp):
+            ''' Sets a slot to the next function parameter. '''
+            place(terp, slot(terp).param)
+
+        STORE.__dict__['effect'] = (2, 0)
+        FETCH.__dict__['effect'] = (1, 1)
+        self.unchecked(STORE, fastSTORE)
+        self.unchecked(FETCH, fastFETCH)
         CONST.__dict__['immediate'] = True
         VAR.__dict__['immediate'] = True
         ASSIGN.__dict__['immediate'] = True
+        FRAME.__dict__['immediate'] = True
+        SLOT_FETCH.__dict__['immediate'] = True
+        SLOT_STORE.__dict__['immediate'] = True
+        SLOT_PARAM.__dict__['immediate'] = True
         return {
             "VAR":   VAR,
             "CONST": CONST,
             "FETCH": FETCH,
             "=":     ASSIGN,
             "STORE": STORE,
-            "PARAM": PARAM
+            "PARAM": PARAM,
+            "FRAME": FRAME,
+            "SLOT_FETCH": SLOT_FETCH,
+            "SLOT_STORE": SLOT_STORE,
+            "SLOT_PARAM": SLOT_PARAM
+            }
+
+    @staticmethod
+    def words4memo():
+        ''' Provides caching of the results of pure user-defined words. '''
+        def findMemo(terp, name):
+            word = terp.lookup(name)
+            if word is None:
+                raise ValueError('Unknown Word: {}'.format(name))
+            memo = getattr(word, '__dict__', {}).get('memo')
+            if memo is None:
+                raise ValueError('{} is not memoized.'.format(name))
+            return memo
+
+        def MEMO(terp):
+            ''' Caches the results of the last defined word by its arguments. '''
+            name = terp.lastDefined
+            if name is None:
+                raise SyntaxError('Invalid Syntax, no word defined to memoize.')
+            word = terp.lookup(name)
+            if 'memo' not in getattr(word, '__dict__', {}):
+                maxsize = terp.settings.get('memoMaxsize', struixMemo.DEFAULT_MAXSIZE)
+                terp.define(name, struixMemo.memoize(word, maxsize))
+        def MEMO_MAXSIZE(terp):
+            ''' Sets the cache size of words memoized later (0 for unbounded). '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            terp.settings['memoMaxsize'] = terp.stack.pop() or None
+        def MEMO_STATS(terp):
+            ''' Gives the cache statistics of the named word. '''
+            helper = AddWords.memoStats(findMemo(terp, terp.lexer.nextWord()))
+            if len(terp.wordNameStack) == 0:
+                helper(terp)
+            else:
+                terp.stack.append(helper)
+        def MEMO_CLEAR(terp):
+            ''' Empties the cache of the named word. '''
+            helper = AddWords.memoClear(findMemo(terp, terp.lexer.nextWord()))
+            if len(terp.wordNameStack) == 0:
+                helper(terp)
+            else:
+                terp.stack.append(helper)
+        MEMO_STATS.__dict__['immediate'] = True
+        MEMO_CLEAR.__dict__['immediate'] = True
+        return {
+            "MEMO":         MEMO,
+            "MEMO_MAXSIZE": MEMO_MAXSIZE,
+            "MEMO_STATS":   MEMO_STATS,
+            "MEMO_CLEAR":   MEMO_CLEAR
+            }
+
+    @staticmethod
+    def words4profiling():
+        ''' Provides words for profiling execution. '''
+        def PROFILE(terp):
+            ''' Starts recording per-word execution statistics. '''
+            terp.startProfiling()
+        def PROFILE_REPORT(terp):
+            ''' Stops profiling and displays the statistics collected. '''
+            profiler = terp.stopProfiling()
+            if profiler is None:
+                raise RuntimeError('Profiling has not been started.')
+            profiler.report()
+        def TRACE(terp):
+            ''' Starts recording the call hierarchy of executed words. '''
+            terp.startTracing()
+        def TRACE_FOLDED(terp):
+            ''' Stops tracing and writes collapsed stacks to the given file. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            tracer = terp.stopProfiling()
+            if not hasattr(tracer, 'writeFolded'):
+                raise RuntimeError('Tracing has not been started.')
+            tracer.writeFolded(terp.stack.pop())
+        def TRACE_TREE(terp):
+            ''' Stops tracing and writes the call tree as JSON to the given file. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            tracer = terp.stopProfiling()
+            if not hasattr(tracer, 'writeCallTree'):
+                raise RuntimeError('Tracing has not been started.')
+            tracer.writeCallTree(terp.stack.pop())
+        def TIER_STATS(terp):
+            ''' Displays the words that were compiled for being hot. '''
+            terp.optimizer.report()
+        def TIER_THRESHOLD(terp):
+            ''' Sets the number of calls after which a word is compiled (0 to never compile). '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            terp.optimizer.threshold = terp.stack.pop()
+        return {
+            "PROFILE":        PROFILE,
+            "PROFILE_REPORT": PROFILE_REPORT,
+            "TRACE":          TRACE,
+            "TRACE_FOLDED":   TRACE_FOLDED,
+            "TRACE_TREE":     TRACE_TREE,
+            "TIER_STATS":     TIER_STATS,
+            "TIER_THRESHOLD": TIER_THRESHOLD
             }
 
     @staticmethod
@@ -390,6 +701,8 @@ class AddWords:
                 terp.wordNameStack.append("")
             else:
                 terp.wordNameStack.append(name)
+                terp.definitionSites[name] = (terp.lexer.line_number,
+                                              terp.lexer.column_number - len(name))
             terp.newAotScope()
         def END(terp):
             ''' Marks end of user-defined words. '''
@@ -399,7 +712,11 @@ class AddWords:
             name = terp.wordNameStack.pop()
             code = terp.popScope()
             if name != "":
-                terp.define(name, self.makeWord(code))
+                word = self.makeWord(code)
+                terp.prepareBody(word, name)
+                terp.optimizer.inline(word)
+                terp.define(name, word)
+                terp.lastDefined = name
         def IMMEND(terp):
             ''' Marks end of immediate user-defined words. '''
             code = terp.popScope()
@@ -408,11 +725,7 @@ class AddWords:
             terp.define(terp.wordNameStack.pop(), word)
         def NEXT(terp):
             ''' Appends next word to stack and skips it during execution. '''
-            def helper(terp):
-                nxt = terp.lexer.nextWord()
-                val = self.evalExpr(terp, nxt)
-                terp.stack.append(val)
-            helper.__dict__['immediate'] = True
+            helper = self.nextValue()
             if len(terp.wordNameStack) == 0:
                 # If not in fn definition, execute the word
                 helper(terp)
@@ -424,6 +737,7 @@ class AddWords:
             if len(terp.stack) < 1:
                 # If no value is provided, return None
                 raise ValueError('No value provided.')
+        RETURN.__dict__['effect'] = (1, 1)
         NEXT.__dict__['immediate'] = True
         DEF.__dict__['immediate'] = True
         END.__dict__['immediate'] = True
@@ -443,7 +757,8 @@ class AddWords:
         def LIST_END(terp):
             ''' Marks end of list. '''
             lst = []
-            lst += terp.popScope()
+            items = terp.popScope()
+            lst += items
             terp.stack.append(lst)
         def LENGTH(terp):
             ''' Gives the length of a list. '''
@@ -466,8 +781,18 @@ class AddWords:
             value = terp.stack.pop()
             lst[index] = value
             terp.stack.append(lst)
+        def fastLENGTH(terp):
+            terp.stack.append(len(terp.stack.pop()))
+        def fastITEM(terp):
+            key = terp.stack.pop()
+            terp.stack.append(terp.stack.pop()[key])
         LIST.__dict__['immediate'] = True
         LIST_END.__dict__['immediate'] = True
+        LENGTH.__dict__['effect'] = (1, 1)
+        ITEM.__dict__['effect'] = (2, 1)
+        STORE_ITEM.__dict__['effect'] = (3, 1)
+        AddWords.unchecked(LENGTH, fastLENGTH)
+        AddWords.unchecked(ITEM, fastITEM)
         return {
             "[":          LIST,
             "]":          LIST_END,
@@ -484,6 +809,10 @@ class AddWords:
             if len(terp.stack) < 1:
                 raise IndexError('Not enough items on stack.')
             terp.stack.append(not terp.stack.pop())
+        def fastNOT(terp):
+            terp.stack.append(not terp.stack.pop())
+        NOT.__dict__['effect'] = (1, 1)
+        AddWords.unchecked(NOT, fastNOT)
         def TRUE(terp):
             ''' Represents the boolean True. '''
             terp.stack.append(True)
@@ -583,6 +912,107 @@ class AddWords:
                 if not terp.stack.pop():
                     break
 
+        def coRUN(terp):
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            code = terp.stack.pop()
+            if isinstance(code, (types.FunctionType, types.MethodType)):
+                yield from struixScheduler.call(terp, code)
+            elif isinstance(code, list):
+                yield from struixScheduler.execute(terp, self.makeWord(code))
+            else:
+                raise TypeError('Expected a list or function for RUN')
+
+        def coTIMES(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            n = terp.stack.pop()
+            word = self.makeWord(terp.stack.pop())
+            count = 0
+            while n == float('inf') or count < n:
+                yield from struixScheduler.call(terp, word)
+                yield from struixScheduler.tick()
+                count += 1
+
+        def coIFTRUE(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            code = terp.stack.pop()
+            if terp.stack.pop():
+                yield from struixScheduler.execute(terp, self.makeWord(code))
+
+        def coIFFALSE(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            code = terp.stack.pop()
+            if not terp.stack.pop():
+                yield from struixScheduler.execute(terp, self.makeWord(code))
+
+        def coIFELSE(terp):
+            if len(terp.stack) < 3:
+                raise IndexError('Not enough items on stack.')
+            code2 = terp.stack.pop()
+            code1 = terp.stack.pop()
+            code = code1 if terp.stack.pop() else code2
+            yield from struixScheduler.execute(terp, self.makeWord(code))
+
+        def coWHILE(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            code = self.makeWord(terp.stack.pop())
+            cond = self.makeWord(terp.stack.pop())
+            while True:
+                yield from struixScheduler.call(terp, cond)
+                if len(terp.stack) < 1:
+                    raise IndexError('Not enough items on stack.')
+                if not terp.stack.pop():
+                    break
+                yield from struixScheduler.call(terp, code)
+                yield from struixScheduler.tick()
+
+        def coDOWHILE(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            code = self.makeWord(terp.stack.pop())
+            cond = self.makeWord(terp.stack.pop())
+            while True:
+                yield from struixScheduler.call(terp, code)
+                yield from struixScheduler.call(terp, cond)
+                if len(terp.stack) < 1:
+                    raise IndexError('Not enough items on stack.')
+                if not terp.stack.pop():
+                    break
+                yield from struixScheduler.tick()
+
+        def SWITCH(terp):
+            ''' Multi-way branch through a table of values, reading the flag variable, table, default, breaks and blocks. '''
+            flag = self.evalExpr(terp, terp.lexer.nextWord())
+            table = self.evalExpr(terp, terp.lexer.nextWord())
+            default = self.evalExpr(terp, terp.lexer.nextWord())
+            ends = self.evalExpr(terp, terp.lexer.nextWord())
+            blocks = self.evalExpr(terp, terp.lexer.nextWord())
+            if (not isinstance(flag, Variable) or not isinstance(table, list) or len(table) % 2
+                    or not isinstance(ends, list) or not isinstance(blocks, list)
+                    or not all(isinstance(block, list) for block in blocks)
+                    or type(default) is not int or not 0 <= default <= len(blocks)
+                    or any(type(index) is not int or not 0 <= index <= len(blocks) for index in table[1::2])):
+                raise SyntaxError('Invalid Syntax: Malformed switch.')
+            helper = self.switcher(flag, table, default, ends, blocks)
+            if not terp.isCompiling():
+                helper(terp)
+            else:
+                terp.stack.append(helper)
+
+        # Forms that let a scheduled task yield inside loops and branches.
+        RUN.__dict__['coroutine'] = coRUN
+        TIMES.__dict__['coroutine'] = coTIMES
+        IFTRUE.__dict__['coroutine'] = coIFTRUE
+        IFFALSE.__dict__['coroutine'] = coIFFALSE
+        IFELSE.__dict__['coroutine'] = coIFELSE
+        WHILE.__dict__['coroutine'] = coWHILE
+        DOWHILE.__dict__['coroutine'] = coDOWHILE
+        SWITCH.__dict__['immediate'] = True
+
         return {
             "RUN":     RUN,
             "TIMES":   TIMES,
@@ -590,5 +1020,290 @@ class AddWords:
             "IFFALSE": IFFALSE,
             "IFELSE":  IFELSE,
             "WHILE":   WHILE,
-            "DOWHILE": DOWHILE
+            "DOWHILE": DOWHILE,
+            "SWITCH":  SWITCH
+            }
+
+    def words4streams(self):
+        ''' Provides streaming and memory-mapped file operations. '''
+        import mmap
+
+        BUFFER_SIZE = 1024 * 1024
+
+        def OPEN_STREAM(terp):
+            ''' Opens a buffered file stream with the given mode. '''
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            path = terp.stack.pop()
+            mode = terp.stack.pop()
+            terp.stack.append(open(path, mode, buffering=BUFFER_SIZE))
+        def READ_CHUNK(terp):
+            ''' Reads at most the given number of characters/bytes from a stream. '''
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            size = terp.stack.pop()
+            stream = terp.stack.pop()
+            terp.stack.append(stream.read(size))
+        def READ_LINE(terp):
+            ''' Reads the next line from a stream, empty at end of file. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            terp.stack.append(terp.stack.pop().readline())
+        def EACH_LINE(terp):
+            ''' Runs code for every line of a stream, one line at a time. '''
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            code = terp.stack.pop()
+            stream = terp.stack.pop()
+            word = code if isinstance(code, (types.FunctionType, types.MethodType)) else self.makeWord(code)
+            depth = len(terp.stack)
+            for line in stream:
+                terp.stack.append(line)
+                word(terp)
+                del terp.stack[depth:]
+        def WRITE_CHUNK(terp):
+            ''' Writes data to a stream through its buffer. '''
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            stream = terp.stack.pop()
+            stream.write(terp.stack.pop())
+        def WRITE_LINES(terp):
+            ''' Writes a list of strings to a stream as one batch. '''
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            stream = terp.stack.pop()
+            stream.writelines(terp.stack.pop())
+        def FLUSH_STREAM(terp):
+            ''' Flushes the buffer of a stream. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            terp.stack.pop().flush()
+        def MMAP_FILE(terp):
+            ''' Maps a file into memory as a read-only byte view. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            with open(terp.stack.pop(), 'rb') as f:
+                try:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # Empty files cannot be mapped.
+                    mapped = b''
+            terp.stack.append(memoryview(mapped))
+        def CLOSE_STREAM(terp):
+            ''' Closes a stream or releases a memory-mapped view. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            stream = terp.stack.pop()
+            if isinstance(stream, memoryview):
+                mapped = stream.obj
+                stream.release()
+                if isinstance(mapped, mmap.mmap):
+                    try:
+                        mapped.close()
+                    except BufferError:
+                        raise BufferError('Slices of the mapped file are still in use.')
+            else:
+                stream.close()
+        def SLICE(terp):
+            ''' Gives a slice of a list, string or byte view (zero-copy for views). '''
+            if len(terp.stack) < 3:
+                raise IndexError('Not enough items on stack.')
+            end = terp.stack.pop()
+            start = terp.stack.pop()
+            terp.stack.append(terp.stack.pop()[start:end])
+        def DECODE(terp):
+            ''' Decodes bytes or a byte view into a UTF-8 string. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            terp.stack.append(bytes(terp.stack.pop()).decode('utf-8'))
+
+        def coREAD_CHUNK(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            size = terp.stack.pop()
+            stream = terp.stack.pop()
+            terp.stack.append((yield from struixScheduler.offload(stream.read, size)))
+        def coREAD_LINE(terp):
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            stream = terp.stack.pop()
+            terp.stack.append((yield from struixScheduler.offload(stream.readline)))
+        def coEACH_LINE(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            code = terp.stack.pop()
+            stream = terp.stack.pop()
+            word = code if isinstance(code, (types.FunctionType, types.MethodType)) else self.makeWord(code)
+            depth = len(terp.stack)
+            while True:
+                line = yield from struixScheduler.offload(stream.readline)
+                if not line:
+                    break
+                terp.stack.append(line)
+                yield from struixScheduler.call(terp, word)
+                del terp.stack[depth:]
+        def coWRITE_CHUNK(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            stream = terp.stack.pop()
+            yield from struixScheduler.offload(stream.write, terp.stack.pop())
+        def coWRITE_LINES(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            stream = terp.stack.pop()
+            yield from struixScheduler.offload(stream.writelines, terp.stack.pop())
+        def coFLUSH_STREAM(terp):
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            yield from struixScheduler.offload(terp.stack.pop().flush)
+
+        # Scheduled tasks wait for file I/O without blocking each other.
+        READ_CHUNK.__dict__['coroutine'] = coREAD_CHUNK
+        READ_LINE.__dict__['coroutine'] = coREAD_LINE
+        EACH_LINE.__dict__['coroutine'] = coEACH_LINE
+        WRITE_CHUNK.__dict__['coroutine'] = coWRITE_CHUNK
+        WRITE_LINES.__dict__['coroutine'] = coWRITE_LINES
+        FLUSH_STREAM.__dict__['coroutine'] = coFLUSH_STREAM
+
+        return {
+            "OPEN_STREAM":  OPEN_STREAM,
+            "READ_CHUNK":   READ_CHUNK,
+            "READ_LINE":    READ_LINE,
+            "EACH_LINE":    EACH_LINE,
+            "WRITE_CHUNK":  WRITE_CHUNK,
+            "WRITE_LINES":  WRITE_LINES,
+            "FLUSH_STREAM": FLUSH_STREAM,
+            "MMAP_FILE":    MMAP_FILE,
+            "CLOSE_STREAM": CLOSE_STREAM,
+            "SLICE":        SLICE,
+            "DECODE":       DECODE
+            }
+
+    @staticmethod
+    def words4concurrency():
+        ''' Provides suspension points for cooperatively scheduled scripts. '''
+        import time
+
+        def SLEEP(terp):
+            ''' Pauses execution for the given number of seconds. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            time.sleep(terp.stack.pop())
+        def YIELD(terp):
+            ''' Lets other scheduled scripts run; does nothing when unscheduled. '''
+            pass
+
+        def coSLEEP(terp):
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            yield from struixScheduler.sleep(terp.stack.pop())
+        def coYIELD(terp):
+            yield None
+
+        SLEEP.__dict__['coroutine'] = coSLEEP
+        YIELD.__dict__['coroutine'] = coYIELD
+        return {
+            "SLEEP": SLEEP,
+            "YIELD": YIELD
+            }
+
+    def words4parallel(self):
+        ''' Provides mapping over lists across worker processes. '''
+        def PMAP(terp):
+            ''' Runs code on every item of a list in parallel, giving the results in order. '''
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            code = terp.stack.pop()
+            items = terp.stack.pop()
+            word = code if isinstance(code, (types.FunctionType, types.MethodType)) else self.makeWord(code)
+            terp.stack.append(struixParallel.pmap(
+                terp, word, items, terp.settings.get('pmapWorkers'),
+                terp.settings.get('pmapThreshold', struixParallel.DEFAULT_THRESHOLD)))
+        def PMAP_WORKERS(terp):
+            ''' Sets the number of worker processes of PMAP (0 for one per CPU). '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            terp.settings['pmapWorkers'] = terp.stack.pop() or None
+        def PMAP_THRESHOLD(terp):
+            ''' Sets the list length below which PMAP runs serially. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            terp.settings['pmapThreshold'] = terp.stack.pop()
+        return {
+            "PMAP":           PMAP,
+            "PMAP_WORKERS":   PMAP_WORKERS,
+            "PMAP_THRESHOLD": PMAP_THRESHOLD
+            }
+
+    @staticmethod
+    def words4network():
+        ''' Provides HTTP requests over pooled keep-alive connections. '''
+        def limit(terp):
+            return terp.settings.get('httpTimeout', struixNetwork.DEFAULT_TIMEOUT)
+
+        def HTTP_GET(terp):
+            ''' Fetches a URL and gives the body of the response. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            future = struixNetwork.request('GET', terp.stack.pop(), timeout=limit(terp))
+            terp.stack.append(future.result().text)
+        def HTTP_POST(terp):
+            ''' Posts data to a URL and gives the body of the response. '''
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            data = terp.stack.pop()
+            url = terp.stack.pop()
+            future = struixNetwork.request('POST', url, data, timeout=limit(terp))
+            terp.stack.append(future.result().text)
+        def HTTP_GET_ALL(terp):
+            ''' Fetches a list of URLs concurrently and gives the list of bodies. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            future = struixNetwork.requestAll('GET', terp.stack.pop(), timeout=limit(terp))
+            terp.stack.append([response.text for response in future.result()])
+        def HTTP_TIMEOUT(terp):
+            ''' Sets the time limit of later requests in seconds. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            terp.settings['httpTimeout'] = terp.stack.pop()
+
+        def coHTTP_GET(terp):
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            future = struixNetwork.request('GET', terp.stack.pop(), timeout=limit(terp))
+            terp.stack.append((yield from struixScheduler.wait(future)).text)
+        def coHTTP_POST(terp):
+            if len(terp.stack) < 2:
+                raise IndexError('Not enough items on stack.')
+            data = terp.stack.pop()
+            url = terp.stack.pop()
+            future = struixNetwork.request('POST', url, data, timeout=limit(terp))
+            terp.stack.append((yield from struixScheduler.wait(future)).text)
+        def coHTTP_GET_ALL(terp):
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            future = struixNetwork.requestAll('GET', terp.stack.pop(), timeout=limit(terp))
+            terp.stack.append([response.text for response in (yield from struixScheduler.wait(future))])
+
+        HTTP_GET.__dict__['coroutine'] = coHTTP_GET
+        HTTP_POST.__dict__['coroutine'] = coHTTP_POST
+        HTTP_GET_ALL.__dict__['coroutine'] = coHTTP_GET_ALL
+        return {
+            "HTTP_GET":     HTTP_GET,
+            "HTTP_POST":    HTTP_POST,
+            "HTTP_GET_ALL": HTTP_GET_ALL,
+            "HTTP_TIMEOUT": HTTP_TIMEOUT
+            }
+
+    @staticmethod
+    def words4image():
+        ''' Provides saving the interpreter to an image file. '''
+        def SAVE_IMAGE(terp):
+            ''' Saves the global dictionary to the image file named on the stack. '''
+            if len(terp.stack) < 1:
+                raise IndexError('Not enough items on stack.')
+            struixImage.save(terp, terp.stack.pop())
+        SAVE_IMAGE.__dict__['effect'] = (1, 0)
+        return {
+            "SAVE_IMAGE": SAVE_IMAGE
             }
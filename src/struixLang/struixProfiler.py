@@ -0,0 +1,165 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+import json
+import sys
+import time
+import types
+
+
+class Profiler:
+    ''' Records per-word call counts, self time and cumulative time. '''
+
+    def __init__(self, terp):
+        self.terp = terp
+        self.stats = {}     # name -> [calls, self time, cumulative time]
+        self.frames = []    # [name, time spent in callees] per active word
+        self.active = {}    # name -> number of activations on the frame stack
+
+    def start(self):
+        ''' Routes the interpreter through the profiling executor. '''
+        # Translated bodies call words directly, so hot words run interpreted while profiled.
+        self.terp.optimizer.pause()
+        self.terp.interpret = self.interpret
+
+    def stop(self):
+        ''' Restores the plain executor of the interpreter. '''
+        self.terp.__dict__.pop('interpret', None)
+        self.terp.optimizer.resume()
+
+    def reset(self):
+        ''' Discards the statistics collected so far. '''
+        self.stats.clear()
+
+    @staticmethod
+    def nameOf(word):
+        ''' Gives the dictionary name of a word. '''
+        if isinstance(word, types.MethodType):
+            name = getattr(word.__self__, 'name', None)
+            return name if name is not None else '<{}>'.format(type(word.__self__).__name__)
+        return word.__dict__.get('name', '<{}>'.format(word.__name__))
+
+    def interpret(self, word):
+        ''' Executes struixLang code while timing executed words. '''
+        terp = self.terp
+        if not isinstance(word, (types.FunctionType, types.MethodType)) or \
+                (terp.isCompiling() and not terp.immediate):
+            return type(terp).interpret(terp, word)
+
+        name = self.nameOf(word)
+        frame = [name, 0.0]
+        self.frames.append(frame)
+        self.active[name] = self.active.get(name, 0) + 1
+        self.enter(name)
+        start = time.perf_counter()
+        try:
+            type(terp).interpret(terp, word)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.frames.pop()
+            self.active[name] -= 1
+            stat = self.stats.setdefault(name, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += elapsed - frame[1]
+            # Recursive activations are only counted once towards cumulative time.
+            if not self.active[name]:
+                stat[2] += elapsed
+            if self.frames:
+                self.frames[-1][1] += elapsed
+            self.leave(name, elapsed, elapsed - frame[1])
+
+    def enter(self, name):
+        ''' Hook called before a word starts executing. '''
+
+    def leave(self, name, elapsed, selfTime):
+        ''' Hook called after a word has finished executing. '''
+
+    def report(self, file=None, sortBy='cumulative', limit=None):
+        ''' Prints the collected statistics as a table sorted by the given column. '''
+        file = sys.stdout if file is None else file
+        column = {'calls': 0, 'self': 1, 'cumulative': 2}[sortBy]
+        rows = sorted(self.stats.items(), key=lambda item: item[1][column], reverse=True)
+        if limit is not None:
+            rows = rows[:limit]
+        width = max([len('word')] + [len(name) for name, _ in rows])
+        print('{:<{w}}  {:>10}  {:>12}  {:>12}  {:>12}'.format(
+            'word', 'calls', 'self (ms)', 'cum (ms)', 'per call (us)', w=width), file=file)
+        for name, (calls, selfTime, cumTime) in rows:
+            print('{:<{w}}  {:>10}  {:>12.3f}  {:>12.3f}  {:>12.3f}'.format(
+                name, calls, selfTime * 1e3, cumTime * 1e3, cumTime / calls * 1e6, w=width), file=file)
+
+
+class Tracer(Profiler):
+    ''' Profiler that also records the call hierarchy of executed words. '''
+
+    def __init__(self, terp):
+        super().__init__(terp)
+        self.root = self.newNode('<root>', None)
+        self.path = [self.root]
+
+    def reset(self):
+        ''' Discards the statistics and call tree collected so far. '''
+        super().reset()
+        self.root = self.newNode('<root>', None)
+        self.path = [self.root]
+
+    @staticmethod
+    def newNode(name, position):
+        ''' Creates a call tree node. '''
+        return {'name': name, 'position': position, 'calls': 0,
+                'total': 0.0, 'self': 0.0, 'children': {}}
+
+    def enter(self, name):
+        ''' Descends into the call tree node of the word. '''
+        children = self.path[-1]['children']
+        node = children.get(name)
+        if node is None:
+            lexer = self.terp.lexer
+            node = children[name] = self.newNode(name, (lexer.line_number, lexer.column_number))
+        self.path.append(node)
+
+    def leave(self, name, elapsed, selfTime):
+        ''' Accounts the time of the word to its call tree node. '''
+        node = self.path.pop()
+        node['calls'] += 1
+        node['total'] += elapsed
+        node['self'] += selfTime
+
+    def folded(self):
+        ''' Yields the call tree as collapsed stacks with self time in microseconds. '''
+        def walk(node, prefix):
+            for child in node['children'].values():
+                stack = prefix + [child['name'].replace(';', ':').replace(' ', '_')]
+                micros = int(round(child['self'] * 1e6))
+                if micros > 0:
+                    yield '{} {}'.format(';'.join(stack), micros)
+                yield from walk(child, stack)
+        yield from walk(self.root, [])
+
+    def writeFolded(self, file):
+        ''' Writes collapsed stacks, as consumed by flamegraph tools, to a file. '''
+        with open(file, 'w') as f:
+            for line in self.folded():
+                f.write(line + '\n')
+
+    def callTree(self):
+        ''' Gives the call tree as nested dictionaries annotated with source positions. '''
+        sites = self.terp.definitionSites
+        def convert(node):
+            line, column = node['position'] or (None, None)
+            defined = sites.get(node['name'])
+            return {
+                'name': node['name'],
+                'line': line,
+                'column': column,
+                'defined': list(defined) if defined else None,
+                'calls': node['calls'],
+                'total_ms': node['total'] * 1e3,
+                'self_ms': node['self'] * 1e3,
+                'children': [convert(child) for child in node['children'].values()]
+                }
+        return convert(self.root)['children']
+
+    def writeCallTree(self, file):
+        ''' Writes the call tree as JSON to a file. '''
+        with open(file, 'w') as f:
+            json.dump(self.callTree(), f, indent=2)
@@ -0,0 +1,214 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+''' Cooperative execution of many interpreters in a single thread.
+
+Words may carry a generator function under the 'coroutine' key of their
+__dict__. It does the same work as the word itself, but may yield to the
+scheduler: None to give up the rest of its time slice, a number to sleep
+until that time.monotonic() deadline, or a concurrent.futures.Future to
+wait for. Words without a coroutine run to completion without yielding.
+
+Only words that may suspend have coroutine forms here: the primitives with a
+'coroutine' and the words made by AddWords.makeWord, whose bodies may hold
+such primitives. They share their bookkeeping with the interpreter through
+Terp.enterWord, Terp.leaveWord and the lexer helpers of Terp.run, and every
+other word goes through Terp.interpret itself. Translations of hot words call
+the words of their body directly, so scheduled tasks always run bodies word
+by word. '''
+
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import time
+import types
+
+_executor = None
+
+
+def executor():
+    ''' Gives the thread pool that runs blocking calls for suspended tasks. '''
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='struixIO')
+    return _executor
+
+
+def tick():
+    ''' Accounts one executed word to the running task, yielding when its slice is used up. '''
+    task = Scheduler.running
+    if task is not None:
+        task.budget -= 1
+        if task.budget <= 0:
+            yield None
+
+
+def wait(future):
+    ''' Suspends the running task until a future is done, giving its result. '''
+    if Scheduler.running is not None and not future.done():
+        yield future
+    return future.result()
+
+
+def offload(fn, *args):
+    ''' Runs a blocking call on a helper thread while the task is suspended. '''
+    if Scheduler.running is None:
+        return fn(*args)
+    return (yield from wait(executor().submit(fn, *args)))
+
+
+def sleep(seconds):
+    ''' Suspends the running task for the given number of seconds. '''
+    if Scheduler.running is None:
+        time.sleep(seconds)
+    else:
+        yield time.monotonic() + seconds
+
+
+def suspends(word):
+    ''' Tells whether a word has a coroutine form, for possibly suspending while it runs. '''
+    return type(word) is types.FunctionType and ('coroutine' in word.__dict__ or 'imm' in word.__dict__)
+
+
+def call(terp, word):
+    ''' Coroutine form of calling a word directly. '''
+    if not suspends(word):
+        word(terp)
+    elif 'coroutine' in word.__dict__:
+        yield from word.__dict__['coroutine'](terp)
+    else:
+        yield from block(terp, word)
+
+
+def execute(terp, word):
+    ''' Coroutine form of Terp.interpret, which runs the words that cannot suspend. '''
+    if suspends(word) and (not terp.isCompiling() or terp.immediate):
+        yield from call(terp, word)
+        terp.immediate = False
+    else:
+        terp.interpret(word)
+    yield from tick()
+
+
+def block(terp, word):
+    ''' Coroutine form of a word made by AddWords.makeWord. '''
+    attrs = word.__dict__
+    terp.enterWord(word)
+    code, imm = attrs['code'], attrs['imm']
+    if isinstance(code, list):
+        for item in code:
+            if imm:
+                terp.immediate = getattr(item, '__dict__', {}).get('immediate', False)
+            yield from execute(terp, item)
+    elif isinstance(code, (types.FunctionType, types.MethodType)):
+        yield from call(terp, code)
+    else:
+        raise TypeError('Invalid callable type, expected word or list.')
+    terp.leaveWord()
+
+
+def run(terp, text):
+    ''' Coroutine form of Terp.run. '''
+    terp.openLexer(text)
+    depth, names = terp.getScopeDepth(), len(terp.wordNameStack)
+    try:
+        while terp.lexer.peekWord():
+            word_text = terp.lexer.nextWord()
+            try:
+                site = (terp.lexer.line_number, terp.lexer.column_number - len(word_text))
+                word = terp.compile(word_text)
+                yield from execute(terp, word)
+                terp.markSite(site)
+            except Exception as e:
+                terp.unwind(depth, names)
+                raise terp.wordError(word_text, e) from e
+    finally:
+        terp.closeLexer()
+
+
+class Task:
+    ''' A struixLang program running under a scheduler. '''
+
+    def __init__(self, terp, coroutine, name, timeslice):
+        self.terp = terp
+        self.coroutine = coroutine
+        self.name = name
+        self.timeslice = timeslice
+        self.budget = timeslice
+        self.done = False
+        self.error = None
+
+    def __repr__(self):
+        state = 'failed' if self.error else 'done' if self.done else 'running'
+        return '<Task {} {}>'.format(self.name, state)
+
+
+class Scheduler:
+    ''' Interleaves many interpreters in one thread, switching at word boundaries. '''
+
+    # Task being resumed, if any; read by the coroutine forms of words.
+    running = None
+
+    def __init__(self, timeslice=100):
+        self.timeslice = timeslice
+        self.ready = collections.deque()
+        self.sleeping = []      # heap of (deadline, sequence, task)
+        self.waiting = {}       # future -> task
+        self.tasks = []
+        self.sequence = itertools.count()
+
+    def spawn(self, terp, source, name=None, timeslice=None):
+        ''' Schedules struixLang source to run on the given interpreter. '''
+        task = Task(terp, run(terp, source), name or 'task-{}'.format(len(self.tasks) + 1),
+                    timeslice or self.timeslice)
+        self.tasks.append(task)
+        self.ready.append(task)
+        return task
+
+    def wake(self):
+        ''' Moves tasks whose sleep or wait is over to the ready queue. '''
+        now = time.monotonic()
+        while self.sleeping and self.sleeping[0][0] <= now:
+            self.ready.append(heapq.heappop(self.sleeping)[2])
+        for future in [future for future in self.waiting if future.done()]:
+            self.ready.append(self.waiting.pop(future))
+
+    def idle(self):
+        ''' Blocks until the next sleeping task is due or a waited-on future completes. '''
+        timeout = max(0.0, self.sleeping[0][0] - time.monotonic()) if self.sleeping else None
+        if self.waiting:
+            concurrent.futures.wait(list(self.waiting), timeout, concurrent.futures.FIRST_COMPLETED)
+        elif timeout:
+            time.sleep(timeout)
+
+    def step(self, task):
+        ''' Resumes a task for one time slice. '''
+        task.budget = task.timeslice
+        Scheduler.running = task
+        try:
+            request = next(task.coroutine)
+        except StopIteration:
+            task.done = True
+            return
+        except Exception as e:
+            task.done = True
+            task.error = e
+            return
+        finally:
+            Scheduler.running = None
+        if request is None:
+            self.ready.append(task)
+        elif isinstance(request, concurrent.futures.Future):
+            self.waiting[request] = task
+        else:
+            heapq.heappush(self.sleeping, (request, next(self.sequence), task))
+
+    def run(self):
+        ''' Runs all scheduled tasks to completion. '''
+        while self.ready or self.sleeping or self.waiting:
+            self.wake()
+            if not self.ready:
+                self.idle()
+                continue
+            self.step(self.ready.popleft())
+        return self.tasks
@@ -0,0 +1,132 @@
+##   Copyright 2016-2024 Sayak Brahmachari
+
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from . import struixBatch
+
+
+class Server:
+    ''' Serves struixLang scripts from a pool of pre-warmed interpreter processes.
+
+    Requests and responses are JSON objects, one per line. A request holds the
+    'source' to run and optionally a 'timeout' in seconds; the response holds
+    the 'output', final 'stack' and 'error' with its 'line' and 'column'. '''
+
+    def __init__(self, workers=None, maxQueue=None, timeout=None, maxRequestsPerWorker=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.maxQueue = self.workers * 4 if maxQueue is None else maxQueue
+        self.timeout = timeout
+        # The interpreter is warmed up before the workers fork, so each starts warm, and workers
+        # replacing retired ones too; where processes are spawned instead, initWorker warms them.
+        struixBatch.initWorker()
+        self.pool = multiprocessing.Pool(self.workers, initializer=struixBatch.initWorker,
+                                         maxtasksperchild=maxRequestsPerWorker)
+        self.slots = threading.BoundedSemaphore(self.workers + self.maxQueue)
+
+    def job(self, request):
+        ''' Builds a worker job from a request. '''
+        if not isinstance(request, dict) or not isinstance(request.get('source'), str):
+            raise ValueError("Request must be an object with a 'source' string.")
+        timeout = request.get('timeout', self.timeout)
+        return (request['source'], timeout)
+
+    def handle(self, line):
+        ''' Runs one encoded request, blocking until its response is ready. '''
+        try:
+            request = json.loads(line)
+            job = self.job(request)
+        except ValueError as e:
+            return {'error': 'Bad request: {}'.format(e)}
+        if not self.slots.acquire(blocking=False):
+            return {'error': 'Server busy: request queue is full.', 'busy': True}
+        try:
+            response = self.pool.apply(struixBatch.runSource, (job,))
+        finally:
+            self.slots.release()
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def serveUnix(self, path):
+        ''' Serves requests on a Unix domain socket until interrupted. '''
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = server.handle(line)
+                    self.wfile.write(json.dumps(response).encode() + b'\n')
+                    self.wfile.flush()
+
+        class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(path):
+            os.unlink(path)
+        with UnixServer(path, Handler) as unixServer:
+            try:
+                unixServer.serve_forever()
+            finally:
+                os.unlink(path)
+
+    def serveStdio(self, stdin=None, stdout=None):
+        ''' Serves requests read from stdin, answering on stdout in order. '''
+        stdin = sys.stdin if stdin is None else stdin
+        stdout = sys.stdout if stdout is None else stdout
+
+        def jobs():
+            for line in stdin:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    yield request, self.job(request)
+                except ValueError as e:
+                    yield {}, e
+
+        # Requests are pipelined across the pool while responses keep their order.
+        pending = []
+        for request, job in jobs():
+            if isinstance(job, Exception):
+                pending.append((request, None, {'error': 'Bad request: {}'.format(job)}))
+            else:
+                pending.append((request, self.pool.apply_async(struixBatch.runSource, (job,)), None))
+            while pending and (pending[0][1] is None or pending[0][1].ready() or len(pending) > self.maxQueue):
+                self.respond(stdout, *pending.pop(0))
+        while pending:
+            self.respond(stdout, *pending.pop(0))
+
+    @staticmethod
+    def respond(stdout, request, asyncResult, response):
+        ''' Writes the response of a request, waiting for it if needed. '''
+        if asyncResult is not None:
+            response = asyncResult.get()
+        if 'id' in request:
+            response['id'] = request['id']
+        stdout.write(json.dumps(response) + '\n')
+        stdout.flush()
+
+    def close(self):
+        ''' Stops the worker processes. '''
+        self.pool.terminate()
+        self.pool.join()
+
+
+def submit(path, source, timeout=None):
+    ''' Sends a script to a server listening on a Unix domain socket and returns its response. '''
+    request = {'source': source}
+    if timeout is not None:
+        request['timeout'] = timeout
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as reply:
+            return json.loads(reply.readline())
@@ -1,12 +1,39 @@
 ##   Copyright 2016-24 Sayak Brahmachari
 
 import traceback
-from . import struixLexer
+import types
+from . import struixLexer, struixOptimizer
+
+class StruixError(Exception):
+    ''' Error raised while running struixLang code, with its source position. '''
+
+    def __init__(self, message, word, line, column):
+        super().__init__(message)
+        self.word = word
+        self.line = line
+        self.column = column
+
+class CompileBuffer(list):
+    ''' Items compiled into a definition or list, with the source position of each. '''
+
+    def __init__(self):
+        super().__init__()
+        self.sites = []
+
+    def mark(self, site):
+        ''' Records a source position for the items added since the last mark. '''
+        added = len(self) - len(self.sites)
+        if added == 1:
+            self.sites.append(site)
+        elif added > 1:
+            self.sites.extend([site] * added)
+        elif added < 0:
+            del self.sites[added:]
 
 class Terp:
     ''' Interpreter for struixLang. '''
     
-    def __init__(self):
+    def __init__(self, binding='deep'):
         self.scopedDictionaries = [{}]
         self.dictionary = self.scopedDictionaries[0]
         self.immediate = False
@@ -17,16 +44,54 @@ class Terp:
         self.areScopesFn = [True]
         self.lexerQueue = []
         self.lexer = struixLexer.Lexer("")
+        self.profiler = None
+        self.definitionSites = {}
+        self.lastDefined = None
+        # Built-in words by name and the libraries imported, for saving images.
+        self.primitives = {}
+        self.libraries = []
+        self.optimizer = struixOptimizer.Optimizer()
+        self.warnings = []
+        self.warningStream = None
+        # Settings changed by scripts, like MEMO_MAXSIZE, which the words read with their defaults.
+        self.settings = {}
+        # Shallow binding keeps the visible words in one table, as (word, scope depth). The
+        # dictionary of each scope then holds the bindings it shadows, for popScope to put back.
+        self.bindings = None
+        if binding == 'shallow':
+            self.bindings = {}
+            self.lookup = self.lookupShallow
+            self.define = self.defineShallow
+            self.popScope = self.popShallowScope
+        elif binding != 'deep':
+            raise ValueError('Unknown binding: {}'.format(binding))
 
     def addWords(self, newWords):
         ''' Adds given words to interpreter dictionary. '''
-        self.dictionary.update(newWords)
+        for word, code in newWords.items():
+            self.nameWord(word, code)
+        self.primitives.update(newWords)
+        if self.bindings is None:
+            self.dictionary.update(newWords)
+        else:
+            for word, code in newWords.items():
+                self.bind(word, code)
+
+    @staticmethod
+    def nameWord(word, code):
+        ''' Records the dictionary name of a word on its function. '''
+        if isinstance(code, types.FunctionType):
+            code.__dict__.setdefault('name', word)
+            if 'unchecked' in code.__dict__:
+                code.__dict__['unchecked'].__dict__.setdefault('name', word)
 
     def define(self, word, code, is_global=True):
         ''' Defines (or redefines) a word in the dictionary. '''
+        self.nameWord(word, code)
+        self.optimizer.redefined(word)
         if is_global:
             for scoped_dict in reversed(self.scopedDictionaries):
-                if word in scoped_dict.keys():
+                if word in scoped_dict:
                     scoped_dict[word] = code
                     return
         self.dictionary[word] = code
@@ -35,10 +100,35 @@ class Terp:
         ''' Returns a word with given key from dictionary. '''
         if not isinstance(word, str): return None
         for scoped_dict in reversed(self.scopedDictionaries):
-            if word in scoped_dict.keys():
+            if word in scoped_dict:
                 return scoped_dict[word]
         return None
 
+    def bind(self, word, code):
+        ''' Binds a word in the innermost scope, under shallow binding. '''
+        depth = len(self.scopedDictionaries) - 1
+        previous = self.bindings.get(word)
+        # Only the first binding in a scope shadows anything; the global scope is never popped.
+        if depth and (previous is None or previous[1] != depth):
+            self.dictionary[word] = previous
+        self.bindings[word] = (code, depth)
+
+    def defineShallow(self, word, code, is_global=True):
+        ''' Defines (or redefines) a word under shallow binding. '''
+        self.nameWord(word, code)
+        self.optimizer.redefined(word)
+        previous = self.bindings.get(word)
+        if is_global and previous is not None:
+            self.bindings[word] = (code, previous[1])
+        else:
+            self.bind(word, code)
+
+    def lookupShallow(self, word):
+        ''' Returns a word with given key from the table of visible words. '''
+        if not isinstance(word, str): return None
+        binding = self.bindings.get(word)
+        return None if binding is None else binding[0]
+
     @staticmethod
     def parseNumber(string):
         ''' Parses a string to either an integer or a float. '''
@@ -53,27 +143,72 @@ class Terp:
 
     def run(self, text):
         ''' Starts processing of struixLang code with enhanced error reporting. '''
+        self.openLexer(text)
+        depth, names = self.getScopeDepth(), len(self.wordNameStack)
         try:
-            self.lexerQueue.append(self.lexer)
-            self.lexer = struixLexer.Lexer(text)
-
             while self.lexer.peekWord():
                 try:
                     word_text = self.lexer.nextWord()
+                    site = (self.lexer.line_number, self.lexer.column_number - len(word_text))
                     word = self.compile(word_text)
                     self.interpret(word)
+                    self.markSite(site)
                 except Exception as e:
-                    # Include the word and position in the exception message
                     traceback.print_exc()
-                    line_number = self.lexer.line_number
-                    column_number = self.lexer.column_number - len(word_text)
-                    raise Exception(f"Error processing word '{word_text}' at line {line_number}, column {column_number}: {e}") from e
+                    self.unwind(depth, names)
+                    raise self.wordError(word_text, e) from e
         finally:
-            self.lexer = self.lexerQueue.pop()
+            self.closeLexer()
+
+    # The helpers below are shared with the coroutine forms in struixScheduler.
+
+    def openLexer(self, text):
+        ''' Starts reading a program, keeping the one being read to go back to. '''
+        self.lexerQueue.append(self.lexer)
+        self.lexer = struixLexer.Lexer(text)
+
+    def closeLexer(self):
+        ''' Goes back to reading the program read before the last openLexer. '''
+        self.lexer = self.lexerQueue.pop()
+
+    def markSite(self, site):
+        ''' Records the source position of what the last word compiled into a body. '''
+        if isinstance(self.stack, CompileBuffer):
+            self.stack.mark(site)
+
+    def unwind(self, depth, names):
+        ''' Closes the scopes and definitions a failing program left open, back to where it started. '''
+        # Popping a scope also puts back the bindings it shadowed under shallow binding.
+        while self.getScopeDepth() > depth:
+            self.popScope()
+        del self.wordNameStack[names:]
+
+    def wordError(self, word_text, e):
+        ''' Gives the error of the word just read, with the word and its position in the message. '''
+        line_number = self.lexer.line_number
+        column_number = self.lexer.column_number - len(word_text)
+        return StruixError(f"Error processing word '{word_text}' at line {line_number}, column {column_number}: {e}",
+                           word_text, line_number, column_number)
+
+    def enterWord(self, word):
+        ''' Counts a call of a word made by makeWord running its body, tiering it up or
+        preparing its body when due, and opens the scope of the body. '''
+        attrs = word.__dict__
+        attrs['calls'] += 1
+        if attrs['calls'] == self.optimizer.threshold:
+            self.optimizer.tierUp(word)
+        elif attrs['calls'] == 1 and not attrs['imm']:
+            # Lists are only known to be code once they run as blocks, which start from an empty stack.
+            self.optimizer.prepare(word)
+        self.newBlockScope()
+
+    def leaveWord(self):
+        ''' Closes the scope of a body, leaving its result (None for a void return) on the stack. '''
+        dataStack = self.popScope()
+        self.stack.append(dataStack.pop() if dataStack else None)
 
     def interpret(self, word):
         ''' Executes struixLang code. '''
-        import types
         if not self.isCompiling() or self.immediate:
             if isinstance(word, (types.FunctionType, types.MethodType)):
                 word(self)
@@ -83,10 +218,28 @@ class Terp:
         else:
             self.stack.append(word)
 
+    def warn(self, message):
+        ''' Records a warning, printing it if a warning stream is set. '''
+        self.warnings.append(message)
+        if self.warningStream is not None:
+            print('Warning: ' + message, file=self.warningStream)
+
+    def prepareBody(self, word, name='<block>'):
+        ''' Optimizes the body of a new word before it first runs, warning if it underflows its stack. '''
+        code = word.__dict__['code']
+        if not isinstance(code, CompileBuffer):
+            return
+        underflow = self.optimizer.prepare(word)
+        if underflow is not None:
+            index, needs, depth = underflow
+            sites = getattr(code, 'sites', ())
+            position = ' at line {}, column {}'.format(*sites[index]) if index < len(sites) else ''
+            word = struixOptimizer.nameOf(code[index]) or repr(code[index])
+            self.warn('Stack underflow in {}{}: {} takes {} item(s), but only {} are on the stack.'.format(
+                name, position, word, needs, depth))
+
     def compile(self, word, errMsg='Unknown Word: {}'):
         """ Compiles struixLang code to its internal representation. """
-        import types
-        num = self.parseNumber(word) if not isinstance(word, (types.FunctionType, types.MethodType)) else None
         fn = word if isinstance(word, (types.FunctionType, types.MethodType)) else self.lookup(word)
 
         if fn:
@@ -95,7 +248,9 @@ class Terp:
             # if self.immediate_compiled:
             #     print(f"Warning: Immediate word '{word}' is being {'compiled' if self.isCompiling() else 'interpreted'}.")
             return fn
-        elif isinstance(num, (int, float)):
+        # Words are far more common than numbers, so numbers are only parsed when no word matched.
+        num = self.parseNumber(word)
+        if isinstance(num, (int, float)):
             return num
         elif isinstance(word, str) and word.startswith(('"""', "'''")):
             return self.lexer.charsTillMultiline(word[:3])  # Handle multi-line strings
@@ -122,9 +277,9 @@ class Terp:
     def newAotScope(self):
         ''' Switches to a new AOT scope buffer. '''
         self.areScopesFn.append(False)
-        self.newScope()
+        self.newScope(CompileBuffer())
 
-    def newScope(self):
+    def newScope(self, stack=None):
         ''' Discretely replaces the data stack with a new scope buffer. '''
 
         # Push words dict to new AOT/BLOCK scope
@@ -132,7 +287,7 @@ class Terp:
         self.dictionary = self.scopedDictionaries[-1]
 
         # Push data stack to new AOT/BLOCK scope
-        self.scopedStacks.append([])
+        self.scopedStacks.append([] if stack is None else stack)
         self.stack = self.scopedStacks[-1]
 
     def popScope(self):
@@ -151,6 +306,73 @@ class Terp:
             return dataStack
         return self.scopedStacks[0]
 
+    def popShallowScope(self):
+        ''' Puts back the bindings shadowed by the innermost scope, then pops it. '''
+        if self.getScopeDepth() > 1:
+            for word, previous in self.dictionary.items():
+                if previous is None:
+                    del self.bindings[word]
+                else:
+                    self.bindings[word] = previous
+        return type(self).popScope(self)
+
+    def snapshot(self):
+        ''' Captures the global dictionary for restoring the interpreter later. '''
+        if self.bindings is None:
+            return dict(self.scopedDictionaries[0])
+        words = {word: code for word, (code, depth) in self.bindings.items() if depth == 0}
+        for shadowed in self.scopedDictionaries[1:]:
+            for word, previous in shadowed.items():
+                if previous is not None and previous[1] == 0:
+                    words[word] = previous[0]
+        return words
+
+    def restore(self, snapshot):
+        ''' Resets the interpreter to a captured global dictionary with empty stacks, settings and records. '''
+        self.scopedDictionaries = [self.scopedDictionaries[0]]
+        self.dictionary = self.scopedDictionaries[0]
+        self.dictionary.clear()
+        if self.bindings is None:
+            self.dictionary.update(snapshot)
+        else:
+            self.bindings = {word: (code, 0) for word, code in snapshot.items()}
+        self.scopedStacks = [[]]
+        self.stack = self.scopedStacks[0]
+        self.areScopesFn = [True]
+        self.wordNameStack = []
+        self.immediate = False
+        self.immediate_compiled = False
+        self.lexerQueue = []
+        self.lexer = struixLexer.Lexer("")
+        self.lastDefined = None
+        self.definitionSites = {}
+        self.libraries = []
+        self.warnings = []
+        self.settings = {}
+        self.optimizer.reset()
+
+    def startProfiling(self):
+        ''' Starts recording per-word execution statistics. '''
+        from .struixProfiler import Profiler
+        if self.profiler is None:
+            self.profiler = Profiler(self)
+        self.profiler.start()
+        return self.profiler
+
+    def startTracing(self):
+        ''' Starts profiling with a record of the word call hierarchy. '''
+        from .struixProfiler import Tracer
+        if not isinstance(self.profiler, Tracer):
+            self.profiler = Tracer(self)
+        self.profiler.start()
+        return self.profiler
+
+    def stopProfiling(self):
+        ''' Stops recording execution statistics, keeping those collected. '''
+        if self.profiler is not None:
+            self.profiler.stop()
+        return self.profiler
+
     def getScopeDepth(self):
         ''' Returns the depth of the current scope. '''
         return len(self.areScopesFn)
@@ -12,12 +12,143 @@
 ##   See the License for the specific language governing permissions and
 ##   limitations under the License.
 
+import argparse
+import hashlib
+import json
 import sys
+import time
 
-from struixLang import struixTerp, struixPrimitives
+from struixLang import struixTerp, struixPrimitives, struixBatch, struixCache, struixImage, struixServer
 
-f = open(sys.argv[1], 'r')
-terp = struixTerp.Terp()
-struixPrimitives.AddWords(terp)
-terp.run(f.read())
-f.close()
+
+def runScript(args):
+    ''' Runs a single script, optionally under the profiler. '''
+    f = open(args.scripts[0], 'r')
+    if args.image:
+        terp = struixImage.load(args.image)
+    else:
+        terp = struixTerp.Terp()
+        struixPrimitives.AddWords(terp)
+    if args.warnings:
+        terp.warningStream = sys.stderr
+    if args.flamegraph or args.calltree:
+        terp.startTracing()
+    elif args.profile:
+        terp.startProfiling()
+    try:
+        source = f.read()
+        # Warnings are found while compiling, which cached runs skip.
+        if args.no_cache or args.warnings:
+            terp.run(source)
+        else:
+            salt = ''
+            if args.image:
+                with open(args.image, 'rb') as image:
+                    salt = hashlib.sha256(image.read()).hexdigest()
+            struixCache.run(terp, source, args.cache_dir, int(args.cache_size * 1024 * 1024), salt)
+        if args.save_image:
+            struixImage.save(terp, args.save_image)
+    finally:
+        f.close()
+        profiler = terp.stopProfiling()
+        if args.profile:
+            profiler.report(file=sys.stderr)
+        if args.flamegraph:
+            profiler.writeFolded(args.flamegraph)
+        if args.calltree:
+            profiler.writeCallTree(args.calltree)
+
+
+def runBatch(args):
+    ''' Runs many scripts across a pool of pre-initialized interpreters. '''
+    paths = struixBatch.expandPaths(args.scripts)
+    start = time.perf_counter()
+    results = []
+    for result in struixBatch.runBatch(paths, args.jobs, args.timeout):
+        results.append(result)
+        status = 'FAILED' if result['error'] else 'ok'
+        print('==> {} [{}, {:.2f} ms]'.format(result['path'], status, result['time'] * 1e3))
+        if result['output']:
+            print(result['output'], end='' if result['output'].endswith('\n') else '\n')
+        if result['stack']:
+            shown = result['stack'][-10:]
+            more = len(result['stack']) - len(shown)
+            print('Stack: ' + ('... ({} more) '.format(more) if more else '') + ' '.join(shown))
+        if result['error']:
+            print('Error: ' + result['error'])
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for result in results if result['error'])
+    print('\n{} scripts in {:.2f}s, {} failed.'.format(len(results), elapsed, failed))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'wall_time': elapsed, 'failed': failed, 'scripts': results}, f, indent=2)
+    return 1 if failed else 0
+
+
+def serve(args):
+    ''' Serves scripts from a pool of pre-warmed interpreters until interrupted. '''
+    server = struixServer.Server(args.jobs, args.queue, args.timeout)
+    try:
+        if args.serve == '-':
+            server.serveStdio()
+        else:
+            print('Serving struixLang on {} with {} workers.'.format(args.serve, server.workers),
+                  file=sys.stderr)
+            server.serveUnix(args.serve)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs struixLang programs.')
+    parser.add_argument('scripts', nargs='*', metavar='script',
+                        help='path of the struixLang program; directories and glob patterns in batch mode')
+    parser.add_argument('--profile', action='store_true',
+                        help='print per-word call counts and timings after the run')
+    parser.add_argument('--flamegraph', metavar='FILE',
+                        help='write collapsed call stacks for flamegraph tools to FILE')
+    parser.add_argument('--calltree', metavar='FILE',
+                        help='write the word call tree as JSON to FILE')
+    parser.add_argument('--warnings', action='store_true',
+                        help='print definitions that are certain to underflow the stack')
+    parser.add_argument('--image', metavar='FILE',
+                        help='start from the interpreter saved in the image FILE')
+    parser.add_argument('--save-image', metavar='FILE',
+                        help='save the interpreter to the image FILE after the run')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='compile the script from source without using or writing the script cache')
+    parser.add_argument('--cache-dir', metavar='DIR', default=struixCache.DEFAULT_DIRECTORY,
+                        help='directory of the script cache (default: %(default)s)')
+    parser.add_argument('--cache-size', type=float, metavar='MB',
+                        default=struixCache.DEFAULT_MAX_SIZE / (1024 * 1024),
+                        help='size limit of the script cache, evicting the least recently used (default: %(default)g)')
+    parser.add_argument('--batch', action='store_true',
+                        help='run many scripts across a pool of pre-initialized interpreters')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='number of worker processes in batch and server mode (default: number of CPUs)')
+    parser.add_argument('--timeout', type=float,
+                        help='time limit per script in seconds in batch and server mode')
+    parser.add_argument('--json', metavar='FILE',
+                        help='write per-script results as JSON to FILE in batch mode')
+    parser.add_argument('--serve', metavar='SOCKET',
+                        help="serve scripts on a Unix socket, or on stdin/stdout if SOCKET is '-'")
+    parser.add_argument('--queue', type=int,
+                        help='requests allowed to wait for a worker when serving (default: 4 per worker)')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+    if not args.scripts:
+        parser.error('no script given')
+    if args.batch:
+        sys.exit(runBatch(args))
+    if len(args.scripts) > 1:
+        parser.error('more than one script given; use --batch to run several scripts')
+    runScript(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+sys.path.insert(0, current_dir)
+
+from test_cases import test_cases
+from struixLang.struixBatch import warmTerp, execute
+from struixCC import StruixCC, CompilationError
+
+
+# Interpreter warmed up once per worker process, and its pristine dictionary.
+terp = None
+snapshot = None
+
+
+def init_worker(binding='deep'):
+    """Create and warm up the interpreter of a worker process."""
+    global terp, snapshot
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+    terp = warmTerp(binding)
+    snapshot = terp.snapshot()
+
+
+def run_case(idx, timeout):
+    """
+    Run a single test case on the worker's interpreter.
+
+    Parameters:
+        idx (int): 1-based index of the test case.
+        timeout (float): Time limit of the case in seconds.
+
+    Returns:
+        dict: Outcome of the test case.
+    """
+    test = test_cases[idx - 1]
+    expected = test['output']
+    result = {"index": idx, "description": test['description'], "expected": repr(expected)}
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            sx_code = StruixCC().compile(test['code'])
+    except CompilationError as e:
+        result["actual"] = str(e)
+        result["status"] = "passed" if str(expected) in str(e) else "failed"
+    else:
+        run = execute(terp, snapshot, sx_code + '\nmain', timeout)
+        log.write(run['output'])
+        if run.get('timeout'):
+            result["status"] = "timeout"
+            result["error"] = run['error']
+        elif run['error']:
+            result.update(status="error", error=run['error'], line=run['line'], column=run['column'])
+        else:
+            actual = run['stack'][-1] if run['stack'] else None
+            result["actual"] = repr(actual)
+            result["status"] = "passed" if actual == expected else "failed"
+    result["time"] = time.perf_counter() - start
+    if result["status"] != "passed":
+        result["log"] = log.getvalue()
+    return result
+
+
+def run_parallel(indices, jobs=None, timeout=10.0, binding='deep'):
+    """
+    Run test cases across a pool of worker processes.
+
+    Parameters:
+        indices (list[int]): 1-based indices of the test cases to run.
+        jobs (int): Number of worker processes (default: number of CPUs).
+        timeout (float): Time limit of each case in seconds.
+        binding (str): Dictionary binding of the interpreters, 'deep' or 'shallow'.
+
+    Returns:
+        list[dict]: Outcomes of the test cases in index order.
+    """
+    results = []
+    pool = multiprocessing.Pool(jobs, initializer=init_worker, initargs=(binding,))
+    try:
+        pending = [(idx, pool.apply_async(run_case, (idx, timeout))) for idx in indices]
+        for idx, async_result in pending:
+            try:
+                # Workers enforce the limit themselves where alarms are available.
+                results.append(async_result.get(timeout + 5))
+            except multiprocessing.TimeoutError:
+                results.append({"index": idx, "description": test_cases[idx - 1]['description'],
+                                "status": "timeout", "time": timeout,
+                                "error": f"Exceeded time limit of {timeout} seconds"})
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the struixCC conformance corpus in parallel.")
+    parser.add_argument('indices', nargs='*', type=int, help="test cases to run (default: all)")
+    parser.add_argument('-j', '--jobs', type=int, help="number of worker processes")
+    parser.add_argument('-t', '--timeout', type=float, default=10.0, help="time limit per case in seconds")
+    parser.add_argument('--binding', choices=['deep', 'shallow'], default='deep',
+                        help="dictionary binding of the interpreters")
+    parser.add_argument('--json', metavar='FILE', help="write the summary as JSON to FILE ('-' for stdout)")
+    args = parser.parse_args()
+
+    indices = [i for i in args.indices if 0 < i <= len(test_cases)] or range(1, len(test_cases) + 1)
+    start = time.perf_counter()
+    results = run_parallel(list(indices), args.jobs, args.timeout, args.binding)
+    wall_time = time.perf_counter() - start
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    summary = {"total": len(results), "wall_time": wall_time, "counts": counts, "cases": results}
+
+    if args.json == '-':
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        for result in results:
+            detail = result.get('error') or (f"expected {result['expected']}, got {result.get('actual')}"
+                                             if result['status'] == 'failed' else '')
+            print(f"{result['index']:>4} {result['status']:<8} {result['time'] * 1e3:>9.2f} ms  "
+                  f"{result['description']}{'  -- ' + detail if detail else ''}")
+        print(f"\n{len(results)} cases in {wall_time:.2f}s: "
+              + ', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(summary, f, indent=2)
+
+    sys.exit(0 if counts.get('passed', 0) == len(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
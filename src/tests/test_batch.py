@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang import struixBatch
+
+# Scripts by name, the slow ones first so that later ones finish before them.
+SCRIPTS = {
+    'a_slow.sx': '0.3 SLEEP "slow" PRINT 1',
+    'b_fast.sx': '"fast" PRINT 2 3',
+    'c_error.sx': '4\nNO_SUCH_WORD',
+    'd_sub/e_nested.sx': '[ 1 2 ] LENGTH',
+}
+
+LOOP = '[ 1 1 == ] [ ] WHILE'
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        for name, source in SCRIPTS.items():
+            self.write(name, source)
+
+    def write(self, name, source):
+        """Write a script to the test directory, giving its path."""
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def paths(self):
+        """Give the paths of the scripts in order."""
+        return [os.path.join(self.directory, name) for name in SCRIPTS]
+
+    def test_expand_paths(self):
+        self.write('notes.txt', '')
+        self.assertEqual(struixBatch.expandPaths([self.directory]), self.paths())
+        pattern = os.path.join(self.directory, '*_*.sx')
+        self.assertEqual(struixBatch.expandPaths([pattern, 'missing.sx']), self.paths()[:3] + ['missing.sx'])
+
+    def test_results_in_order(self):
+        results = list(struixBatch.runBatch(self.paths() + ['missing.sx'], jobs=2))
+        self.assertEqual([result['path'] for result in results], self.paths() + ['missing.sx'])
+        slow, fast, error, nested, missing = results
+        self.assertEqual((slow['output'], slow['stack']), ('slow\n', ['1']))
+        self.assertEqual((fast['output'], fast['stack']), ('fast\n', ['2', '3']))
+        self.assertIsNone(fast['error'])
+        self.assertIn('NO_SUCH_WORD', error['error'])
+        self.assertEqual((error['line'], error['stack']), (2, ['4']))
+        self.assertEqual(nested['stack'], ['2'])
+        self.assertIsNotNone(missing['error'])
+
+    def test_timeout(self):
+        terp = struixBatch.warmTerp()
+        snapshot = terp.snapshot()
+        result = struixBatch.execute(terp, snapshot, LOOP, timeout=0.2)
+        self.assertTrue(result['timeout'])
+        self.assertEqual(result['error'], 'Exceeded time limit of 0.2 seconds')
+        self.assertLess(result['time'], 5)
+        # The interpreter is left usable for the next script.
+        result = struixBatch.execute(terp, snapshot, '1 2 +', timeout=5)
+        self.assertEqual((result['error'], result['stack']), (None, [3]))
+
+    def test_command_line(self):
+        self.write('f_loop.sx', LOOP)
+        report = os.path.join(self.directory, 'results.json')
+        result = subprocess.run([sys.executable, 'sxL.py', '--batch', '-j', '2', '--timeout', '1',
+                                 '--json', report, self.directory],
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 1, result.stderr)
+        headers = [line.split()[1] for line in result.stdout.splitlines() if line.startswith('==> ')]
+        paths = self.paths() + [os.path.join(self.directory, 'f_loop.sx')]
+        self.assertEqual(headers, paths)
+        self.assertIn('5 scripts in', result.stdout)
+        with open(report) as f:
+            data = json.load(f)
+        self.assertEqual(set(data), {'wall_time', 'failed', 'scripts'})
+        self.assertEqual(data['failed'], 2)
+        self.assertEqual([script['path'] for script in data['scripts']], paths)
+        for script in data['scripts']:
+            self.assertLessEqual({'path', 'error', 'line', 'column', 'time', 'output', 'stack'}, set(script))
+        self.assertTrue(data['scripts'][-1]['timeout'])
+        self.assertEqual(data['scripts'][1]['stack'], ['2', '3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
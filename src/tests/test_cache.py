@@ -0,0 +1,123 @@
+import contextlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang import struixCache
+from struixLang.struixTerp import Terp
+from struixLang.struixPrimitives import AddWords
+
+SCRIPT = """
+VAR total
+CONST limit 4
+DEF square VAR x x PARAM x FETCH x FETCH * END
+DEF sum_squares VAR i 0 i SWAP STORE 0 total SWAP STORE
+    [ i FETCH limit < ] [ total FETCH i FETCH DUP * + total SWAP STORE i FETCH 1 + i SWAP STORE ] WHILE
+    total FETCH
+END
+sum_squares [ 1 2 3 ] "done" PRINT
+"""
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def make_terp():
+    """Create an interpreter with the built-in words."""
+    terp = Terp()
+    AddWords(terp)
+    return terp
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_cached(self, text):
+        """
+        Run a script through the cache on a new interpreter.
+
+        Returns:
+            tuple: Whether it was replayed, the interpreter and its output.
+        """
+        terp = make_terp()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            replayed = struixCache.run(terp, text, self.directory.name)
+        return replayed, terp, output.getvalue()
+
+    def records(self):
+        """Give the paths of the records in the cache directory."""
+        return [os.path.join(self.directory.name, name) for name in os.listdir(self.directory.name)
+                if name.endswith(struixCache.SUFFIX)]
+
+    def test_replay_matches_run(self):
+        terp = make_terp()
+        with contextlib.redirect_stdout(io.StringIO()):
+            terp.run(SCRIPT)
+        replayed, first, output = self.run_cached(SCRIPT)
+        self.assertFalse(replayed)
+        self.assertEqual(len(self.records()), 1)
+        replayed, second, replayed_output = self.run_cached(SCRIPT)
+        self.assertTrue(replayed)
+        for cached in (first, second):
+            self.assertEqual(cached.stack, terp.stack)
+            cached.run('sum_squares 5 square')
+            self.assertEqual(cached.stack[-2:], [14, 25])
+        self.assertEqual((output, replayed_output), ('done\n', 'done\n'))
+
+    def test_changed_source_recorded_again(self):
+        self.run_cached('1 2 +')
+        replayed, terp, _ = self.run_cached('1 2 *')
+        self.assertFalse(replayed)
+        self.assertEqual(terp.stack, [2])
+        self.assertEqual(len(self.records()), 2)
+
+    def test_broken_record_dropped(self):
+        self.run_cached('1 2 +')
+        path, = self.records()
+        with open(path, 'wb') as record:
+            record.write(struixCache.MAGIC + b'garbage')
+        replayed, terp, _ = self.run_cached('1 2 +')
+        self.assertFalse(replayed)
+        self.assertEqual(terp.stack, [3])
+        self.assertTrue(self.run_cached('1 2 +')[0])
+
+    def test_uncacheable_script_marked(self):
+        text = 'DEF f 1 END NEXT 5 DROP f'
+        replayed, terp, _ = self.run_cached(text)
+        self.assertFalse(replayed)
+        self.assertEqual(terp.stack, [1])
+        path, = self.records()
+        with open(path, 'rb') as record:
+            record.read(len(struixCache.MAGIC))
+            self.assertFalse(pickle.load(record)['cacheable'])
+        # Later runs go straight to the source, without recording it again.
+        with mock.patch.object(struixCache.Recorder, 'run') as record:
+            replayed, terp, _ = self.run_cached(text)
+        record.assert_not_called()
+        self.assertFalse(replayed)
+        self.assertEqual(terp.stack, [1])
+
+    def test_eviction(self):
+        for value in range(4):
+            self.run_cached('{} DUP *'.format(value))
+        sizes = [os.path.getsize(path) for path in self.records()]
+        struixCache.evict(self.directory.name, max(sizes))
+        self.assertEqual(len(self.records()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
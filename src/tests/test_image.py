@@ -0,0 +1,142 @@
+import contextlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang import struixCache, struixImage
+from struixLang.struixTerp import Terp
+from struixLang.struixPrimitives import AddWords
+from struixCC import StruixCC
+
+C_PROGRAM = """
+int grade(int x) {
+    int y = 0;
+    switch (x) {
+        case 1: y = 10; break;
+        case 2: y = 20;
+        default: y = y + 5;
+    }
+    return y;
+}
+
+int total(int a, int b) {
+    int s = grade(a);
+    return s + grade(b) * 100;
+}
+"""
+
+SCRIPT = """
+VAR counter 5 counter SWAP STORE
+CONST base 3
+DEF sq VAR x x PARAM x FETCH x FETCH * END
+DEF use_sq base sq 1 + END
+DEF twice VAR n n PARAM n FETCH 2 * END MEMO
+"""
+
+# PARAM takes values from lower scopes too, so each call starts on an empty stack.
+CALLS = ['1 2 total', '7 grade', 'counter FETCH', 'base', 'use_sq', '4 twice', '4 twice', '[ 1 2 ] LENGTH']
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def results(terp):
+    """Give the result of each call, leaving the stack empty."""
+    values = []
+    for call in CALLS:
+        terp.run(call)
+        values.append(terp.stack.pop())
+        del terp.stack[:]
+    return values
+
+
+class ImageTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'test.img')
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.compiled = StruixCC(use_cache=False).compile(C_PROGRAM)
+
+    def build(self, binding='deep'):
+        """Make an interpreter running the C program and the script."""
+        terp = Terp(binding)
+        AddWords(terp)
+        terp.run(self.compiled)
+        terp.run(SCRIPT)
+        return terp
+
+    def test_round_trip(self):
+        for binding in ('deep', 'shallow'):
+            with self.subTest(binding=binding):
+                terp = self.build(binding)
+                struixImage.save(terp, self.path)
+                loaded = struixImage.load(self.path)
+                self.assertEqual(loaded.libraries, terp.libraries)
+                self.assertEqual(set(loaded.definitionSites), set(terp.definitionSites))
+                self.assertEqual(results(loaded), results(terp))
+                self.assertEqual(results(loaded), [2510, 5, 5, 3, 10, 8, 8, 2])
+
+    def test_hot_words_saved(self):
+        terp = self.build()
+        terp.run('1 TIER_THRESHOLD')
+        expected = results(terp)
+        results(terp)
+        self.assertGreater(terp.optimizer.tierUps, 0)
+        struixImage.save(terp, self.path)
+        loaded = struixImage.load(self.path)
+        self.assertEqual(results(loaded), expected)
+
+    def test_memoized_results_kept(self):
+        terp = self.build()
+        terp.run('4 twice')
+        struixImage.save(terp, self.path)
+        loaded = struixImage.load(self.path)
+        loaded.run('4 twice MEMO_STATS twice')
+        stats = loaded.stack.pop()
+        self.assertEqual(loaded.stack, [8])
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+
+    def test_callers_keep_words(self):
+        terp = self.build()
+        struixImage.save(terp, self.path)
+        loaded = struixImage.load(self.path)
+        loaded.run('DEF sq VAR x x PARAM x FETCH 10 * END use_sq 2 sq')
+        self.assertEqual(loaded.stack, [10, 20])
+
+    def test_invalid_image(self):
+        with open(self.path, 'wb') as image:
+            image.write(b'not an image')
+        with self.assertRaises(struixImage.ImageError):
+            struixImage.load(self.path)
+        with open(self.path, 'wb') as image:
+            image.write(struixImage.MAGIC + b'garbage')
+        with self.assertRaises(struixImage.ImageError):
+            struixImage.load(self.path)
+
+    def test_other_interpreter_version(self):
+        struixImage.save(self.build(), self.path)
+        with open(self.path, 'rb') as image:
+            image.read(len(struixImage.MAGIC))
+            header = pickle.load(image)
+            contents = image.read()
+        self.assertEqual(header['version'], struixCache.interpreterVersion())
+        header['version'] = 'older'
+        with open(self.path, 'wb') as image:
+            image.write(struixImage.MAGIC + pickle.dumps(header) + contents)
+        with self.assertRaisesRegex(struixImage.ImageError, 'another version of the interpreter'):
+            struixImage.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
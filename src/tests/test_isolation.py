@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang import struixBatch, struixOptimizer, struixServer
+
+# Definitions made before the snapshot, as by libraries, holding state that scripts change.
+PRELOAD = """
+VAR counter 0 counter SWAP STORE
+VAR seen [ 0 ] seen SWAP STORE
+DEF sq VAR x x PARAM x FETCH x FETCH * END MEMO
+DEF bump counter FETCH 1 + counter SWAP STORE counter FETCH END
+"""
+
+# Changes all the preloaded state, then reads it.
+MUTATE = '5 counter SWAP STORE 7 seen FETCH 0 STORE_ITEM DROP 3 sq DROP 1 TIER_THRESHOLD bump bump'
+READ = 'counter FETCH seen FETCH 0 ITEM MEMO_STATS sq'
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+class IsolationTest(unittest.TestCase):
+    """Scripts run one after another on a restored interpreter, as by the batch runner and server."""
+
+    binding = 'deep'
+
+    def setUp(self):
+        self.terp = struixBatch.warmTerp(self.binding)
+        self.snapshot = self.terp.snapshot()
+
+    def execute(self, source):
+        """Run a script on the restored interpreter and check it succeeded."""
+        result = struixBatch.execute(self.terp, self.snapshot, source)
+        self.assertIsNone(result['error'])
+        return result
+
+    def test_definitions_and_stacks(self):
+        self.execute('VAR leftover 1 2 3 DEF SWAP DROP END DEF helper 42 END')
+        result = self.execute('4 5 SWAP')
+        self.assertEqual(result['stack'], [5, 4])
+        self.assertIsNone(self.terp.lookup('helper'))
+        self.assertIsNone(self.terp.lookup('leftover'))
+
+    def test_output_captured(self):
+        result = self.execute('"hello" PRINT 7')
+        self.assertEqual(result['output'], 'hello\n')
+        self.assertEqual(result['stack'], [7])
+
+    def test_errors_reported(self):
+        result = struixBatch.execute(self.terp, self.snapshot, '1 NO_SUCH_WORD')
+        self.assertIn('NO_SUCH_WORD', result['error'])
+        self.assertEqual(self.execute('2')['stack'], [2])
+
+    def test_settings_reset(self):
+        self.execute('0 TIER_THRESHOLD 5 MEMO_MAXSIZE 3 HTTP_TIMEOUT 2 PMAP_WORKERS 10 PMAP_THRESHOLD')
+        self.assertEqual(self.terp.optimizer.threshold, 0)
+        self.execute('1')
+        self.assertEqual(self.terp.optimizer.threshold, struixOptimizer.DEFAULT_THRESHOLD)
+        self.assertEqual(self.terp.settings, {})
+        self.execute('DEF sq VAR x x PARAM x FETCH x FETCH * END MEMO MEMO_STATS sq')
+        self.assertEqual(self.terp.stack[-1]['maxsize'], 128)
+
+    def test_records_bounded(self):
+        for _ in range(3):
+            self.execute('DEF g DUP * END DEF h 1 END 1 h')
+            self.assertEqual(len(self.terp.warnings), 1)
+            self.assertEqual(set(self.terp.definitionSites), {'g', 'h'})
+            self.assertEqual(self.terp.optimizer.tierUps, 0)
+
+    def test_hot_words_between_requests(self):
+        for _ in range(2):
+            result = self.execute('1 TIER_THRESHOLD DEF inc VAR x x PARAM x FETCH 1 + END 1 inc 1 inc')
+            self.assertEqual(result['stack'], [2, 2])
+            self.assertEqual(self.terp.optimizer.tierUps, 1)
+
+
+class ForkedIsolationTest(unittest.TestCase):
+    """Scripts run in forked copies of an interpreter holding preloaded state."""
+
+    binding = 'deep'
+
+    def setUp(self):
+        self.terp = struixBatch.warmTerp(self.binding)
+        self.terp.run(PRELOAD)
+        self.snapshot = self.terp.snapshot()
+
+    def isolate(self, source):
+        """Run a script on a copy of the interpreter and check it succeeded."""
+        result = struixBatch.isolate(self.terp, self.snapshot, source)
+        self.assertIsNone(result['error'])
+        return result
+
+    def test_state_not_kept(self):
+        pristine = self.isolate(READ)['stack']
+        self.assertEqual(pristine[:2], ['0', '0'])
+        self.assertIn("'misses': 0", pristine[2])
+        self.assertEqual(self.isolate(MUTATE)['stack'], ['6', '7'])
+        self.assertEqual(self.isolate(READ)['stack'], pristine)
+        self.assertIs(self.terp.lookup('bump').__dict__['tiered'], None)
+
+    def test_timeout(self):
+        result = struixBatch.isolate(self.terp, self.snapshot, '[ 1 1 == ] [ ] WHILE', timeout=0.2)
+        self.assertTrue(result['timeout'])
+        self.assertEqual(self.isolate('counter FETCH')['stack'], ['0'])
+
+
+class ShallowIsolationTest(IsolationTest):
+
+    binding = 'shallow'
+
+
+class ShallowForkedIsolationTest(ForkedIsolationTest):
+
+    binding = 'shallow'
+
+
+class ServerTest(unittest.TestCase):
+
+    def test_requests_isolated(self):
+        server = struixServer.Server(workers=1)
+        self.addCleanup(server.close)
+        requests = ['VAR kept 1 2 3 DEF helper 42 END', 'helper', json.dumps({'source': '4 5 SWAP', 'id': 3})]
+        first = server.handle(json.dumps({'source': requests[0]}))
+        self.assertEqual((first['error'], first['stack']), (None, ['1', '2', '3']))
+        self.assertIn('helper', server.handle(json.dumps({'source': requests[1]}))['error'])
+        self.assertEqual(server.handle(requests[2])['stack'], ['5', '4'])
+        self.assertEqual(server.handle(requests[2])['id'], 3)
+        self.assertIn('Bad request', server.handle('not json')['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
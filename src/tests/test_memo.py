@@ -0,0 +1,104 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang.struixTerp import Terp, StruixError
+from struixLang.struixPrimitives import AddWords
+from struixLang import struixMemo
+from struixCC import StruixCC
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def make_terp():
+    """Create an interpreter with the built-in words."""
+    terp = Terp()
+    AddWords(terp)
+    return terp
+
+
+def memo_stats(terp, name):
+    """Give the cache statistics of a memoized word."""
+    terp.run(f'MEMO_STATS {name}')
+    return terp.stack.pop()
+
+
+class MemoTest(unittest.TestCase):
+
+    def test_param_arity(self):
+        terp = make_terp()
+        terp.run('DEF add VAR a VAR b a PARAM b PARAM a FETCH b FETCH + END')
+        self.assertEqual(struixMemo.arity(terp.lookup('add')), 2)
+
+    def test_cache_hits(self):
+        terp = make_terp()
+        terp.run('DEF square VAR x x PARAM x FETCH x FETCH * END MEMO')
+        terp.run('4 square 4 square 5 square')
+        self.assertEqual(terp.stack, [16, 16, 25])
+        stats = memo_stats(terp, 'square')
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 2, 2))
+
+    def test_maxsize_evicts_oldest(self):
+        terp = make_terp()
+        terp.run('2 MEMO_MAXSIZE DEF double VAR x x PARAM x FETCH 2 * END MEMO')
+        terp.run('1 double 2 double 3 double 1 double')
+        self.assertEqual(terp.stack, [2, 4, 6, 2])
+        stats = memo_stats(terp, 'double')
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (0, 4, 2))
+
+    def test_clear(self):
+        terp = make_terp()
+        terp.run('DEF square VAR x x PARAM x FETCH x FETCH * END MEMO')
+        terp.run('4 square 4 square MEMO_CLEAR square')
+        self.assertEqual(memo_stats(terp, 'square'), {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 128})
+        terp.run('4 square')
+        self.assertEqual(terp.stack, [16, 16, 16])
+        stats = memo_stats(terp, 'square')
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (0, 1, 1))
+
+    def test_stats_and_clear_compiled(self):
+        # Inside a definition, the named word is looked up when it is compiled.
+        terp = make_terp()
+        terp.run('DEF square VAR x x PARAM x FETCH x FETCH * END MEMO')
+        terp.run('DEF stats MEMO_STATS square END DEF reset MEMO_CLEAR square END')
+        terp.run('3 square 3 square')
+        terp.stack.clear()
+        terp.run('stats')
+        self.assertEqual(terp.stack.pop()['hits'], 1)
+        terp.run('reset stats')
+        self.assertEqual(terp.stack.pop(), {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 128})
+
+    def test_stats_of_plain_words(self):
+        terp = make_terp()
+        terp.run('DEF plain 1 END')
+        for source, message in [('MEMO_STATS plain', 'plain is not memoized'),
+                                ('MEMO_CLEAR missing', 'Unknown Word: missing')]:
+            with self.subTest(source=source), contextlib.redirect_stderr(io.StringIO()):
+                with self.assertRaisesRegex(StruixError, message):
+                    terp.run(source)
+
+    def test_compiled_c_function(self):
+        # struixCC takes parameters into frame slots, not with PARAM.
+        with contextlib.redirect_stderr(io.StringIO()):
+            code = StruixCC(use_cache=False).compile("int sq(int x) { return x * x; }")
+        terp = make_terp()
+        terp.run(code)
+        self.assertEqual(struixMemo.arity(terp.lookup('sq')), 1)
+        terp.run('MEMO')
+        terp.run('3 sq 3 sq 4 sq 4 sq')
+        self.assertEqual(terp.stack, [9, 9, 16, 16])
+        stats = memo_stats(terp, 'sq')
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
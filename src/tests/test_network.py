@@ -0,0 +1,190 @@
+import asyncio
+import contextlib
+import http.server
+import io
+import os
+import sys
+import threading
+import time
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang import struixNetwork
+from struixLang.struixTerp import Terp, StruixError
+from struixLang.struixPrimitives import AddWords
+
+
+# Responses a broken server might send, closing the connection after each.
+BROKEN = {
+    '/badstatus': b'HTTP/1.1 OK\r\n\r\n',
+    '/badchunk': b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n',
+    '/cutchunk': b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhel',
+    '/nochunkend': b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n',
+}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Serves redirects and echoes what is posted to it."""
+
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    active = 0
+    mostActive = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        Handler.connections.add(self.client_address)
+
+    def reply(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/found':
+            self.reply(302, headers=[('Location', '/target')])
+        elif self.path == '/moved':
+            self.reply(301, headers=[('Location', 'http://127.0.0.1:{}/found'.format(self.server.server_port))])
+        elif self.path == '/loop':
+            self.reply(302, headers=[('Location', '/loop')])
+        elif self.path == '/slow':
+            with Handler.lock:
+                Handler.active += 1
+                Handler.mostActive = max(Handler.mostActive, Handler.active)
+            time.sleep(0.2)
+            with Handler.lock:
+                Handler.active -= 1
+            self.reply(200, b'slow')
+        elif self.path in BROKEN:
+            self.wfile.write(BROKEN[self.path])
+            self.close_connection = True
+        else:
+            self.reply(200, 'GET {}'.format(self.path).encode())
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/temporary':
+            self.reply(307, headers=[('Location', '/echo')])
+        elif self.path == '/found':
+            self.reply(302, headers=[('Location', '/target')])
+        else:
+            kind = self.headers.get('Content-Type', '')
+            self.reply(200, 'POST {} {} '.format(self.path, kind).encode() + body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def setUpModule():
+    global server, base
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = 'http://127.0.0.1:{}'.format(server.server_port)
+
+
+def tearDownModule():
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(method, path, data=None):
+    """Make a request to the test server and give its response."""
+    return struixNetwork.request(method, base + path, data, timeout=10).result()
+
+
+class NetworkTest(unittest.TestCase):
+
+    def test_get(self):
+        response = fetch('GET', '/plain?x=1')
+        self.assertEqual((response.status, response.text), (200, 'GET /plain?x=1'))
+
+    def test_redirects_followed(self):
+        self.assertEqual(fetch('GET', '/found').text, 'GET /target')
+        self.assertEqual(fetch('GET', '/moved').text, 'GET /target')
+
+    def test_redirect_limit(self):
+        with self.assertRaises(ConnectionError):
+            fetch('GET', '/loop')
+
+    def test_post_redirects(self):
+        # 307 repeats the request, while 302 turns it into a GET.
+        self.assertEqual(fetch('POST', '/temporary', 'a=1').text, 'POST /echo  a=1')
+        self.assertEqual(fetch('POST', '/found', 'a=1').text, 'GET /target')
+
+    def test_post_bodies(self):
+        self.assertEqual(fetch('POST', '/echo', 'text').text, 'POST /echo  text')
+        self.assertEqual(fetch('POST', '/echo', b'raw').text, 'POST /echo  raw')
+        self.assertEqual(fetch('POST', '/echo', {'key': 'value', 'n': 2}).text,
+                         'POST /echo application/x-www-form-urlencoded key=value&n=2')
+
+    def test_invalid_body(self):
+        with self.assertRaises(TypeError):
+            fetch('POST', '/echo', 3.5)
+
+    def test_connection_reused(self):
+        pool = struixNetwork.ConnectionPool()
+        key = ('http', '127.0.0.1', server.server_port)
+
+        async def fetchTwice():
+            first = await pool.request('GET', base + '/a')
+            idle = len(pool.idle[key])
+            second = await pool.request('GET', base + '/b')
+            pool.close()
+            return first.text, idle, second.text
+
+        before = len(Handler.connections)
+        self.assertEqual(asyncio.run(fetchTwice()), ('GET /a', 1, 'GET /b'))
+        self.assertEqual(len(Handler.connections) - before, 1)
+
+    def test_connections_per_host_limited(self):
+        pool = struixNetwork.ConnectionPool(maxPerHost=2)
+
+        async def fetchMany():
+            responses = await asyncio.gather(*[pool.request('GET', base + '/slow') for _ in range(6)])
+            pool.close()
+            return [response.text for response in responses]
+
+        Handler.mostActive = 0
+        self.assertEqual(asyncio.run(fetchMany()), ['slow'] * 6)
+        self.assertEqual(Handler.mostActive, 2)
+
+    def test_timeout(self):
+        future = struixNetwork.request('GET', base + '/slow', timeout=0.05)
+        with self.assertRaisesRegex(TimeoutError, 'timed out after 0.05 seconds'):
+            future.result()
+
+    def test_malformed_responses(self):
+        # Broken responses fail like a dropped connection instead of leaking parse errors.
+        for path in BROKEN:
+            with self.subTest(path=path), self.assertRaises(ConnectionError):
+                fetch('GET', path)
+
+    def test_import_network(self):
+        terp = Terp()
+        AddWords(terp)
+        terp.run('IMPORT network "{}/plain" HTTP_GET'.format(base))
+        self.assertEqual(terp.stack, ['GET /plain'])
+
+    def test_words(self):
+        terp = Terp()
+        AddWords(terp)
+        terp.run('"{0}/found" HTTP_GET "{0}/echo" "a=b" HTTP_POST'.format(base))
+        self.assertEqual(terp.stack, ['GET /target', 'POST /echo  a=b'])
+        terp.run('[ "{0}/a" "{0}/found" ] HTTP_GET_ALL'.format(base))
+        self.assertEqual(terp.stack[-1], ['GET /a', 'GET /target'])
+        with self.assertRaises(StruixError), contextlib.redirect_stderr(io.StringIO()):
+            terp.run('"{}/echo" 7 HTTP_POST'.format(base))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang.struixTerp import Terp
+from struixLang.struixPrimitives import AddWords
+from struixCC import StruixCC
+
+C_PROGRAM = """
+int fact(int n) {
+    int result = 1;
+    int i;
+    for (i = 2; i <= n; i++) {
+        result = result * i;
+    }
+    return result;
+}
+
+int grade(int x) {
+    int y = 0;
+    switch (x) {
+        case 1: y = 10;
+        case 2: y = y + 20; break;
+        default: y = 5;
+    }
+    return y;
+}
+"""
+
+# Definitions and the calls made of them, run with and without tier-up.
+PROGRAMS = [
+    ('DEF count VAR i 0 i SWAP STORE [ i FETCH 10 < ] [ i FETCH 1 + i SWAP STORE ] WHILE i FETCH END',
+     'count'),
+    ('DEF bump VAR i 4 i SWAP STORE i FETCH 1 + i SWAP STORE i FETCH 5 * END', 'bump'),
+    ('DEF sq VAR x x PARAM x FETCH x FETCH * END', '7 sq 2.5 sq'),
+    ('DEF parity VAR n n PARAM n FETCH 2 % 0 == [ "even" ] [ "odd" ] IFELSE END', '3 parity 4 parity'),
+    ('DEF second VAR l l PARAM l FETCH 1 ITEM END', '[ 4 5 6 ] second'),
+    (None, '5 fact 1 grade 2 grade 3 grade'),
+]
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def make_terp():
+    """Create an interpreter with the built-in words."""
+    terp = Terp()
+    AddWords(terp)
+    return terp
+
+
+def run_program(definition, calls, threshold, times=3):
+    """
+    Run a definition, then its calls several times, with a tier-up threshold.
+
+    Returns:
+        tuple: The interpreter and the stack left by the calls.
+    """
+    terp = make_terp()
+    terp.run(f'{threshold} TIER_THRESHOLD')
+    if definition is None:
+        with contextlib.redirect_stderr(io.StringIO()):
+            definition = StruixCC(use_cache=False).compile(C_PROGRAM)
+    terp.run(definition)
+    for _ in range(times):
+        terp.run(calls)
+    return terp, list(terp.stack)
+
+
+class LoweringTest(unittest.TestCase):
+
+    def test_variable_reads_lowered(self):
+        terp = make_terp()
+        terp.run('DEF f VAR x 3 x SWAP STORE x FETCH END f')
+        self.assertEqual(terp.stack, [3])
+        code = terp.lookup('f').__dict__['code']
+        self.assertFalse(any(getattr(item, '__dict__', {}).get('name') == 'FETCH' for item in code))
+        self.assertTrue(any(getattr(item, 'load', False) for item in code))
+
+    def test_checks_skipped_in_safe_bodies(self):
+        terp = make_terp()
+        terp.run('DEF h 1 2 DUP * SWAP DROP END h')
+        self.assertEqual(terp.stack, [4])
+        code = terp.lookup('h').__dict__['code']
+        self.assertFalse(any('unchecked' in getattr(item, '__dict__', {}) for item in code))
+
+    def test_list_literals_keep_items(self):
+        terp = make_terp()
+        terp.run('VAR x [ x FETCH ] LENGTH')
+        self.assertEqual(terp.stack, [2])
+
+    def test_blocks_lowered_when_run(self):
+        # The word made from a block runs a lowered copy, and the block keeps its items.
+        terp = make_terp()
+        terp.run('VAR x 5 x SWAP STORE [ x FETCH 1 + ]')
+        block = terp.stack.pop()
+        word = AddWords.makeWord(block)
+        word(terp)
+        self.assertEqual(terp.stack, [6])
+        self.assertIs(word.__dict__['source'], block)
+        self.assertEqual(len(block), 4)
+        self.assertTrue(getattr(word.__dict__['code'][0], 'load', False))
+
+    def test_run_keeps_blocks(self):
+        terp = make_terp()
+        terp.run('VAR x 5 x SWAP STORE [ x FETCH ] DUP RUN DROP LENGTH')
+        self.assertEqual(terp.stack, [2])
+
+    def test_checked_blocks_keep_items(self):
+        # Unchecked variants only go into the copy the block's word runs.
+        terp = make_terp()
+        terp.run('[ 1 2 DUP * SWAP DROP ]')
+        block = terp.stack.pop()
+        items = list(block)
+        terp.stack.append(block)
+        terp.run('DUP RUN SWAP DUP LENGTH')
+        self.assertEqual(terp.stack, [4, block, 6])
+        self.assertTrue(all(old is new for old, new in zip(items, block)))
+        self.assertIs(block[2], terp.lookup('DUP'))
+
+    def test_changed_blocks_prepared_again(self):
+        terp = make_terp()
+        terp.run('[ 1 ] DUP RUN DROP 2 SWAP 0 STORE_ITEM RUN')
+        self.assertEqual(terp.stack, [2])
+
+    def test_deoptimized_words_rebuilt_from_source(self):
+        terp = make_terp()
+        terp.run('DEF one 1 END DEF two one one + END two')
+        word = terp.lookup('two')
+        self.assertEqual(terp.stack, [2])
+        self.assertEqual(word.__dict__['inlines'], {'one'})
+        self.assertEqual(len(word.__dict__['source']), 3)
+        # Bodies call the words defined when they were compiled, inlined or not.
+        terp.run('DEF one 10 END two')
+        self.assertEqual(terp.stack, [2, 2])
+        self.assertNotIn('inlines', word.__dict__)
+        self.assertEqual(len(word.__dict__['source']), 3)
+        self.assertEqual(len(word.__dict__['code']), 3)
+
+    def test_underflow_warned_for_definitions(self):
+        terp = make_terp()
+        before = len(terp.warnings)
+        terp.run('DEF g DUP * END')
+        self.assertEqual(len(terp.warnings), before + 1)
+        self.assertIn('Stack underflow in g', terp.warnings[-1])
+
+    def test_mapped_blocks_not_warned(self):
+        terp = make_terp()
+        before = list(terp.warnings)
+        terp.run('[ 1 2 3 ] [ VAR x x PARAM x FETCH 1 + ] PMAP')
+        self.assertEqual(terp.stack, [[2, 3, 4]])
+        self.assertEqual(terp.warnings, before)
+
+
+class TierUpTest(unittest.TestCase):
+
+    def test_tiered_words_give_same_results(self):
+        for definition, calls in PROGRAMS:
+            with self.subTest(calls=calls):
+                _, interpreted = run_program(definition, calls, 0)
+                terp, tiered = run_program(definition, calls, 1)
+                self.assertEqual(tiered, interpreted)
+                self.assertGreater(terp.optimizer.tierUps, 0)
+
+    def test_results(self):
+        _, stack = run_program(None, '5 fact 1 grade 2 grade 3 grade', 1, times=1)
+        self.assertEqual(stack, [120, 30, 20, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
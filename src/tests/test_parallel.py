@@ -0,0 +1,128 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang import struixParallel, struixScheduler
+from struixLang.struixTerp import Terp, StruixError
+from struixLang.struixPrimitives import AddWords
+
+SQUARES = 'DEF square VAR x x PARAM x FETCH x FETCH * END '
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def make_terp(binding='deep'):
+    """Create an interpreter with all words."""
+    terp = Terp(binding)
+    AddWords(terp)
+    return terp
+
+
+def in_fresh_process(fn):
+    """Run fn in a forked process, which has none of the helper threads of this one, giving its result."""
+    context = multiprocessing.get_context('fork')
+    reader, writer = context.Pipe(duplex=False)
+
+    def target():
+        try:
+            writer.send(('result', fn()))
+        except Exception as e:
+            writer.send(('error', '{}: {}'.format(type(e).__name__, e)))
+
+    process = context.Process(target=target)
+    process.start()
+    outcome = reader.recv()
+    process.join()
+    return outcome
+
+
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'needs fork')
+class ParallelTest(unittest.TestCase):
+
+    def test_results_in_order(self):
+        def run():
+            terp = make_terp()
+            terp.run(SQUARES + '4 PMAP_WORKERS 1 PMAP_THRESHOLD')
+            items = list(range(200))
+            terp.stack.append(items)
+            terp.run('[ square ] PMAP')
+            workers = struixParallel.pmap(terp, lambda terp: terp.stack.append(os.getpid()), items, 4, 1)
+            return terp.stack, os.getpid() not in workers
+
+        stack, forked = in_fresh_process(run)[1]
+        self.assertEqual(stack, [[i * i for i in range(200)]])
+        self.assertTrue(forked)
+
+    def test_error_in_worker(self):
+        def run():
+            terp = make_terp()
+            terp.run('1 PMAP_THRESHOLD')
+            terp.stack.append(list(range(100)))
+            with contextlib.redirect_stderr(io.StringIO()):
+                terp.run('[ VAR x x PARAM 10 x FETCH 50 - / ] PMAP')
+
+        kind, error = in_fresh_process(run)
+        self.assertEqual(kind, 'error')
+        self.assertRegex(error, "^StruixError: Error processing word 'PMAP' .*: division by zero$")
+
+
+class SerialTest(unittest.TestCase):
+
+    def test_blocks_run_in_scope(self):
+        # Like RUN, the block starts from a stack of its own and takes the item with PARAM.
+        terp = make_terp()
+        terp.run('"below" [ 1 2 3 ] [ VAR x x PARAM x FETCH 1 + ] PMAP')
+        self.assertEqual(terp.stack, ['below', [2, 3, 4]])
+        terp.stack.clear()
+        with self.assertRaises(StruixError), contextlib.redirect_stderr(io.StringIO()):
+            terp.run('[ 1 2 3 ] [ 1 + ] PMAP')
+
+    def test_inside_words(self):
+        terp = make_terp()
+        terp.run('DEF inner [ 1 2 ] [ VAR x x PARAM x FETCH 1 + ] PMAP END DEF outer inner END 7 outer')
+        self.assertEqual((terp.stack, terp.getScopeDepth()), ([7, [2, 3]], 1))
+
+    def test_words_and_blocks(self):
+        terp = make_terp()
+        terp.run(SQUARES + '[ 1 2 3 ] [ square ] PMAP')
+        self.assertEqual(terp.stack, [[1, 4, 9]])
+
+    def test_serial_below_threshold(self):
+        terp = make_terp()
+        terp.run(SQUARES + '1000 PMAP_THRESHOLD')
+        pids = struixParallel.pmap(terp, lambda terp: terp.stack.append(os.getpid()), range(100), 4, 1000)
+        self.assertEqual(set(pids), {os.getpid()})
+
+    def test_serial_with_helper_threads(self):
+        # Forking while the scheduler's helper threads run could hang the workers.
+        struixScheduler.executor().submit(int).result()
+        self.assertFalse(struixParallel.canFork())
+        terp = make_terp()
+        pids = struixParallel.pmap(terp, lambda terp: terp.stack.append(os.getpid()), range(100), 4, 1)
+        self.assertEqual(set(pids), {os.getpid()})
+
+    def test_scopes_restored_after_error(self):
+        for binding in ('deep', 'shallow'):
+            with self.subTest(binding=binding):
+                terp = make_terp(binding)
+                terp.run('DEF f "outer" END')
+                with self.assertRaises(StruixError), contextlib.redirect_stderr(io.StringIO()):
+                    terp.run('7 [ 1 0 ] [ DEF f "inner" END VAR x x PARAM 1 x FETCH / ] PMAP')
+                self.assertEqual((terp.getScopeDepth(), terp.stack), (1, [7]))
+                terp.stack.clear()
+                terp.run('f')
+                self.assertEqual(terp.stack, ['outer'])
+
+
+if __name__ == '__main__':
+    unittest.main()
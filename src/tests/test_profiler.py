@@ -0,0 +1,175 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang.struixTerp import Terp
+from struixLang.struixPrimitives import AddWords
+
+# Words with parameters are called with nothing else left on the stacks below them.
+SCRIPT = """
+DEF sq VAR x x PARAM x FETCH x FETCH * END
+DEF body VAR n n PARAM n FETCH sq 1 + END
+DEF TIMES VAR acc 0 acc SWAP STORE
+    1 body acc FETCH + acc SWAP STORE 2 body acc FETCH + acc SWAP STORE 3 body acc FETCH +
+END
+TIMES
+"""
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def make_terp():
+    """Create an interpreter with the built-in words."""
+    terp = Terp()
+    AddWords(terp)
+    return terp
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_call_counts(self):
+        terp = make_terp()
+        profiler = terp.startProfiling()
+        terp.run(SCRIPT)
+        self.assertIs(terp.stopProfiling(), profiler)
+        calls = {name: stat[0] for name, stat in profiler.stats.items()}
+        self.assertEqual(terp.stack, [17])
+        self.assertEqual((calls['TIMES'], calls['body'], calls['sq']), (1, 3, 3))
+        self.assertEqual((calls['PARAM'], calls['*'], calls['+']), (6, 3, 6))
+        for name, (count, selfTime, cumulative) in profiler.stats.items():
+            self.assertLessEqual(selfTime, cumulative + 1e-9, name)
+
+    def test_hot_words_profiled(self):
+        terp = make_terp()
+        terp.run('1 TIER_THRESHOLD ' + SCRIPT)
+        body = terp.lookup('body')
+        self.assertIsNotNone(body.__dict__['tiered'])
+        terp.stack.pop()
+        profiler = terp.startProfiling()
+        terp.run('TIMES')
+        terp.stopProfiling()
+        self.assertEqual(terp.stack, [17])
+        # Translated bodies are detached while profiling, so the words they call are seen.
+        self.assertEqual(profiler.stats['sq'][0], 3)
+        self.assertIsNotNone(body.__dict__['tiered'])
+        self.assertNotIn('interpret', terp.__dict__)
+
+    def test_tiered_calls_not_counted(self):
+        terp = make_terp()
+        terp.run('2 TIER_THRESHOLD DEF inc VAR x x PARAM x FETCH 1 + END 1 inc 2 inc 3 inc 4 inc')
+        self.assertEqual(terp.stack, [2, 3, 4, 5])
+        self.assertEqual(terp.lookup('inc').__dict__['calls'], 2)
+
+    def test_report(self):
+        terp = make_terp()
+        profiler = terp.startProfiling()
+        terp.run(SCRIPT)
+        terp.stopProfiling()
+        output = io.StringIO()
+        profiler.report(file=output, sortBy='calls', limit=2)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0].split()[:2], ['word', 'calls'])
+        self.assertEqual(len(lines), 3)
+
+    def test_command_line(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.sx', delete=False) as script:
+            script.write(SCRIPT)
+        self.addCleanup(os.remove, script.name)
+        result = subprocess.run([sys.executable, 'sxL.py', '--profile', '--no-cache', script.name],
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        rows = {line.split()[0]: line.split()[1] for line in result.stderr.splitlines()[1:]}
+        self.assertEqual((rows['TIMES'], rows['body'], rows['sq']), ('1', '3', '3'))
+
+
+class TracerTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def trace(self):
+        """Trace the script, giving the tracer."""
+        terp = make_terp()
+        tracer = terp.startTracing()
+        terp.run(SCRIPT)
+        terp.stopProfiling()
+        return tracer
+
+    def check_folded(self, lines):
+        """Check collapsed stacks of the script, with positive self times."""
+        stacks = {}
+        for line in lines:
+            path, micros = line.rsplit(' ', 1)
+            self.assertGreater(int(micros), 0)
+            stacks[path] = int(micros)
+        self.assertLessEqual({'TIMES', 'TIMES;body', 'TIMES;body;sq', 'TIMES;body;sq;*'}, set(stacks))
+        self.assertFalse([path for path in stacks if path.startswith('sq') or path.startswith('body')])
+
+    def find(self, nodes, name):
+        """Give the node of the call tree with the given name."""
+        node, = [node for node in nodes if node['name'] == name]
+        return node
+
+    def check_tree(self, tree):
+        """Check the call tree of the script."""
+        times = self.find(tree, 'TIMES')
+        body = self.find(times['children'], 'body')
+        sq = self.find(body['children'], 'sq')
+        multiply = self.find(sq['children'], '*')
+        self.assertEqual([node['calls'] for node in (times, body, sq, multiply)], [1, 3, 3, 3])
+        self.assertEqual(self.find(sq['children'], 'PARAM')['calls'], 3)
+        self.assertEqual(set(times), {'name', 'line', 'column', 'defined', 'calls', 'total_ms',
+                                      'self_ms', 'children'})
+        self.assertEqual((times['defined'], body['defined'], sq['defined']), ([4, 5], [3, 5], [2, 5]))
+        self.assertEqual(times['line'], 7)
+        self.assertEqual(multiply['children'], [])
+        for node in (times, body, sq):
+            self.assertGreaterEqual(node['total_ms'], node['self_ms'])
+            self.assertGreaterEqual(node['total_ms'], sum(child['total_ms'] for child in node['children']))
+
+    def test_folded_stacks(self):
+        tracer = self.trace()
+        self.check_folded(tracer.folded())
+        path = os.path.join(self.directory, 'trace.folded')
+        tracer.writeFolded(path)
+        with open(path) as f:
+            self.check_folded(f.read().splitlines())
+
+    def test_call_tree(self):
+        tracer = self.trace()
+        self.check_tree(tracer.callTree())
+        path = os.path.join(self.directory, 'trace.json')
+        tracer.writeCallTree(path)
+        with open(path) as f:
+            self.check_tree(json.load(f))
+
+    def test_command_line(self):
+        script = os.path.join(self.directory, 'script.sx')
+        with open(script, 'w') as f:
+            f.write(SCRIPT)
+        folded = os.path.join(self.directory, 'script.folded')
+        tree = os.path.join(self.directory, 'script.json')
+        result = subprocess.run([sys.executable, 'sxL.py', '--no-cache', '--flamegraph', folded,
+                                 '--calltree', tree, script], capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        with open(folded) as f:
+            self.check_folded(f.read().splitlines())
+        with open(tree) as f:
+            self.check_tree(json.load(f))
+
+
+if __name__ == '__main__':
+    unittest.main()
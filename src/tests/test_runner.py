@@ -1,10 +1,11 @@
 import sys
 import os
 
-# Add the src directory to sys.path
+# Add the src and tests directories to sys.path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 src_dir = os.path.abspath(os.path.join(current_dir, ".."))
 sys.path.insert(0, src_dir)
+sys.path.insert(0, current_dir)
 
 from test_cases import test_cases
 from struixLang.struixTerp import Terp
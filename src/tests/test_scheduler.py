@@ -0,0 +1,120 @@
+import contextlib
+import io
+import os
+import sys
+import time
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang.struixScheduler import Scheduler
+from struixLang.struixTerp import Terp, StruixError
+from struixLang.struixPrimitives import AddWords
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def make_terp():
+    """Create an interpreter with the built-in words."""
+    terp = Terp()
+    AddWords(terp)
+    return terp
+
+
+def interrupt(terp):
+    raise KeyboardInterrupt
+
+
+def marking(order, mark):
+    """Make an interpreter with a MARK word recording a mark and the time in order."""
+    terp = make_terp()
+    terp.addWords({'MARK': lambda terp: order.append((mark, time.monotonic()))})
+    return terp
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def test_tasks_run_to_completion(self):
+        scheduler = Scheduler(timeslice=2)
+        first, second = make_terp(), make_terp()
+        tasks = [scheduler.spawn(first, '1 2 + 3 *'), scheduler.spawn(second, '[ 1 2 3 ] LENGTH')]
+        self.assertEqual(scheduler.run(), tasks)
+        self.assertTrue(all(task.done and task.error is None for task in tasks))
+        self.assertEqual((first.stack, second.stack), ([9], [3]))
+
+    def test_errors_recorded(self):
+        scheduler = Scheduler()
+        failing = scheduler.spawn(make_terp(), '1 NO_SUCH_WORD')
+        passing = scheduler.spawn(make_terp(), '2')
+        scheduler.run()
+        self.assertTrue(failing.done)
+        self.assertIsInstance(failing.error, StruixError)
+        self.assertIsNone(passing.error)
+
+    def test_interrupt_propagates(self):
+        scheduler = Scheduler()
+        terp = make_terp()
+        terp.addWords({'INTERRUPT': interrupt})
+        task = scheduler.spawn(terp, '1 INTERRUPT 2')
+        with self.assertRaises(KeyboardInterrupt):
+            scheduler.run()
+        self.assertIsNone(task.error)
+        self.assertIsNone(Scheduler.running)
+
+    def test_timeslices_interleave(self):
+        # Each round of TIMES executes MARK and ticks once more; the first slice also reads the block.
+        for timeslice, expected in ((4, '001100110011'), (2, '010101010101'), (100, '000000111111')):
+            with self.subTest(timeslice=timeslice):
+                order = []
+                scheduler = Scheduler(timeslice=timeslice)
+                for mark in '01':
+                    scheduler.spawn(marking(order, mark), '[ MARK ] 6 TIMES')
+                scheduler.run()
+                self.assertEqual(''.join(mark for mark, _ in order), expected)
+
+    def test_sleep_lets_others_run(self):
+        order = []
+        scheduler = Scheduler(timeslice=1)
+        start = time.monotonic()
+        scheduler.spawn(marking(order, 'sleeper'), 'MARK 0.3 SLEEP MARK')
+        scheduler.spawn(marking(order, 'busy'), '[ MARK 0.01 SLEEP ] 5 TIMES')
+        scheduler.run()
+        self.assertEqual([mark for mark, _ in order], ['sleeper'] + ['busy'] * 5 + ['sleeper'])
+        self.assertLess(order[-2][1] - start, 0.3)
+        self.assertGreaterEqual(order[-1][1] - start, 0.3)
+
+    def test_words_tier_up(self):
+        scheduler = Scheduler()
+        terp = make_terp()
+        scheduler.spawn(terp, '2 TIER_THRESHOLD DEF inc VAR x x PARAM x FETCH 1 + END 1 inc 2 inc 3 inc')
+        scheduler.run()
+        self.assertEqual(terp.stack, [2, 3, 4])
+        self.assertEqual(terp.optimizer.tierUps, 1)
+        self.assertEqual(terp.lookup('inc').__dict__['calls'], 3)
+
+    def test_same_as_run(self):
+        source = 'DEF f VAR x x PARAM x FETCH DUP * END\n3 f [ 1 2 ] LENGTH'
+        scheduled = make_terp()
+        scheduler = Scheduler(timeslice=1)
+        scheduler.spawn(scheduled, source)
+        scheduler.run()
+        terp = make_terp()
+        terp.run(source)
+        self.assertEqual(scheduled.stack, terp.stack)
+        self.assertEqual(scheduled.definitionSites, terp.definitionSites)
+        self.assertEqual(scheduled.lookup('f').__dict__['source'].sites, terp.lookup('f').__dict__['source'].sites)
+        failing = scheduler.spawn(make_terp(), '1\n2 NO_SUCH_WORD')
+        scheduler.run()
+        with self.assertRaises(StruixError) as raised, contextlib.redirect_stderr(io.StringIO()):
+            make_terp().run('1\n2 NO_SUCH_WORD')
+        self.assertEqual(str(failing.error), str(raised.exception))
+        self.assertEqual((failing.error.line, failing.error.column), (2, raised.exception.column))
+
+
+if __name__ == '__main__':
+    unittest.main()
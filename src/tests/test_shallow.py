@@ -0,0 +1,137 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang.struixScheduler import Scheduler
+from struixLang.struixTerp import Terp, StruixError
+from struixLang.struixPrimitives import AddWords
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def make_terp(binding='shallow'):
+    """Create an interpreter with the built-in words."""
+    terp = Terp(binding)
+    AddWords(terp)
+    return terp
+
+
+def shadow(terp):
+    """Bind f in the current scope, then fail."""
+    terp.define('f', lambda terp: terp.stack.append('inner'), is_global=False)
+    raise ValueError('failed after binding f')
+
+
+class ShallowBindingTest(unittest.TestCase):
+
+    def test_shadowing(self):
+        terp = Terp('shallow')
+        terp.define('a', 1)
+        terp.newBlockScope()
+        terp.define('a', 2, is_global=False)
+        terp.define('b', 3, is_global=False)
+        terp.newBlockScope()
+        terp.define('a', 4, is_global=False)
+        self.assertEqual((terp.lookup('a'), terp.lookup('b')), (4, 3))
+        terp.popScope()
+        self.assertEqual((terp.lookup('a'), terp.lookup('b')), (2, 3))
+        terp.popScope()
+        self.assertEqual((terp.lookup('a'), terp.lookup('b')), (1, None))
+
+    def test_bound_twice_in_a_scope(self):
+        # Only the first binding in a scope records what it shadows.
+        terp = Terp('shallow')
+        terp.define('a', 1)
+        terp.newBlockScope()
+        terp.define('a', 2, is_global=False)
+        terp.define('a', 3, is_global=False)
+        self.assertEqual(terp.lookup('a'), 3)
+        terp.popScope()
+        self.assertEqual(terp.lookup('a'), 1)
+
+    def test_same_as_deep(self):
+        # A global define rebinds the innermost scope holding the name, else binds in the current one.
+        steps = [('define', 'a', 1, True), ('push',), ('define', 'a', 2, False), ('define', 'a', 5, True),
+                 ('define', 'c', 6, True), ('push',), ('define', 'c', 7, True), ('pop',), ('pop',)]
+        seen = {}
+        for binding in ('deep', 'shallow'):
+            terp = Terp(binding)
+            looked = []
+            for step in steps:
+                if step[0] == 'define':
+                    terp.define(*step[1:])
+                elif step[0] == 'push':
+                    terp.newBlockScope()
+                else:
+                    terp.popScope()
+                looked.append((terp.lookup('a'), terp.lookup('c')))
+            seen[binding] = looked
+        self.assertEqual(seen['shallow'], seen['deep'])
+
+    def test_global_scope_not_popped(self):
+        terp = Terp('shallow')
+        terp.define('a', 1)
+        terp.popScope()
+        self.assertEqual((terp.lookup('a'), terp.getScopeDepth()), (1, 1))
+
+    def test_snapshot_while_shadowed(self):
+        terp = Terp('shallow')
+        terp.define('a', 1)
+        terp.newBlockScope()
+        terp.define('a', 2, is_global=False)
+        terp.define('b', 3, is_global=False)
+        self.assertEqual(terp.snapshot(), {'a': 1})
+
+    def test_unknown_binding(self):
+        with self.assertRaises(ValueError):
+            Terp('lexical')
+
+
+class UnwindTest(unittest.TestCase):
+
+    def test_scopes_restored_on_exception(self):
+        for binding in ('deep', 'shallow'):
+            with self.subTest(binding=binding):
+                terp = make_terp(binding)
+                terp.addWords({'SHADOW': shadow})
+                terp.run('DEF f "outer" END')
+                with self.assertRaises(StruixError), contextlib.redirect_stderr(io.StringIO()):
+                    terp.run('[ SHADOW ] RUN')
+                self.assertEqual(terp.getScopeDepth(), 1)
+                terp.run('f')
+                self.assertEqual(terp.stack, ['outer'])
+
+    def test_definitions_closed_on_exception(self):
+        for binding in ('deep', 'shallow'):
+            with self.subTest(binding=binding):
+                terp = make_terp(binding)
+                with self.assertRaises(StruixError), contextlib.redirect_stderr(io.StringIO()):
+                    terp.run('DEF g 1 NO_SUCH_WORD END')
+                self.assertFalse(terp.isCompiling())
+                self.assertEqual(terp.wordNameStack, [])
+                terp.run('2 3 +')
+                self.assertEqual(terp.stack, [5])
+
+    def test_scheduled_scopes_restored_on_exception(self):
+        terp = make_terp()
+        terp.addWords({'SHADOW': shadow})
+        terp.run('DEF f "outer" END')
+        scheduler = Scheduler()
+        task = scheduler.spawn(terp, '[ SHADOW ] RUN')
+        scheduler.run()
+        self.assertIsInstance(task.error, StruixError)
+        terp.run('f')
+        self.assertEqual((terp.getScopeDepth(), terp.stack), (1, ['outer']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang.struixTerp import Terp, StruixError
+from struixLang.struixPrimitives import AddWords
+
+LINES = ['first line\n', 'second\n', 'last without newline']
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def make_terp():
+    """Create an interpreter with the built-in words."""
+    terp = Terp()
+    AddWords(terp)
+    return terp
+
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'data.txt')
+        with open(self.path, 'w') as f:
+            f.write(''.join(LINES))
+        self.terp = make_terp()
+        self.terp.run(f'VAR stream "r" "{self.path}" OPEN_STREAM stream SWAP STORE')
+
+    def tearDown(self):
+        self.terp.run('stream FETCH CLOSE_STREAM')
+
+    def test_chunked_read(self):
+        chunks = []
+        while not chunks or chunks[-1]:
+            self.terp.run('stream FETCH 4 READ_CHUNK')
+            chunks.append(self.terp.stack.pop())
+        self.assertTrue(all(len(chunk) == 4 for chunk in chunks[:-2]))
+        self.assertEqual(''.join(chunks), ''.join(LINES))
+
+    def test_binary_chunks(self):
+        self.terp.run(f'"rb" "{self.path}" OPEN_STREAM DUP 5 READ_CHUNK SWAP DUP 100 READ_CHUNK SWAP CLOSE_STREAM')
+        self.assertEqual(b''.join(self.terp.stack), ''.join(LINES).encode())
+
+    def test_read_line(self):
+        self.terp.run('stream FETCH READ_LINE stream FETCH READ_LINE')
+        self.assertEqual(self.terp.stack, LINES[:2])
+        self.terp.run('stream FETCH READ_LINE stream FETCH READ_LINE')
+        self.assertEqual(self.terp.stack[2:], [LINES[2], ''])
+
+    def test_each_line(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.terp.run('7 stream FETCH [ VAR line line PARAM line FETCH LENGTH PRINT ] EACH_LINE')
+        self.assertEqual(output.getvalue().split(), [str(len(line)) for line in LINES])
+        # Each line is run on a stack holding only what was there before.
+        self.assertEqual(self.terp.stack, [7])
+
+    def test_write_and_flush(self):
+        out = self.path + '.out'
+        self.terp.run(f'VAR out "w" "{out}" OPEN_STREAM out SWAP STORE '
+                      '[ "a" "b" ] out FETCH WRITE_LINES "c" out FETCH WRITE_CHUNK')
+        # Writes stay in the stream buffer until it is flushed.
+        with open(out) as f:
+            self.assertEqual(f.read(), '')
+        self.terp.run('out FETCH FLUSH_STREAM')
+        with open(out) as f:
+            self.assertEqual(f.read(), 'abc')
+        self.terp.run('"d" out FETCH WRITE_CHUNK out FETCH CLOSE_STREAM')
+        with open(out) as f:
+            self.assertEqual(f.read(), 'abcd')
+
+
+class MappedFileTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.terp = make_terp()
+
+    def write(self, name, data):
+        """Write bytes to a file in the test directory, giving its path."""
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_mapped_view(self):
+        path = self.write('data.bin', b'hello mapped world')
+        self.terp.run(f'"{path}" MMAP_FILE DUP LENGTH SWAP DUP 0 ITEM SWAP DUP 6 12 SLICE DECODE SWAP CLOSE_STREAM')
+        self.assertEqual(self.terp.stack, [18, ord('h'), 'mapped'])
+
+    def test_empty_file(self):
+        path = self.write('empty.bin', b'')
+        self.terp.run(f'"{path}" MMAP_FILE DUP LENGTH SWAP DUP 0 0 SLICE DECODE SWAP CLOSE_STREAM')
+        self.assertEqual(self.terp.stack, [0, ''])
+
+    def test_close_with_live_slice(self):
+        path = self.write('data.bin', b'0123456789')
+        self.terp.run(f'VAR part "{path}" MMAP_FILE DUP 2 5 SLICE part SWAP STORE')
+        with self.assertRaises(StruixError) as raised, contextlib.redirect_stderr(io.StringIO()):
+            self.terp.run('CLOSE_STREAM')
+        self.assertIsInstance(raised.exception.__cause__, BufferError)
+        # The mapping stays open for the slice still using it.
+        self.terp.run('part FETCH DECODE')
+        self.assertEqual(self.terp.stack, ['234'])
+        self.terp.run('part FETCH CLOSE_STREAM')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, src_dir)
+
+from struixLang.struixTerp import Terp
+from struixLang.struixPrimitives import AddWords
+from struixCC import StruixCC, IncrementalCompiler, clear_compile_cache, compile_files, link
+
+WARNED = """
+int scale(int x) {
+    int weights[2] = {1, 2};
+    return x * weights[0];
+}
+"""
+
+
+PROGRAM = """
+typedef int number;
+int offset = 5;
+
+number helper(number x) {
+    return x + 1;
+}
+
+number caller(number x) {
+    return helper(x) * 2;
+}
+
+number other(number x) {
+    return x * 3;
+}
+
+number main() {
+    return caller(3) + other(1);
+}
+"""
+
+FRAMES = """
+int inner(int n) {
+    int t = n * 10;
+    return t;
+}
+
+int outer(int n) {
+    int t = n + 1;
+    int r = inner(t);
+    return r + t;
+}
+
+int diff(int a, int b) {
+    int d = a - b;
+    return d;
+}
+"""
+
+# Switch statements by name, with the value main gives.
+SWITCHES = {
+    'fall': ("int x = 1; int y = 0; switch (x) { case 1: y = y + 1; case 2: y = y + 10; break; "
+             "case 3: y = y + 100; }", 11),
+    'midDefault': ("int x = 9; int y = 0; switch (x) { case 1: y = 1; break; default: y = 5; "
+                   "case 2: y = y + 2; break; }", 7),
+    'nestedBreak': ("int x = 2; int y = 0; switch (x) { case 2: y = 1; if (y == 1) { break; } y = 50; "
+                    "case 3: y = 3; }", 1),
+    'noDefault': ("int x = 7; int y = 4; switch (x) { case 1: y = 1; break; }", 4),
+    'stacked': ("int x = 2; int y = 0; switch (x) { case 1: case 2: y = 12; break; case 3: y = 3; }", 12),
+    'emptyBreak': ("int x = 1; int y = 0; switch (x) { case 1: break; case 2: y = 2; }", 0),
+    'char': ("char c = 'b'; int y = 0; switch (c) { case 'a': y = 1; break; case 'b': y = 2; break; }", 2),
+    'loop': ("int i; int y = 0; for (i = 0; i < 5; i++) { switch (i % 3) { case 0: y = y + 1; break; "
+             "case 1: y = y + 10; break; default: y = y + 100; } }", 122),
+    'single': ("int x = 1; int y = 0; switch (x) case 1: y = 3;", 3),
+    'defaultBreak': ("int x = 5; int y = 0; switch (x) { default: break; case 1: y = 1; }", 0),
+}
+
+
+def setUpModule():
+    # Libraries are imported relative to the src directory.
+    os.chdir(src_dir)
+
+
+def compile_quietly(compiler, code):
+    """
+    Compile C code, capturing what the compiler prints.
+
+    Returns:
+        tuple: The generated code and the printed messages.
+    """
+    messages = io.StringIO()
+    with contextlib.redirect_stderr(messages):
+        compiled = compiler.compile(code)
+    return compiled, messages.getvalue()
+
+
+def run_compiled(code, calls):
+    """
+    Run compiled code, then calls of its words, on a new interpreter.
+
+    Returns:
+        list: The stack left by the calls.
+    """
+    terp = Terp()
+    AddWords(terp)
+    terp.run(code)
+    terp.run(calls)
+    return terp.stack
+
+
+class CompileCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        clear_compile_cache()
+        self.addCleanup(clear_compile_cache)
+
+    def test_hit_restores_compiler_state(self):
+        fresh = StruixCC()
+        compiled, messages = compile_quietly(fresh, WARNED)
+        cached = StruixCC()
+        self.assertEqual(compile_quietly(cached, WARNED), (compiled, messages))
+        self.assertIn('Array initialization', messages)
+        self.assertEqual(cached.warnings, fresh.warnings)
+        self.assertEqual(cached.functions, fresh.functions)
+        self.assertEqual(list(cached.functions), ['scale'])
+        self.assertEqual(cached.symbol_table, fresh.symbol_table)
+        self.assertEqual(cached.output, fresh.output)
+
+    def test_hit_state_not_shared(self):
+        compile_quietly(StruixCC(), WARNED)
+        first, second = StruixCC(), StruixCC()
+        compile_quietly(first, WARNED)
+        first.warnings.append('changed')
+        first.symbol_table.clear()
+        compile_quietly(second, WARNED)
+        self.assertEqual(len(second.warnings), 1)
+        self.assertIn('weights', second.symbol_table)
+
+
+class IncrementalTest(unittest.TestCase):
+
+    def test_same_code_as_full_compile(self):
+        compiler = IncrementalCompiler()
+        edited = PROGRAM.replace('x * 3', 'x * 4')
+        for version in (PROGRAM, edited, PROGRAM):
+            with self.subTest(version=version):
+                expected, _ = compile_quietly(StruixCC(use_cache=False), version)
+                self.assertEqual(compile_quietly(compiler, version)[0], expected)
+
+    def test_update_redefines_changed_words(self):
+        compiler = IncrementalCompiler()
+        terp = Terp()
+        AddWords(terp)
+        terp.run(compile_quietly(compiler, PROGRAM)[0])
+        edited = PROGRAM.replace('x + 1', 'x - 1')
+        script = compiler.update(edited)
+        # Callers hold the words they call, so caller and main are redefined along with helper.
+        defined = [line.split()[1] for line in script.splitlines() if line.startswith('DEF ')]
+        self.assertEqual(defined, ['helper', 'caller', 'main'])
+        terp.run(script)
+        terp.run('main')
+        self.assertEqual(terp.stack, [7])
+        self.assertEqual(run_compiled(StruixCC(use_cache=False).compile(edited), 'main'), [7])
+
+    def test_update_without_changes(self):
+        compiler = IncrementalCompiler()
+        compiler.update(PROGRAM)
+        self.assertEqual(compiler.update(PROGRAM), '')
+
+
+class LinkTest(unittest.TestCase):
+
+    def test_duplicate_functions_renamed(self):
+        first = StruixCC(use_cache=False).compile(
+            "int helper(int x) { return x + 1; }\nint first(int x) { return helper(x); }")
+        second = StruixCC(use_cache=False).compile(
+            "int helper(int x) { return x * 2; }\nint second(int x) { return helper(x); }")
+        program, warnings = link([('a.c', first), ('lib/b.c', second)])
+        self.assertEqual(program.count('IMPORT struixCC'), 1)
+        self.assertEqual(warnings, ["Function 'helper' of lib/b.c is also defined in a.c; renamed to 'b.helper'."])
+        self.assertEqual(run_compiled(program, '5 first 5 second 5 helper 5 b.helper'), [6, 10, 6, 10])
+
+    def test_compile_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name, source in (('good.c', FRAMES), ('bad.c', 'int broken( {')):
+                paths.append(os.path.join(directory, name))
+                with open(paths[-1], 'w') as f:
+                    f.write(source)
+            paths.append(os.path.join(directory, 'missing.c'))
+            good, bad, missing = compile_files(paths, jobs=1)
+        self.assertEqual(good['code'], StruixCC(use_cache=False).compile(FRAMES))
+        self.assertIsNone(good['error'])
+        self.assertIsNone(bad['code'])
+        self.assertIn('syntax error', bad['error'])
+        self.assertIsNone(missing['code'])
+        self.assertIsNotNone(missing['error'])
+
+
+class FrameTest(unittest.TestCase):
+
+    def test_locals_in_slots(self):
+        compiled, _ = compile_quietly(StruixCC(use_cache=False), FRAMES)
+        lines = compiled.splitlines()
+        self.assertIn('FRAME 3', lines)
+        self.assertIn('SLOT_PARAM 1', lines)
+        self.assertFalse(any(line.startswith('VAR') for line in lines))
+
+    def test_frames_per_call(self):
+        # inner and outer both keep t in slot 0, which must not be shared between their calls.
+        compiled, _ = compile_quietly(StruixCC(use_cache=False), FRAMES)
+        self.assertEqual(run_compiled(compiled, '2 outer 10 3 diff'), [33, 7])
+
+
+class SwitchTest(unittest.TestCase):
+
+    def test_fall_through(self):
+        for name, (body, expected) in SWITCHES.items():
+            with self.subTest(name=name):
+                code = f"int main() {{ {body} return y; }}"
+                compiled, _ = compile_quietly(StruixCC(use_cache=False), code)
+                self.assertEqual(run_compiled(compiled, 'main'), [expected])
+
+
+if __name__ == '__main__':
+    unittest.main()